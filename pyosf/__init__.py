@@ -6,20 +6,43 @@ __maintainer_email__ = 'jon@peirce.org.uk'
 __url__ = 'https://github.com/psychopy/pyosf'
 __downloadUrl__ = 'https://github.com/psychopy/pyosf/releases/'
 
-from .remote import Session, TokenStorage
-from .exceptions import AuthError, HTTPSError, OSFError, OSFDeleted
-from .project import Project
-from . import constants
-import os
-
-# create a logfile for this session
-logfile_path = os.path.join(constants.PYOSF_FOLDER, 'last_session.log')
-if not os.path.isdir(constants.PYOSF_FOLDER):
-    os.makedirs(constants.PYOSF_FOLDER)
-# prefer psychopy logging but use built-in logging if not available
-try:
-    from psychopy import logging
-    logfile = logging.LogFile(logfile_path, level=logging.DEBUG)
-except ImportError:
-    import logging
-    logfile = logging.FileHandler(logfile_path, mode='w')
+# Importing pyosf should be cheap and have no side effects (it's on the
+# startup path of PsychoPy) so the submodules (and requests) are only
+# imported when first used, and the PYOSF_FOLDER and logfile are only
+# created when a Session or Project is (see tools.start_logfile)
+import sys
+import importlib
+
+_submodules = ['assets', 'constants', 'exceptions', 'journal', 'local',
+               'manager', 'pipeline', 'project', 'remote', 'store', 'sync',
+               'tools', 'watch']
+_attributes = {'Session': 'remote', 'TokenStorage': 'remote',
+               'AuthError': 'exceptions', 'HTTPSError': 'exceptions',
+               'OSFError': 'exceptions', 'OSFDeleted': 'exceptions',
+               'Project': 'project'}
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    elif name in _attributes:
+        module = importlib.import_module('.' + _attributes[name], __name__)
+        return getattr(module, name)
+    elif name in ['logfile', 'logfile_path']:
+        tools = importlib.import_module('.tools', __name__)
+        tools.start_logfile()
+        return getattr(tools, name)
+    raise AttributeError("module {!r} has no attribute {!r}"
+                         .format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + _submodules + list(_attributes) +
+                  ['logfile', 'logfile_path'])
+
+
+if sys.version_info < (3, 7):  # no module __getattr__ so import eagerly
+    from .remote import Session, TokenStorage
+    from .exceptions import AuthError, HTTPSError, OSFError, OSFDeleted
+    from .project import Project
+    from . import constants
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""A compact record type for the entries (assets) in file indices
+
+An index entry is normally a dict with `path`, `full_path`, `kind`,
+`date_modified`, `size`, hex digests and, for remote files, a dict of links.
+`Asset` stores the same information with __slots__, interned folder names,
+digests as raw bytes and links derived from the id (where the links follow
+the same pattern as other assets) while behaving like that dict.
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import binascii
+try:
+    from sys import intern
+except ImportError:
+    pass  # intern is a builtin in Python 2
+
+_UNSET = object()  # distinguishes missing keys from values of None
+MAX_TEMPLATES = 32  # beyond this, links are stored rather than derived
+
+KEYS = ['full_path', 'path', 'date_modified', 'kind', 'size', 'md5',
+        'sha256', 'id', 'name', 'url', 'links']
+
+
+class LinkTemplate(object):
+    """The links of one asset with its id replaced by a placeholder, so the
+    links of other assets can be recreated from their id alone
+    """
+    def __init__(self, links, asset_id):
+        self.patterns = tuple((key, url.split(asset_id))
+                              for key, url in sorted(links.items()))
+
+    def render(self, asset_id):
+        return dict((key, asset_id.join(parts))
+                    for key, parts in self.patterns)
+
+
+_templates = []
+
+
+def _find_template(links, asset_id):
+    """Returns a shared LinkTemplate that recreates these links (or None)
+    """
+    for template in _templates:
+        if template.render(asset_id) == links:
+            return template
+    if len(_templates) < MAX_TEMPLATES and asset_id and \
+            all(isinstance(url, str) for url in links.values()):
+        template = LinkTemplate(links, asset_id)
+        if template.render(asset_id) == links:
+            _templates.append(template)
+            return template
+    return None
+
+
+def _pack_digest(value):
+    """Hex digest to raw bytes (or None if that wouldn't round-trip)
+    """
+    try:
+        raw = binascii.unhexlify(value)
+    except (TypeError, ValueError, binascii.Error):
+        return None
+    if binascii.hexlify(raw).decode('ascii') != value:
+        return None  # e.g. upper-case hex
+    return raw
+
+
+class Asset(object):
+    """A compact, dict-compatible record for one file or folder in an index
+
+    Use `Asset.from_dict()` to create one and `to_dict()` (or `dict(asset)`)
+    to get a plain dict back. Keys other than the standard ones can be set
+    and are stored in a small dict of extras.
+    """
+    __slots__ = ('_folder', '_name', '_root', 'kind', 'date_modified',
+                 'size', '_md5', '_sha256', 'id', '_has_name', '_has_url',
+                 '_links', '_extra')
+
+    def __init__(self):
+        self._folder = self._name = ''
+        self._root = self.kind = self.date_modified = self.size = _UNSET
+        self._md5 = self._sha256 = self.id = self._links = _UNSET
+        self._has_name = self._has_url = False
+        self._extra = None
+
+    @classmethod
+    def from_dict(cls, d, root=None):
+        """Creates an Asset from an index entry (dict)
+
+        Parameters
+        ----------
+
+        d : dict
+            The index entry
+        root : str
+            The local root folder (to avoid storing `full_path` for each)
+
+        """
+        asset = cls()
+        # path, id and links first, as name, url and links depend on them
+        for key in ['path', 'id', 'links']:
+            if key in d:
+                asset[key] = d[key]
+        for key, value in d.items():
+            if key in ['path', 'id', 'links']:
+                continue
+            elif key == 'full_path' and root is not None and \
+                    value == os.path.join(root, d['path']):
+                asset._root = intern(root)
+            else:
+                asset[key] = value
+        return asset
+
+    def _get_extra(self, key):
+        if self._extra is None:
+            return _UNSET
+        return self._extra.get(key, _UNSET)
+
+    def _set_extra(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def _get(self, key):
+        """Returns the value for key or _UNSET
+        """
+        if key == 'path':
+            return self._folder + self._name
+        elif key == 'full_path':
+            if self._root is not _UNSET:
+                return os.path.join(self._root, self['path'])
+        elif key in ['kind', 'date_modified', 'size', 'id']:
+            return getattr(self, key)
+        elif key in ['md5', 'sha256']:
+            raw = getattr(self, '_'+key)
+            if raw is not _UNSET:
+                return binascii.hexlify(raw).decode('ascii')
+        elif key == 'name':
+            if self._has_name:
+                return os.path.basename(self['path'])
+        elif key == 'links':
+            if isinstance(self._links, LinkTemplate):
+                return self._links.render(self.id)
+            elif self._links is not _UNSET:
+                return self._links
+        elif key == 'url':
+            if self._has_url:
+                return self['links']['download']
+        return self._get_extra(key)
+
+    def __getitem__(self, key):
+        value = self._get(key)
+        if value is _UNSET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._materialize(key)
+        if key == 'path':
+            folder, sep, name = value.rpartition(os.sep)
+            if not sep and os.altsep:
+                folder, sep, name = value.rpartition(os.altsep)
+            if self._root is not _UNSET:  # full_path would now be wrong
+                self._set_extra('full_path', self['full_path'])
+                self._root = _UNSET
+            self._folder = intern(folder + sep)
+            self._name = name
+        elif key == 'kind':
+            self.kind = intern(value)
+        elif key in ['date_modified', 'size', 'id']:
+            setattr(self, key, value)
+        elif key in ['md5', 'sha256'] and _pack_digest(value) is not None:
+            setattr(self, '_'+key, _pack_digest(value))
+            self._pop_extra(key)
+        elif key == 'name' and value == os.path.basename(self['path']):
+            self._has_name = True
+            self._pop_extra(key)
+        elif key == 'links' and isinstance(value, dict) and \
+                isinstance(self.id, str):
+            self._links = _find_template(value, self.id) or value
+            self._pop_extra(key)
+        elif key == 'url' and self._links is not _UNSET and \
+                value == self['links'].get('download'):
+            self._has_url = True
+            self._pop_extra(key)
+        else:
+            # an extra, so any compact form of the key no longer applies
+            if key == 'full_path':
+                self._root = _UNSET
+            elif key in ['md5', 'sha256']:
+                setattr(self, '_'+key, _UNSET)
+            elif key == 'name':
+                self._has_name = False
+            elif key == 'url':
+                self._has_url = False
+            elif key == 'links':
+                self._links = _UNSET
+            self._set_extra(key, value)
+
+    def _materialize(self, key):
+        """Stores the values derived from `key` before it changes
+        """
+        if key == 'path' and self._has_name:
+            self._has_name = False
+            self._set_extra('name', self._name)
+        elif key in ['id', 'links'] and self._has_url:
+            self._set_extra('url', self['url'])
+            self._has_url = False
+        if key == 'id' and isinstance(self._links, LinkTemplate):
+            self._links = self['links']
+
+    def _pop_extra(self, key):
+        if self._extra is not None:
+            self._extra.pop(key, None)
+            if not self._extra:
+                self._extra = None
+
+    def __delitem__(self, key):
+        if self._get(key) is _UNSET:
+            raise KeyError(key)
+        if key in ['kind', 'date_modified', 'size', 'id']:
+            setattr(self, key, _UNSET)
+        elif key in ['md5', 'sha256']:
+            setattr(self, '_'+key, _UNSET)
+        elif key == 'name':
+            self._has_name = False
+        elif key == 'url':
+            self._has_url = False
+        elif key == 'links':
+            self._links = _UNSET
+        elif key == 'full_path' and self._root is not _UNSET:
+            self._root = _UNSET
+        elif key == 'path':
+            raise KeyError("An Asset always has a path")
+        self._pop_extra(key)
+
+    def __contains__(self, key):
+        return self._get(key) is not _UNSET
+
+    def get(self, key, default=None):
+        value = self._get(key)
+        if value is _UNSET:
+            return default
+        return value
+
+    def keys(self):
+        keys = [key for key in KEYS if self._get(key) is not _UNSET]
+        if self._extra:
+            keys.extend(key for key in self._extra if key not in keys)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def update(self, other):
+        for key, value in other.items():
+            self[key] = value
+
+    def to_dict(self):
+        """A plain dict of this asset (as stored in a json index)
+        """
+        return dict(self.items())
+
+    def copy(self):
+        new = Asset()
+        for slot in Asset.__slots__:
+            setattr(new, slot, getattr(self, slot))
+        if self._extra is not None:
+            new._extra = dict(self._extra)
+        return new
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        return (Asset.from_dict, (self.to_dict(),))
+
+    def __eq__(self, other):
+        if isinstance(other, (Asset, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Asset({!r})".format(self.to_dict())
+
+
+def as_dict(obj):
+    """For use as json.dump(default=as_dict) with indices holding Assets
+    """
+    if isinstance(obj, Asset):
+        return obj.to_dict()
+    raise TypeError("{!r} is not JSON serializable".format(obj))
+
+
+def compact_index(index, root=None):
+    """Converts the entries of an index to Assets
+    """
+    return [asset if isinstance(asset, Asset) else
+            Asset.from_dict(asset, root=root) for asset in index]
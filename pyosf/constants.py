@@ -19,5 +19,49 @@ PYOSF_FOLDER = path.join(home, '.pyosf')
 if sys.platform.startswith("linux") and not path.isfile(PYOSF_FOLDER):
     PYOSF_FOLDER = path.join(home, '.local', 'share', 'pyosf')
 
+# seconds for which cached remote folder listings are used without checking
+LISTING_CACHE_TTL = 0
+
+# seconds for which a validated token's user identity is trusted
+IDENTITY_TTL = 24 * 3600
+
+# seconds within which deferred Project.save() calls (by syncs) are coalesced
+SAVE_DELAY = 1.0
+
+# for pipeline.StreamingSync: the maximum number of folder listings (and of
+# transfers) waiting to be processed, and the number of transfer threads
+STREAM_QUEUE_SIZE = 64
+STREAM_WORKERS = 4
+
+# for manager.SyncManager: the number of projects scanned at once (their
+# transfers share a pool of STREAM_WORKERS threads)
+SYNC_SCANNERS = 2
+
+# for watch.WatchSync: the seconds without further changes to wait before
+# syncing the touched paths, and between scans when polling (no inotify)
+WATCH_DEBOUNCE = 1.0
+WATCH_POLL_INTERVAL = 5.0
+
+# for LocalFiles(incremental=True): the number of files whose hash state is
+# kept so that appends to them can be hashed on their own
+HASH_STATES = 256
+
+# for the sync journal: its completion records are flushed as written (so
+# they survive the process dying) but only fsync'ed (to survive a power cut)
+# every so many records or seconds
+JOURNAL_SYNC_RECORDS = 100
+JOURNAL_SYNC_INTERVAL = 1.0
+
+# for Changes.estimate(): the number of previous syncs whose bytes, requests
+# and time are kept (Project.sync_history), and the transfer rates assumed
+# until they tell otherwise (bytes/s and seconds per request)
+SYNC_HISTORY = 20
+DEFAULT_THROUGHPUT = 1000000
+DEFAULT_LATENCY = 0.3
+
+# the fewest files, all missing locally, for a remote folder to be fetched
+# as one zip archive rather than file by file (e.g. on the initial clone)
+ZIP_MIN_FILES = 20
+
 SHA = "md5"  # could switch to "sha256"
 PY3 = sys.version_info > (3,)
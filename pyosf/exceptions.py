@@ -17,9 +17,12 @@ class AuthError(Exception):
 
 
 class HTTPSError(Exception):
-    """Error connecting to web resource
+    """Error connecting to web resource (with the HTTP status_code of the
+    reply, if there was one)
     """
-    pass
+    def __init__(self, msg='', status_code=None):
+        Exception.__init__(self, msg)
+        self.status_code = status_code
 
 
 class OSFError(Exception):
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""A write-ahead journal of the operations of a sync, so that one that is
+interrupted (e.g. the process dies part way through `Changes.apply`) can be
+resumed without redoing the operations that completed
+
+The journal is a file next to the project file (see `journal_path`) with
+one json record per line: first the plan of the operations to apply,
+{action_type: {path: asset}}, then each change to the index as the
+operations complete ({'put': asset} or {'delete': path}). Each record is
+flushed as it is written, so it survives the process dying, but only the
+plan is fsync'ed at once: the completion records are fsync'ed in batches
+(see constants.JOURNAL_SYNC_RECORDS and JOURNAL_SYNC_INTERVAL). The file is
+removed once the project has been saved at the end of the sync.
+
+Loading a project only reads its journal (another process may still be
+writing it); the completed operations are folded into the index by
+`Project.resume()`.
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import json
+import time
+from collections import OrderedDict
+try:
+    from psychopy import logging
+except ImportError:
+    import logging
+from . import constants
+from .assets import as_dict
+
+
+def journal_path(project_file):
+    """The journal file of a project file
+    """
+    return project_file + '.journal'
+
+
+class Journal(object):
+    """The journal of a sync (see the module docs)
+
+    Parameters
+    ----------
+
+    path : str
+        The journal file (see `journal_path`)
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._n_unsynced = 0  # records written since the last fsync
+        self._synced_at = 0
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def start(self, plan):
+        """Starts a new journal (replacing any old one) with the plan of
+        operations, {action_type: {path: asset}}
+        """
+        self.close()
+        plan = dict((action_type, actions)
+                    for action_type, actions in plan.items() if actions)
+        self._file = open(self.path, 'w')
+        self._write({'plan': plan})
+        self.sync()
+
+    def put(self, asset):
+        """Records an asset (re)entered in the index
+        """
+        self._write({'put': asset})
+
+    def delete(self, path):
+        """Records a path removed from the index
+        """
+        self._write({'delete': path})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, default=as_dict) + '\n')
+        self._file.flush()
+        self._n_unsynced += 1
+        if self._n_unsynced >= constants.JOURNAL_SYNC_RECORDS or \
+                time.time() - self._synced_at >= \
+                constants.JOURNAL_SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        """Writes the records so far to disk (fsync)
+        """
+        if self._file is not None and self._n_unsynced:
+            os.fsync(self._file.fileno())
+            self._n_unsynced = 0
+            self._synced_at = time.time()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """Closes and removes the journal (once the index it records has
+        been saved in the project)
+        """
+        if self._file is not None:
+            self._file.close()  # (no need to fsync what's being removed)
+            self._file = None
+        if self.exists():
+            os.remove(self.path)
+
+    def load(self):
+        """Reads the journal, ignoring a last record that was only partly
+        written
+
+        Returns
+        ----------
+
+        tuple (plan, records) with the plan {action_type: {path: asset}}
+        and the index changes in the order they were made
+
+        """
+        plan = {}
+        records = []
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning("Ignoring an incomplete record in {}"
+                                    .format(self.path))
+                    break
+                if 'plan' in record:
+                    plan = record['plan']
+                else:
+                    records.append(record)
+        return plan, records
+
+
+def fold(index, records):
+    """Applies the index changes recorded in a journal to an index (a list
+    of assets) and returns the new index
+    """
+    assets = OrderedDict((asset['path'], asset) for asset in index)
+    for record in records:
+        if 'put' in record:
+            assets[record['put']['path']] = record['put']
+        else:
+            assets.pop(record['delete'], None)
+    return list(assets.values())
+
+
+def remaining(plan, records):
+    """The operations of the plan that the records don't show as completed
+    (deletions complete when the path leaves the index, all other
+    operations when their path is entered in it)
+
+    Returns a plan {action_type: {path: asset}} (empty if all completed)
+    """
+    put = set()
+    deleted = set()
+    for record in records:
+        if 'put' in record:
+            put.add(record['put']['path'])
+        else:
+            deleted.add(record['delete'])
+    left = {}
+    for action_type, actions in plan.items():
+        done = deleted if action_type.startswith('del') else put
+        actions = dict((path, asset) for path, asset in actions.items()
+                       if path not in done)
+        if actions:
+            left[action_type] = actions
+    return left
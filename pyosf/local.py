@@ -15,8 +15,12 @@ from __future__ import absolute_import, print_function
 import os
 from datetime import datetime
 import json
+import zlib
 import hashlib
+from collections import deque, OrderedDict
 from . import constants
+from .assets import Asset, as_dict
+from .tools import in_scope
 
 try:
     from psychopy import logging
@@ -25,7 +29,11 @@ except ImportError:
 
 
 class LocalFiles(object):
-    def __init__(self, root_path):
+    def __init__(self, root_path, compact=False, incremental=False):
+        self.compact = compact  # store entries as assets.Asset records
+        # keep the hash states of recent files to hash appends alone
+        self.incremental = incremental
+        self._hash_states = OrderedDict()  # path: _HashState (oldest first)
         # these should be reset when the path is set
         self.nFiles = 0
         self.nFolders = 0
@@ -34,45 +42,175 @@ class LocalFiles(object):
         self.root_path = root_path
         self._index = None
         self._needs_rebuild_index = False
+        self._known = {}
 
-    def rebuild_index(self):
+    def rebuild_index(self, known=None, scope=None):
+        """Scans the files again
+
+        Parameters
+        ----------
+
+        known : list
+            An index (e.g. from the last sync) whose hashes are reused for
+            files with the same size and modification date, rather than
+            reading those files again
+
+        scope : str
+            The path of a folder to scan (the index then holds just that
+            folder and its contents)
+
+        """
         logging.info("Indexing LocalFiles")
-        self._index = self._create_index()
+        if known:
+            self._known = dict((asset['path'], asset) for asset in known)
+        if not scope:
+            self._index = self._create_index()
+        elif os.path.isdir(os.path.join(self.root_path, scope)):
+            self._index = self._create_index(os.path.join(self.root_path,
+                                                          scope))
+        else:
+            self._index = []
+        self._known = {}
         self._needs_rebuild_index = False
 
+    def update(self, paths, known=None):
+        """Rescans just the given paths (files or folders relative to the
+        root, e.g. those touched since the last sync) rather than the whole
+        tree, patching the index if it has already been built
+
+        Parameters
+        ----------
+
+        paths : set
+            The paths to rescan (the contents of folders are rescanned too
+            and paths that no longer exist are dropped from the index)
+
+        known : list
+            An index whose hashes are reused for files with the same size
+            and modification date (see `rebuild_index`)
+
+        Returns
+        ----------
+
+        The index entries of the paths and their contents
+
+        """
+        if known:
+            self._known = dict((asset['path'], asset) for asset in known)
+        entries = []
+        for path in sorted(paths):
+            full_path = os.path.join(self.root_path, path)
+            if os.path.exists(full_path):
+                entries.extend(self._create_index(full_path))
+        self._known = {}
+        if self._index is not None and not self._needs_rebuild_index:
+            self._index = [asset for asset in self._index
+                           if not in_scope(asset['path'], paths)]
+            self._index.extend(entries)
+        return entries
+
     def _create_index(self, path=None):
         """Scans the tree of nodes recursively and returns
         file/folder details as a flat list of dicts
         """
         if path is None:
             path = self.root_path
+        if path is self.root_path:
+            files = []  # don't store root as a folder
+        else:
+            d = self._make_asset(path)
+            if d['kind'] == "file":
+                self.nFiles += 1
+                return [d]
+            files = [d]
+            self.nFolders += 1
+        # then find children as well
+        [files.extend(self._create_index(os.path.join(path, x)))
+            for x in os.listdir(path)]
+        return files
+
+    def _make_asset(self, path):
+        """The index entry for a single file or folder (given its full path)
+        """
         d = {}
         d['full_path'] = path
         d['path'] = os.path.relpath(path, self.root_path)
         d['date_modified'] = datetime.fromtimestamp(os.path.getmtime(path)
                                                     ).isoformat()
         if os.path.isdir(path):
-            if path is not self.root_path:  # don't store root as a folder
-                d['kind'] = "folder"
-                files = [d]
-                self.nFolders += 1
-            else:
-                files = []
-            # then find children as well
-            [files.extend(self._create_index(os.path.join(path, x)))
-                for x in os.listdir(path)]
-            return files
+            d['kind'] = "folder"
         else:
             d['kind'] = "file"
             try:
                 d['size'] = os.path.getsize(path)
             except:
                 d['size'] = 0
-            with open(path, "rb") as f:
+            known = self._known.get(d['path'])
+            # (downloads keep the remote date, with the local one noted)
+            if known is not None and known['kind'] == 'file' and \
+                    known.get('size') == d['size'] and \
+                    d['date_modified'] in [known.get('date_modified'),
+                                           known.get('local_modified')] and \
+                    constants.SHA in known:
+                d[constants.SHA] = known[constants.SHA]
+            else:
+                d[constants.SHA] = self._hash_file(path, d['path'])
+        return self._entry(d)
+
+    def _hash_file(self, path, rel_path):
+        """Returns the hex digest of a file
+
+        With `incremental` on (e.g. in watch mode) the hash state of the
+        most recently hashed files (constants.HASH_STATES of them) is kept
+        along with the number of bytes it has been fed, so that a file that
+        has only been appended to since (like a data file being written
+        during a session) is hashed by feeding just the new bytes. Only a
+        signature of the bytes hashed before is checked (see `_HashState`),
+        not the bytes themselves: files that were replaced, are no longer,
+        are as long (rewritten in place) or whose first or last hashed bytes
+        differ are hashed again in full, but an edit elsewhere in the old
+        bytes made along with an append would go unseen (turn `incremental`
+        off where that can happen)
+        """
+        with open(path, "rb") as f:
+            if not self.incremental:
                 hash_func = getattr(hashlib, constants.SHA.lower())
-                d[constants.SHA] = hash_func(f.read()).hexdigest()
-            self.nFiles += 1
-            return [d]
+                return hash_func(f.read()).hexdigest()
+            state = self._hash_states.pop(rel_path, None)
+            if state is not None and not state.matches(f):
+                logging.info("File rewritten (rehashing): {}"
+                             .format(rel_path))
+                state = None
+            if state is None:
+                state = _HashState()
+            state.feed(f)
+        self._hash_states[rel_path] = state
+        while len(self._hash_states) > constants.HASH_STATES:
+            self._hash_states.popitem(last=False)
+        return state.hasher.hexdigest()
+
+    def iter_folders(self):
+        """Scans the tree one folder at a time (breadth first), yielding
+        (folder, entries) for each: the folder's path relative to the root
+        ('' for the root itself) and the index entries of its direct
+        contents (files and folders)
+        """
+        folders = deque([self.root_path])
+        while folders:
+            folder = folders.popleft()
+            entries = [self._make_asset(os.path.join(folder, name))
+                       for name in sorted(os.listdir(folder))]
+            folders.extend(d['full_path'] for d in entries
+                           if d['kind'] == "folder")
+            if folder == self.root_path:
+                yield '', entries
+            else:
+                yield os.path.relpath(folder, self.root_path), entries
+
+    def _entry(self, d):
+        if self.compact:
+            return Asset.from_dict(d, root=self.root_path)
+        return d
 
     @property
     def index(self):
@@ -99,4 +237,54 @@ class LocalFiles(object):
         """Save the tree of this path to a json file
         """
         with open(filename, 'wb') as f:
-            json.dump(self.index, f, indent=2)
+            json.dump(self.index, f, indent=2, default=as_dict)
+
+
+class _HashState(object):
+    """The hash of a file's contents up to `offset`, with a cheap signature
+    of those bytes (the file's device and inode and a crc32 of the first and
+    of the last `window` bytes) to check that later versions of the file
+    only add to them
+    """
+    __slots__ = ['hasher', 'offset', 'file_id', 'head', 'tail']
+    chunk_size = 1024*1024
+    window = 4096
+
+    def __init__(self):
+        self.hasher = getattr(hashlib, constants.SHA.lower())()
+        self.offset = 0
+        self.file_id = None
+        self.head = self.tail = 0
+
+    def _windows(self, f):
+        """The crc32s of the first and last `window` bytes up to `offset`
+        """
+        size = min(self.window, self.offset)
+        f.seek(0)
+        head = zlib.crc32(f.read(size))
+        f.seek(self.offset - size)
+        return head, zlib.crc32(f.read(size))
+
+    def matches(self, f):
+        """Whether the open file is the one hashed so far with bytes added
+        (judged by its signature, reading just two windows of it)
+        """
+        stat = os.fstat(f.fileno())
+        if (stat.st_dev, stat.st_ino) != self.file_id or \
+                stat.st_size <= self.offset:
+            return False  # (replaced, truncated or rewritten in place)
+        return self._windows(f) == (self.head, self.tail)
+
+    def feed(self, f):
+        """Hashes the bytes of the open file after `offset`
+        """
+        stat = os.fstat(f.fileno())
+        self.file_id = (stat.st_dev, stat.st_ino)
+        f.seek(self.offset)
+        while True:
+            chunk = f.read(self.chunk_size)
+            if not chunk:
+                break
+            self.hasher.update(chunk)
+            self.offset += len(chunk)
+        self.head, self.tail = self._windows(f)
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""Syncs many projects at once with one shared pool of transfer threads
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import sys
+import time
+import threading
+from collections import deque
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+try:
+    from psychopy import logging
+except ImportError:
+    import logging
+from . import constants
+from .pipeline import STREAMED, make_container
+
+
+class SyncManager(object):
+    """Syncs many projects at once
+
+    The projects are scanned (local files and remote crawl) a few at a time
+    in threads of their own. As each scan completes its uploads and
+    downloads are fed, round-robin between the projects so that none is
+    starved, into one bounded queue worked by a pool of transfer threads
+    shared by all the projects. When a project's transfers are done its
+    moves and deletions are applied and it is saved.
+
+    A project that fails (e.g. it can't be reached) is reported as such
+    without stopping the others.
+
+    Parameters
+    ----------
+
+    projects : list of project.Project
+        The projects to sync (more can be added with `add()`)
+    workers : int
+        The number of transfer threads shared by all the projects (defaults
+        to constants.STREAM_WORKERS)
+    scanners : int
+        The number of projects scanned at once (defaults to
+        constants.SYNC_SCANNERS)
+    queue_size : int
+        The maximum number of transfers waiting for a thread (defaults to
+        constants.STREAM_QUEUE_SIZE)
+    order : str
+        The order of each project's file transfers: 'path' (default),
+        'smallest', 'largest' or 'newest' first (see `sync.transfer_order`)
+    priority : list
+        Globs of the files to transfer before the others, e.g.
+        ['data/*.csv']
+
+    """
+    def __init__(self, projects=(), workers=None, scanners=None,
+                 queue_size=None, order=None, priority=None):
+        if workers is None:
+            workers = constants.STREAM_WORKERS
+        if scanners is None:
+            scanners = constants.SYNC_SCANNERS
+        if queue_size is None:
+            queue_size = constants.STREAM_QUEUE_SIZE
+        self.projects = list(projects)
+        self.workers = workers
+        self.scanners = scanners
+        self.queue_size = queue_size
+        self.order = order
+        self.priority = priority
+        self._jobs = []
+        self._lock = threading.Lock()
+
+    def add(self, proj):
+        """Adds a project to be synced by the next `run()`
+        """
+        self.projects.append(proj)
+
+    def run(self):
+        """Syncs all the projects and returns the `report()`
+        """
+        self._jobs = [_ProjectSync(proj) for proj in self.projects]
+        to_scan = queue.Queue()
+        for job in self._jobs:
+            to_scan.put(job)
+        scanned = queue.Queue()
+        transfers = queue.Queue(maxsize=self.queue_size)
+        threads = [threading.Thread(target=self._scan,
+                                    args=(to_scan, scanned))
+                   for n in range(min(self.scanners, len(self._jobs)))]
+        workers = [threading.Thread(target=self._work, args=(transfers,))
+                   for n in range(self.workers)]
+        for thread in threads + workers:
+            thread.daemon = True
+            thread.start()
+        active = deque()  # scanned projects whose transfers aren't done
+        n_scanned = 0
+        try:
+            while n_scanned < len(self._jobs) or active:
+                try:
+                    while True:
+                        job = scanned.get_nowait()
+                        n_scanned += 1
+                        if self._start(job):
+                            active.append(job)
+                except queue.Empty:
+                    pass
+                n_fed = self._feed(active, transfers)
+                for job in list(active):
+                    job.changes.apply_pending()
+                    if job.error is not None:
+                        job.tasks.clear()  # (the rest won't be attempted)
+                    if not job.tasks and job.pending == 0:
+                        active.remove(job)
+                        self._finish(job)
+                if not n_fed:
+                    time.sleep(0.01)
+        finally:
+            for thread in workers:
+                transfers.put(None)
+            for thread in workers:
+                thread.join()
+        return self.report()
+
+    def _scan(self, to_scan, scanned):
+        """Creates the Changes for each project from the queue in turn
+        """
+        while True:
+            try:
+                job = to_scan.get_nowait()
+            except queue.Empty:
+                return
+            job.state = 'scanning'
+            job.times['start'] = time.time()
+            try:
+                job.changes = job.proj.get_changes(order=self.order,
+                                                   priority=self.priority)
+            except Exception:
+                job.error = sys.exc_info()
+            job.times['scanned'] = time.time()
+            scanned.put(job)
+
+    def _start(self, job):
+        """Creates the project's folders and lists its file transfers (the
+        rest waits for `_finish()`). Returns True if there are transfers
+        to wait for
+        """
+        if job.error is not None:
+            self._fail(job)
+            return False
+        changes = job.changes
+        changes.begin_apply()
+        job.state = 'transferring'
+        try:
+            for action_type in changes.change_types:
+                action_dict = getattr(changes, action_type)
+                for path in changes.apply_order(action_type):
+                    asset = action_dict[path]
+                    if action_type not in STREAMED:
+                        job.remaining[action_type][path] = asset
+                    elif asset['kind'] == 'folder':
+                        func_apply = getattr(changes,
+                                             "apply_{}".format(action_type))
+                        func_apply(asset, path)
+                    else:
+                        make_container(changes, action_type, path)
+                        job.tasks.append((job, action_type, asset, path))
+        except Exception:
+            job.error = sys.exc_info()
+            self._fail(job)
+            return False
+        job.n_transfers = len(job.tasks)
+        return True
+
+    def _feed(self, active, transfers):
+        """Queues the next transfer of each active project in turn until
+        the queue is full. Returns the number queued
+        """
+        n_fed = 0
+        while True:
+            waiting = [job for job in active if job.tasks]
+            if not waiting:
+                return n_fed
+            for job in waiting:
+                item = job.tasks.popleft()
+                with self._lock:
+                    job.pending += 1
+                try:
+                    transfers.put(item, timeout=0.01)
+                except queue.Full:
+                    job.tasks.appendleft(item)
+                    with self._lock:
+                        job.pending -= 1
+                    return n_fed
+                n_fed += 1
+
+    def _work(self, transfers):
+        """Applies transfers from the queue until given None
+        """
+        while True:
+            item = transfers.get()
+            if item is None:
+                return
+            job, action_type, asset, path = item
+            try:
+                if job.error is None:
+                    func_apply = getattr(job.changes,
+                                         "apply_{}".format(action_type))
+                    func_apply(asset, path, threaded=False)
+            except Exception:
+                job.error = sys.exc_info()
+            finally:
+                with self._lock:
+                    job.pending -= 1
+                    job.n_done += 1
+
+    def _finish(self, job):
+        """Applies the rest of the project's changes (moves, deletions)
+        and saves it
+        """
+        changes = job.changes
+        if job.error is None:
+            job.state = 'finishing'
+            for action_type in changes.change_types:
+                setattr(changes, action_type, job.remaining[action_type])
+            try:
+                changes.apply()
+            except Exception:
+                job.error = sys.exc_info()
+        if job.error is not None:
+            self._fail(job)
+            return
+        job.state = 'done'
+        job.times['end'] = time.time()
+        logging.info("SyncManager: synced {}".format(job.name))
+
+    def _fail(self, job):
+        job.state = 'failed'
+        job.times['end'] = time.time()
+        logging.error("SyncManager: sync of {} failed: {}"
+                      .format(job.name, job.error[1]))
+        if job.changes is not None:
+            try:  # keep what was done (the index of the transfers so far)
+                job.changes.apply_pending()
+                job.changes.finish_sync()
+            except Exception:
+                pass
+
+    def progress(self):
+        """The transfers done and in total, over all the projects (the
+        totals grow as the projects are scanned) as a dict:
+        {'done': n, 'total': n, 'projects': {name: (state, done, total)}}
+        """
+        projects = dict((job.name, (job.state, job.n_done, job.n_transfers))
+                        for job in self._jobs)
+        return {'done': sum(job.n_done for job in self._jobs),
+                'total': sum(job.n_transfers for job in self._jobs),
+                'projects': projects}
+
+    def report(self):
+        """A dict per project (in the order they were given) with its name,
+        state ('waiting', 'scanning', 'transferring', 'finishing', 'done' or
+        'failed'), the number of transfers done (n_done) and found
+        (n_transfers), the error (if it failed) and the seconds taken
+        """
+        report = []
+        for job in self._jobs:
+            times = job.times
+            if 'start' in times:
+                seconds = times.get('end', time.time()) - times['start']
+            else:
+                seconds = 0
+            report.append({'project': job.name, 'state': job.state,
+                           'n_done': job.n_done,
+                           'n_transfers': job.n_transfers,
+                           'error': job.error and job.error[1],
+                           'seconds': seconds})
+        return report
+
+
+class _ProjectSync(object):
+    """The state of one project's sync in a SyncManager
+    """
+    def __init__(self, proj):
+        self.proj = proj
+        self.name = proj.name or proj.project_file
+        self.state = 'waiting'
+        self.changes = None
+        self.error = None  # the sys.exc_info() of a failure
+        self.tasks = deque()  # transfers waiting to be queued
+        self.pending = 0  # transfers queued but not finished
+        self.n_transfers = 0
+        self.n_done = 0
+        self.remaining = dict((action_type, {}) for action_type in
+                              ['add_local', 'add_remote', 'mv_local',
+                               'mv_remote', 'update_local', 'update_remote',
+                               'del_local', 'del_remote'])
+        self.times = {}
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""A sync in which the scanning, the analysis and the transfers overlap
+
+The local files and the remote project are each scanned one folder at a
+time by a thread of their own. The folder listings are analyzed as soon as
+both sides of a folder are known, and the uploads/downloads that this finds
+are handed straight to a pool of transfer threads, so the first transfers
+start long before the last folder has been listed
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import sys
+import time
+import threading
+from collections import defaultdict
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+try:
+    from psychopy import logging
+except ImportError:
+    import logging
+from . import constants, sync
+
+# the change dicts whose items are sent to the transfer threads as they
+# are found (the moves and deletions wait until all is known)
+STREAMED = ['add_local', 'add_remote', 'update_local', 'update_remote']
+SIDES = ['local', 'remote']
+
+
+class StreamingSync(object):
+    """Syncs a project with scanning, analysis and transfers overlapping
+
+    Memory use is bounded by the two queues (folder listings waiting to be
+    analyzed and transfers waiting for a thread), plus the listings of one
+    side that has got ahead of the other.
+
+    Deletions and moves are only applied once both sides have been scanned
+    completely, as are folders deleted on one side (whose remote dates
+    depend on their whole contents). The result is the same as that of
+    `proj.get_changes().apply()`
+
+    Parameters
+    ----------
+
+    proj : project.Project
+        The project to sync
+    queue_size : int
+        The maximum number of folder listings and of transfers waiting in
+        the queues (defaults to constants.STREAM_QUEUE_SIZE)
+    workers : int
+        The number of transfer threads (defaults to constants.STREAM_WORKERS)
+
+    """
+    def __init__(self, proj, queue_size=None, workers=None):
+        if queue_size is None:
+            queue_size = constants.STREAM_QUEUE_SIZE
+        if workers is None:
+            workers = constants.STREAM_WORKERS
+        self.proj = proj
+        self.queue_size = queue_size
+        self.workers = workers
+        self.changes = None
+        self.stats = {}  # times (time.time()) and counts of the last run()
+
+    def run(self):
+        """Performs the sync and returns the (applied) sync.Changes
+        """
+        proj = self.proj
+        osf = proj.osf
+        if osf.children:  # child nodes are only crawled as a whole
+            logging.info("StreamingSync: project has child nodes so using "
+                         "a standard sync")
+            changes = self.changes = proj.get_changes()
+            changes.apply()
+            return changes
+        self.stats = {'start': time.time(), 'first_transfer': None,
+                      'n_transfers': 0, 'n_listings': 0}
+        # fetch the cursor *before* crawling so no changes can be missed
+        cursor = osf._latest_log_cursor() if proj.remote_delta else None
+        changes = self.changes = sync.Changes(proj, scan=False)
+        proj.connected = True
+        # the root needs no creating (nor a crawl to find it)
+        osf.containers = {'': osf.as_asset()}
+        self._setup(changes)
+        listings = queue.Queue(maxsize=self.queue_size)
+        scanners = [threading.Thread(target=self._scan,
+                                     args=(side, source, listings))
+                    for side, source in [('local', proj.local),
+                                         ('remote', osf)]]
+        self._transfers = queue.Queue(maxsize=self.queue_size)
+        self._error = None
+        workers = [threading.Thread(target=self._work)
+                   for n in range(self.workers)]
+        for thread in scanners + workers:
+            thread.daemon = True
+            thread.start()
+        try:
+            n_scanning = len(scanners)
+            while n_scanning:
+                side, folder, assets = listings.get()
+                if side == 'error':
+                    raise_error(assets)
+                elif folder is None:
+                    n_scanning -= 1
+                else:
+                    self.stats['n_listings'] += 1
+                    self._add_listing(side, folder, assets)
+                changes.apply_pending()
+                if self._error is not None:
+                    raise_error(self._error)
+            self.stats['scanned'] = time.time()
+            # now the folder dates can be found from their contents
+            created = dict(osf.containers)
+            osf._set_index(list(changes._remote_p.values()))
+            for path, asset in created.items():
+                osf.containers.setdefault(path, asset)
+            self._finish_analysis()
+        finally:
+            for thread in workers:
+                self._transfers.put(None)
+            for thread in workers:
+                thread.join()
+        if self._error is not None:
+            raise_error(self._error)
+        self.stats['transferred'] = time.time()
+        if proj.remote_delta:
+            proj.remote_index = osf.index
+            proj.log_cursor = cursor
+        # the rest (mv, del and any deferred) as a standard sync
+        for action_type in changes._change_types:
+            setattr(changes, action_type, self._pending[action_type])
+        changes.apply()
+        self.stats['end'] = time.time()
+        return changes
+
+    def _setup(self, changes):
+        self._listed = dict((side, {}) for side in SIDES)  # folder: paths
+        self._absent = dict((side, set()) for side in SIDES)
+        self._done = set()  # folders whose contents have been analyzed
+        self._resolved = set()
+        self._pending = dict((action_type, {})
+                             for action_type in changes._change_types)
+        # the last index grouped by folder
+        self._last_children = defaultdict(list)
+        for path in changes._last_p:
+            self._last_children[os.path.dirname(path)].append(path)
+
+    def _scan(self, side, source, listings):
+        """Puts (side, folder, assets) for each folder on the listings queue
+        and (side, None, None) at the end
+        """
+        try:
+            for folder, assets in source.iter_folders():
+                listings.put((side, folder, assets))
+            listings.put((side, None, None))
+        except Exception:
+            listings.put(('error', None, sys.exc_info()))
+
+    def _work(self):
+        """Applies transfers from the queue until given None
+        """
+        while True:
+            item = self._transfers.get()
+            if item is None:
+                return
+            elif self._error is not None:
+                continue  # just empty the queue
+            action_type, asset, path = item
+            if self.stats['first_transfer'] is None:
+                self.stats['first_transfer'] = time.time()
+            try:
+                func_apply = getattr(self.changes,
+                                     "apply_{}".format(action_type))
+                func_apply(asset, path, threaded=False)
+            except Exception:
+                self._error = sys.exc_info()
+
+    def _add_listing(self, side, folder, assets):
+        paths = self.changes._local_p if side == 'local' \
+            else self.changes._remote_p
+        for asset in assets:
+            paths[asset['path']] = asset
+        self._listed[side][folder] = [asset['path'] for asset in assets]
+        self._analyze_ready(folder)
+
+    def _is_ready(self, folder):
+        if folder in self._done:
+            return False
+        if folder != '' and os.path.dirname(folder) not in self._done:
+            return False  # the folder itself hasn't been analyzed yet
+        return all(folder in self._listed[side] or
+                   folder in self._absent[side] for side in SIDES)
+
+    def _analyze_ready(self, folder):
+        """Analyzes the contents of folder, if both sides are known, and
+        then of any of its sub-folders that are ready as a result
+        """
+        changes = self.changes
+        to_check = [folder]
+        while to_check:
+            folder = to_check.pop()
+            if not self._is_ready(folder):
+                continue
+            self._done.add(folder)
+            children = set(self._last_children.pop(folder, []))
+            for side in SIDES:
+                children.update(self._listed[side].get(folder, []))
+            found = {}  # this sub-round's changes, to apply/dispatch
+            for action_type in changes._change_types:
+                setattr(changes, action_type, {})
+            for path in sorted(children):
+                assets = [changes._last_p.get(path),
+                          changes._local_p.get(path),
+                          changes._remote_p.get(path)]
+                kinds = set(asset['kind'] for asset in assets if asset)
+                if 'folder' in kinds:
+                    for side, asset in zip(SIDES, assets[1:]):
+                        if asset is None:
+                            self._absent[side].add(path)
+                    to_check.append(path)
+                    if assets[0] is not None and assets[1] is None and \
+                            assets[2] is not None:
+                        continue  # code:101 needs the remote folder's date
+                self._resolve(path, *assets)
+            for action_type in changes._change_types:
+                found[action_type] = getattr(changes, action_type)
+            self._dispatch(found)
+
+    def _resolve(self, path, asset, local_asset, remote_asset):
+        self._resolved.add(path)
+        if self.changes._resolve(path, asset, local_asset, remote_asset):
+            self.changes.remove_from_index(path)
+
+    def _dispatch(self, found):
+        """Folders are created here and now (before their contents), files
+        are sent to the transfer threads and the rest waits until the end
+        """
+        changes = self.changes
+        for action_type in changes._change_types:
+            for path in changes.apply_order(action_type, found[action_type]):
+                asset = found[action_type][path]
+                if action_type not in STREAMED:
+                    self._pending[action_type][path] = asset
+                elif asset['kind'] == 'folder':
+                    func_apply = getattr(changes,
+                                         "apply_{}".format(action_type))
+                    func_apply(asset, path)
+                else:
+                    make_container(changes, action_type, path)
+                    self._transfers.put((action_type, asset, path))
+                    self.stats['n_transfers'] += 1
+
+    def _finish_analysis(self):
+        """Analyzes whatever couldn't be while scanning: the folders that
+        were deferred and anything not found in the listings (which the
+        changes then apply as usual)
+        """
+        changes = self.changes
+        for action_type in changes._change_types:
+            setattr(changes, action_type, {})
+        remaining = set(changes._last_p)
+        remaining.update(changes._local_p)
+        remaining.update(changes._remote_p)
+        remaining.difference_update(self._resolved)
+        for path in sorted(remaining):
+            self._resolve(path, changes._last_p.get(path),
+                          changes._local_p.get(path),
+                          changes._remote_p.get(path))
+        if remaining:
+            logging.debug("StreamingSync: {} paths analyzed after the scan"
+                          .format(len(remaining)))
+        for action_type in changes._change_types:
+            self._pending[action_type].update(getattr(changes, action_type))
+
+
+def make_container(changes, action_type, path):
+    """Creates any missing folder for a file transfer (from the thread that
+    queues it) so that the transfer threads never race to create the same
+    folder
+    """
+    proj = changes.proj()
+    if action_type == 'add_local':
+        container = os.path.dirname(os.path.join(proj.local.root_path, path))
+        if not os.path.isdir(container):
+            changes._make_dirs(container)
+    elif action_type == 'add_remote':
+        proj.osf.add_container(os.path.dirname(path), changes=changes)
+
+
+def raise_error(exc_info):
+    """Raises an exception caught in another thread (with its traceback)
+    """
+    exc_type, value, traceback = exc_info
+    if hasattr(value, 'with_traceback'):
+        raise value.with_traceback(traceback)
+    raise value
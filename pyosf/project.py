@@ -17,16 +17,42 @@ Created on Sun Feb  7 21:31:15 2016
 from __future__ import absolute_import, print_function
 import os
 import sys
+import time
+import atexit
+import weakref
+import threading
 import requests
 try:
     from psychopy import logging
 except:
     import logging
-from . import remote, local, sync
+from . import (remote, local, sync, store, constants, pipeline, watch,
+               journal)
+from .assets import as_dict, compact_index
+from .tools import atomic_write, start_logfile
 import json
 
 PY3 = sys.version_info > (3,)
 
+# changing any of these attributes means the project needs saving
+SAVED_FIELDS = ['root_path', 'name', 'username', 'project_id', 'index',
+                'remote_index', 'log_cursor', 'sync_history']
+_unsaved_projects = weakref.WeakSet()  # projects with a deferred save
+
+
+def _flush_project(proj_ref):
+    """Performs a deferred save (if the project still exists)
+    """
+    proj = proj_ref()
+    if proj is not None:
+        proj.flush()
+
+
+@atexit.register
+def _flush_all():
+    for proj in list(_unsaved_projects):
+        proj.flush()
+
 
 class Project(object):
     """Stores the project information for synchronization.
@@ -38,7 +64,9 @@ class Project(object):
     ----------
 
     project_file : str
-        Location of the project file with info
+        Location of the project file with info. If this has a .db/.sqlite
+        extension the project is stored with `store.SQLiteStore` rather than
+        as a json file
 
     root_path : str
         The root of the folder where the local files are situated
@@ -46,18 +74,57 @@ class Project(object):
     osf : pyosf.remote.OSFProject instance)
         The remote project that will be synchronised.
 
+    remote_delta : bool
+        If True the remote index is stored in the project file and, on the
+        next sync, brought up to date from the OSF node logs rather than by
+        crawling all the remote folders again
+
+    listing_cache_ttl : float or None
+        If not None the remote folder listings are cached on disk (see
+        `remote.ListingCache`) and trusted for this many seconds before being
+        revalidated with the server
+
+    save_delay : float
+        Deferred saves (`save(defer=True)`, as made by each sync) within this
+        many seconds of the previous write are coalesced into a single write
+        (json project files only)
+
+    compact : bool
+        If True the indices hold `assets.Asset` records rather than dicts,
+        which use much less memory for very large projects
+
     """
     def __init__(self, project_file=None, root_path=None, osf=None,
-                 name='', autosave=True):
+                 name='', autosave=True, remote_delta=False,
+                 listing_cache_ttl=None, save_delay=constants.SAVE_DELAY,
+                 compact=False):
+        start_logfile()
+        # track changes to the saved fields (see __setattr__)
+        self._generation = 0
+        self._saved_generation = -1  # never saved
+        self._last_write = 0
+        self._save_timer = None
+        self._save_lock = threading.RLock()
+        self.save_delay = save_delay
         self.autosave = autosave  # try to save file automatically on __del__
+        self.remote_delta = remote_delta
+        self.listing_cache_ttl = listing_cache_ttl
+        self.compact = compact
         self.project_file = project_file
         self.root_path = root_path  # overwrite previous (indexed) location
         self.name = name  # not needed but allows storing a short descr name
         # these will be update from project file loading if it exists
         self.index = []
+        self.remote_index = []  # only stored when using remote_delta
+        self.log_cursor = None
+        self.sync_history = []  # bytes, requests and seconds of past syncs
         self.username = None
         self.project_id = None
+        self.store = None  # an SQLiteStore if project_file is a database
+        self._shared_session = None  # from remote.sessions (to release)
         self.connected = False  # have we gone online yet?
+        self.unfinished = None  # the plan left by an interrupted sync
+        self._journal_records = None  # and the index changes it made
         # load the project file (if exists) for info about previous sync
         if project_file:
             self.load(project_file)
@@ -74,17 +141,61 @@ class Project(object):
             logging.warn("Project file failed to load a root_path "
                          "for the local files and none was provided")
 
-        self.osf = osf  # the self.osf is as property set on-access
+        if osf is None:
+            self._osf = None  # created (going online) when first needed
+        else:
+            self.osf = osf  # the self.osf is as property set on-access
 
     def __repr__(self):
         return "Project({})".format(self.project_file)
 
     def __del__(self):
-        if self.autosave:
-            self.save()
+        if self.autosave or self._save_timer is not None:
+            self.flush()  # (a deferred save is never lost)
+        self._release_session()
+
+    def close(self):
+        """Performs any deferred save and releases the shared Session (if
+        the project created its osf from the username)
+        """
+        self.flush()
+        self._release_session()
 
-    def save(self, proj_path=None):
-        """Save the project to a json-format file
+    def _release_session(self):
+        session = self.__dict__.get('_shared_session')
+        if session is not None:
+            self._shared_session = None
+            remote.sessions.release(session)
+
+    def __setattr__(self, name, value):
+        if name in SAVED_FIELDS and \
+                (name not in self.__dict__ or self.__dict__[name] != value):
+            self.__dict__['_generation'] = self.__dict__['_generation'] + 1
+        object.__setattr__(self, name, value)
+
+    @property
+    def dirty(self):
+        """True if the project has changed since it was last saved/loaded
+        """
+        return self._generation != self._saved_generation
+
+    def mark_dirty(self):
+        """Call this after changing the `index` in place (changes made by
+        assigning attributes are detected automatically)
+        """
+        self._generation += 1
+
+    def _get_store(self, proj_path):
+        """Returns the SQLiteStore for proj_path (or None for json files)
+        """
+        if not store.is_sqlite_path(proj_path):
+            return None
+        if self.store is None or self.store.filename != proj_path:
+            self.store = store.SQLiteStore(proj_path)
+        return self.store
+
+    def save(self, proj_path=None, force=False, defer=False):
+        """Save the project to a json-format file (or SQLite database)
 
         The info will be:
             - the `username` (so `remote.Project` can fetch an auth token)
@@ -92,6 +203,16 @@ class Project(object):
             - the `root_path`
             - the current files `index`
             - a optional short `name` for the project
+            - the `remote_index` and `log_cursor` (if using `remote_delta`)
+            - the `sync_history` (see `sync.Changes.estimate`)
+
+        Nothing is written if the project hasn't changed since it was last
+        saved or loaded. With `defer` (as used by each sync) saves within
+        `save_delay` seconds of the previous write are deferred (and
+        coalesced) until the end of that window, until `flush()` is called
+        or until the project is deleted. An SQLite project is always saved
+        at once: its save writes just the index changes, and a timer thread
+        sharing the connection could commit a sync's changes half-applied.
 
         Parameters
         ----------
@@ -99,7 +220,56 @@ class Project(object):
         proj_path : str
             Not needed unless saving to a new location.
 
+        force : bool
+            Write immediately even if nothing has changed
+
+        defer : bool
+            Coalesce this save with others within `save_delay` seconds
+
+        Returns
+        ----------
+
+        True if the file was written now
+
+        """
+        if proj_path not in [None, self.project_file] or force:
+            return self._write(proj_path)
+        if not self.dirty:
+            return False
+        wait = self._last_write + self.save_delay - time.time()
+        if wait <= 0 or not defer or store.is_sqlite_path(self.project_file):
+            return self._write()
+        with self._save_lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(
+                    wait, _flush_project, [weakref.ref(self)])
+                self._save_timer.daemon = True
+                self._save_timer.start()
+                _unsaved_projects.add(self)
+        return False
+
+    def flush(self):
+        """Performs any deferred save now (if the project has changed)
         """
+        if self.dirty and self.project_file:
+            self._write()
+
+    def _write(self, proj_path=None):
+        """Does the actual save (atomically, via a temporary file)
+        """
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+                _unsaved_projects.discard(self)
+            generation = self._generation
+            self._save(proj_path)
+            if proj_path in [None, self.project_file]:
+                self._saved_generation = generation
+            self._last_write = time.time()
+        return True
+
+    def _save(self, proj_path=None):
         if proj_path is None:
             proj_path = self.project_file
         if not os.path.isdir(os.path.dirname(proj_path)):
@@ -112,14 +282,23 @@ class Project(object):
         d['name'] = self.name
         d['username'] = self.username
         d['project_id'] = self.project_id
+        d['sync_history'] = self.sync_history
+        if self.remote_delta:
+            d['log_cursor'] = self.log_cursor
+        db = self._get_store(proj_path)
+        if db is not None:
+            # only the assets that differ from the database are written
+            db.save_index(self.index)
+            if self.remote_delta:
+                db.save_index(self.remote_index, 'remote_index')
+            db.save_info(d)
+            logging.info("Saved proj database: {}".format(proj_path))
+            return
         d['index'] = self.index
+        if self.remote_delta:
+            d['remote_index'] = self.remote_index
         # do the actual file save
-        with open(proj_path, 'wb') as f:
-            json_str = json.dumps(d, indent=2)
-            if PY3:
-                f.write(bytes(json_str, 'UTF-8'))
-            else:
-                f.write(json_str)
+        atomic_write(proj_path, json.dumps(d, indent=2, default=as_dict))
         logging.info("Saved proj file: {}".format(proj_path))
 
     def load(self, proj_path=None):
@@ -150,8 +329,13 @@ class Project(object):
         elif not os.path.isfile(os.path.abspath(proj_path)):  # path not found
             logging.warn('No proj file: {}'.format(os.path.abspath(proj_path)))
         else:
-            with open(os.path.abspath(proj_path), 'r') as f:
-                d = json.load(f)
+            db = self._get_store(proj_path)
+            if db is not None:
+                d = db.load()
+                d['index'] = d.pop('last_index')
+            else:
+                with open(os.path.abspath(proj_path), 'r') as f:
+                    d = json.load(f)
             self.username = d['username']
             self.index = d['index']
             self.project_id = d['project_id']
@@ -160,15 +344,224 @@ class Project(object):
                 self.name = d['name']
             else:
                 self.name = ''
+            self.remote_index = d.get('remote_index', [])
+            if self.compact:
+                self.index = compact_index(self.index)
+                self.remote_index = compact_index(self.remote_index)
+            self.log_cursor = d.get('log_cursor')
+            self.sync_history = d.get('sync_history', [])
+            self._saved_generation = self._generation
             logging.info('Loaded proj: {}'.format(os.path.abspath(proj_path)))
+        self._load_journal(proj_path)
+
+    def _load_journal(self, proj_path):
+        """Finds the journal of a sync that was interrupted (if any) and
+        keeps the rest of its plan as `unfinished` for `resume()`
+
+        Nothing is written: the journal may belong to a sync still running
+        in another process, so the index changes of the operations that
+        completed are only folded into the index by `resume()`
+        """
+        sync_journal = journal.Journal(journal.journal_path(proj_path))
+        if not sync_journal.exists():
+            return
+        plan, records = sync_journal.load()
+        self.unfinished = journal.remaining(plan, records) or None
+        self._journal_records = records
+        logging.warning("Found the journal of an interrupted sync: {} index "
+                        "changes were made and {} operations remain"
+                        .format(len(records),
+                                sum(len(actions) for actions in
+                                    (self.unfinished or {}).values())))
+
+    def migrate_to_sqlite(self, db_path=None):
+        """Switches this project from a json project file to an SQLite
+        database (see `store.SQLiteStore`) and saves it there
 
-    def get_changes(self):
+        Parameters
+        ----------
+
+        db_path : str
+            The new database (defaults to the project_file with a .db
+            extension)
+
+        """
+        if db_path is None:
+            db_path = os.path.splitext(self.project_file)[0] + '.db'
+        self.project_file = db_path
+        self.save(force=True)
+        return db_path
+
+    def get_changes(self, remote=True, engine=None, mirror=False,
+                    scope=None, paths=None, order=None, priority=None):
         """Return the changes to be applied
+
+        Parameters
+        ----------
+
+        remote : bool
+            If False only the local files are compared with the index from
+            the last sync, without going online. The local additions, updates
+            and deletions waiting to be synced are then in the `add_remote`,
+            `update_remote` and `del_remote` of the (unappliable) Changes
+
+        engine : str
+            'dict' (default), 'merge' or 'numpy' (see `sync.Changes.analyze`)
+
+        mirror : bool
+            If True only the changes that make the local files a copy of the
+            remote are found (see `pull`)
+
+        scope : str
+            The path of a folder (e.g. "data/station3") to sync on its own:
+            only it is scanned locally, crawled remotely (starting from its
+            own listing) and analyzed, and the index entries outside it are
+            kept untouched
+
+        paths : list
+            The paths (files or folders) to sync on their own, e.g. those
+            touched since the last sync: just they are rescanned (patching
+            the local index), looked up remotely and analyzed
+
+        order : str
+            The order of the files of each kind of transfer: 'path'
+            (default), 'smallest', 'largest' or 'newest' first (see
+            `sync.transfer_order`)
+
+        priority : list
+            Globs of the files to transfer before the others, e.g.
+            ['data/*.csv']
+
         """
-        changes = sync.Changes(proj=self)
-        self.connected = True  # we had to go online to get changes
+        changes = sync.Changes(proj=self, remote=remote, engine=engine,
+                               mirror=mirror, scope=scope, paths=paths,
+                               order=order, priority=priority)
+        if remote:
+            self.connected = True  # we had to go online to get changes
         return changes
 
+    def pull(self, threaded=False):
+        """Makes the local files a read-only mirror of the remote project:
+        local files are checked by size and date only (hashing just the new
+        or changed ones), remote changes are downloaded (as zip archives
+        where whole folders are missing), local edits and deletions are
+        overwritten from the remote, and nothing is ever written to the
+        remote
+
+        Parameters
+        ----------
+
+        threaded : bool
+            Whether to download in a thread (then follow `changes.progress`
+            and call `changes.finish_sync()` when it is done)
+
+        Returns
+        ----------
+
+        The sync.Changes that were applied
+
+        """
+        changes = self.get_changes(mirror=True)
+        changes.apply(threaded=threaded)
+        return changes
+
+    def push(self):
+        """Uploads the files added or changed locally since the last sync
+        without listing the remote project first (for machines that only
+        ever add data). Files whose size and date are unchanged aren't even
+        hashed, and local deletions aren't pushed (see `sync.Changes.push`)
+
+        Returns
+        ----------
+
+        A list of strings about what was uploaded
+
+        """
+        changes = sync.Changes(proj=self, remote=False)
+        actions = changes.push()
+        self.connected = True
+        return actions
+
+    def streaming_sync(self, queue_size=None, workers=None):
+        """Syncs the project with the scanning, analysis and transfers
+        overlapping (see `pipeline.StreamingSync`), so that transfers start
+        before the whole of a large project has been listed
+
+        Parameters
+        ----------
+
+        queue_size : int
+            The maximum number of folder listings and of transfers waiting
+            to be processed (defaults to constants.STREAM_QUEUE_SIZE)
+
+        workers : int
+            The number of transfer threads (defaults to
+            constants.STREAM_WORKERS)
+
+        Returns
+        ----------
+
+        The (applied) sync.Changes
+
+        """
+        return pipeline.StreamingSync(self, queue_size=queue_size,
+                                      workers=workers).run()
+
+    def resume(self, threaded=False):
+        """Applies just the operations left by a sync that was interrupted
+        (found in its journal when the project was loaded, see
+        `unfinished`) without scanning or crawling
+
+        The index changes of the operations that completed are first folded
+        into the index and saved (so they are kept even if this is
+        interrupted too)
+
+        Returns a list of the actions as "action_type: path" (empty if
+        there was nothing to resume)
+        """
+        if self._journal_records is None:  # (no journal was found)
+            return []
+        records = self._journal_records
+        self._journal_records = None
+        if records:
+            self.index = journal.fold(self.index, records)
+            if self.compact:
+                self.index = compact_index(self.index)
+            self.save()
+        if not self.unfinished:
+            sync_journal = journal.Journal(
+                journal.journal_path(self.project_file))
+            sync_journal.finish()  # (if it's still there)
+            return []
+        changes = sync.Changes(proj=self, scan=False)
+        actions = changes.load_plan(self.unfinished)
+        changes.apply(threaded=threaded)
+        self.unfinished = None
+        self.connected = True
+        return actions
+
+    def watch(self, debounce=None, poll_interval=None, inotify=True):
+        """Returns a watch.WatchSync that syncs the local files as they
+        change (just the touched paths) once started with its `run()`
+
+        Parameters
+        ----------
+
+        debounce : float
+            The seconds without further changes to wait before syncing
+            (defaults to constants.WATCH_DEBOUNCE)
+
+        poll_interval : float
+            The seconds between scans where inotify isn't available
+            (defaults to constants.WATCH_POLL_INTERVAL)
+
+        inotify : bool
+            Whether to use inotify (on Linux) rather than polling
+
+        """
+        return watch.WatchSync(self, debounce=debounce,
+                               poll_interval=poll_interval, inotify=inotify)
+
     @property
     def osf(self):
         """Get/sets the osf attribute. When
@@ -181,29 +574,44 @@ class Project(object):
     @osf.setter
     def osf(self, project):
         if isinstance(project, remote.OSFProject):
+            if project.session is not self.__dict__.get('_shared_session'):
+                self._release_session()
             self._osf = project
             self.username = self._osf.session.username
             self.project_id = self._osf.id
+            self._osf_options()
         elif self.username is None:  # if no project then we need username
             raise AttributeError("No osf project was provided but also "
                                  "no username or authentication token: {}"
                                  .format(project))
-        else:  # with username create session and then project
+        elif self.project_id is None:
+            raise AttributeError("No project id was available. "
+                                 "Project needs OSFProject or a "
+                                 "previous project_file"
+                                 .format(project))
+        else:  # with username get a (shared) session and then project
+            self._release_session()  # in case we had a previous one
+            self._shared_session = remote.sessions.get(self.username)
             try:
-                session = remote.Session(self.username)
+                self._osf = remote.OSFProject(session=self._shared_session,
+                                              id=self.project_id)
             except requests.exceptions.ConnectionError:
                 self._osf = None
                 self.connected = False
                 return
-            if self.project_id is None:
-                raise AttributeError("No project id was available. "
-                                     "Project needs OSFProject or a "
-                                     "previous project_file"
-                                     .format(project))
-            else:
-                self._osf = remote.OSFProject(session=session,
-                                              id=self.project_id)
-                self.connected = True
+            self._osf_options()
+            self.connected = True
+
+    def _osf_options(self):
+        """Gives the osf project a listing cache and compact index entries
+        if they were requested
+        """
+        if self.compact:
+            self._osf.compact = True
+        if self.listing_cache_ttl is not None and \
+                self._osf.listing_cache is None:
+            self._osf.listing_cache = remote.ListingCache(
+                self.project_id, ttl=self.listing_cache_ttl)
 
     @property
     def root_path(self):
@@ -215,4 +623,4 @@ class Project(object):
         if root_path is None:
             self.local = None
         else:
-            self.local = local.LocalFiles(root_path)
+            self.local = local.LocalFiles(root_path, compact=self.compact)
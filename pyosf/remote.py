@@ -15,18 +15,23 @@ from __future__ import absolute_import, print_function
 
 import os
 import weakref
+import functools
 import requests
 import threading
 import json
 import datetime
 import time
 import hashlib
+import copy
+from collections import OrderedDict, deque
 try:
     from psychopy import logging
 except ImportError:
     import logging
 from . import constants
-from .tools import dict_from_list, find_by_key
+from .assets import compact_index
+from .tools import (dict_from_list, find_by_key, atomic_write, folder_dates,
+                    start_logfile)
 from . import exceptions
 
 # for the status of the PushPullThread
@@ -36,12 +41,25 @@ FINISHED = -1
 
 default_chunk_size = 65536  # 65Kb
 
+# node log actions that change files in osfstorage (and how)
+LOG_FILE_ACTIONS = {
+    'osf_storage_file_added': 'added',
+    'osf_storage_file_updated': 'updated',
+    'osf_storage_file_removed': 'removed',
+    'osf_storage_folder_created': 'added',
+    'addon_file_moved': 'moved',
+    'addon_file_renamed': 'moved',
+    'addon_file_copied': 'copied',
+}
+LOG_MAX_PAGES = 10  # beyond this many pages of logs just do a full crawl
+
 
 class TokenStorage(dict):
     """Dict-based class to store all the known tokens according to username
     """
     def __init__(self, *args, **kwargs):
         dict.__init__(self, *args, **kwargs)
+        self.mtime = None  # of the file when last loaded/saved
         self.load()
 
     def load(self, filename=None):
@@ -51,6 +69,7 @@ class TokenStorage(dict):
         if filename is None:
             filename = os.path.join(constants.PYOSF_FOLDER, 'tokens.json')
         if os.path.isfile(filename):
+            self.mtime = os.path.getmtime(filename)
             with open(filename, 'r') as f:
                 try:
                     self.update(json.load(f))
@@ -71,6 +90,199 @@ class TokenStorage(dict):
                 f.write(bytes(json_str, 'UTF-8'))
             else:
                 f.write(json_str)
+        self.mtime = os.path.getmtime(filename)
+
+
+_token_storage = None
+
+
+def stored_tokens():
+    """Returns the (shared) TokenStorage, only reading the file again if it
+    has changed since it was last loaded
+    """
+    global _token_storage
+    filename = os.path.join(constants.PYOSF_FOLDER, 'tokens.json')
+    mtime = None
+    if os.path.isfile(filename):
+        mtime = os.path.getmtime(filename)
+    if _token_storage is None or _token_storage.mtime != mtime:
+        _token_storage = TokenStorage()
+    return _token_storage
+
+
+def token_fingerprint(token):
+    """A short hash identifying a token (without storing the token itself)
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+
+class IdentityCache(dict):
+    """Dict-based class storing the user identity for each validated token
+    (keyed by `token_fingerprint`) so that new Sessions with a known token
+    don't need to validate it again within `ttl` seconds
+
+    Parameters
+    ----------
+
+    filename : str
+        Defaults to ~/.pyosf/identities.json
+    ttl : float
+        Seconds for which a validated identity is trusted
+
+    """
+    def __init__(self, filename=None, ttl=constants.IDENTITY_TTL):
+        dict.__init__(self)
+        if filename is None:
+            filename = os.path.join(constants.PYOSF_FOLDER, 'identities.json')
+        self.filename = filename
+        self.ttl = ttl
+        if os.path.isfile(filename):
+            with open(filename, 'r') as f:
+                try:
+                    self.update(json.load(f))
+                except ValueError:
+                    pass  # corrupt so start again
+
+    def get_identity(self, fingerprint):
+        """The identity dict (user_id, full_name, fingerprint, time) for a
+        token fingerprint or None if unknown or expired
+        """
+        identity = self.get(fingerprint)
+        if identity is not None and time.time() - identity['time'] < self.ttl:
+            return identity
+
+    def store(self, fingerprint, user_id, full_name):
+        self[fingerprint] = {'user_id': user_id, 'full_name': full_name,
+                             'fingerprint': fingerprint, 'time': time.time()}
+        self.save()
+        return self[fingerprint]
+
+    def forget(self, fingerprint):
+        if self.pop(fingerprint, None) is not None:
+            self.save()
+
+    def save(self):
+        atomic_write(self.filename, json.dumps(self))
+
+
+_identity_cache = None
+
+
+def identity_cache():
+    """Returns the (shared) IdentityCache
+    """
+    global _identity_cache
+    if _identity_cache is None:
+        _identity_cache = IdentityCache()
+    return _identity_cache
+
+
+class ListingCache(object):
+    """A per-project store on disk of the assets in each remote folder
+
+    Each folder listing is stored with the ETag/Last-Modified headers that
+    came with it. For `ttl` seconds after it was fetched a listing is reused
+    as it is. After that it is revalidated with a conditional request and a
+    304 reply means the stored assets are reused without parsing anything.
+
+    Parameters
+    ----------
+
+    project_id : str
+        The OSF id of the project (used to name the cache file)
+    ttl : float
+        Seconds for which a listing is trusted without revalidation
+    filename : str
+        Defaults to ~/.pyosf/cache/<project_id>_listings.json
+
+    """
+    def __init__(self, project_id, ttl=constants.LISTING_CACHE_TTL,
+                 filename=None):
+        if filename is None:
+            filename = os.path.join(constants.PYOSF_FOLDER, 'cache',
+                                    '{}_listings.json'.format(project_id))
+        self.filename = filename
+        self.ttl = ttl
+        self.listings = {}
+        self._changed = False
+        self.load()
+
+    def load(self):
+        """Load the listings from the cache file (if it exists)
+        """
+        if os.path.isfile(self.filename):
+            with open(self.filename, 'r') as f:
+                try:
+                    self.listings = json.load(f)
+                except ValueError:
+                    self.listings = {}  # corrupt so start again
+
+    def save(self):
+        """Save the listings to the cache file (if any have changed)
+        """
+        if self._changed:
+            atomic_write(self.filename, json.dumps(self.listings))
+            self._changed = False
+
+    def invalidate(self, url=None):
+        """Discard the listing for one URL (or all listings if url is None)
+        """
+        if url is None:
+            self.listings = {}
+        else:
+            self.listings.pop(url, None)
+        self._changed = True
+
+    def get(self, session, url, parse, refresh=False):
+        """Returns the assets in the folder at url, using the cached listing
+        if it is still valid
+
+        Parameters
+        ----------
+
+        session : a Session object
+        url : str
+            The URL for the folder listing
+        parse : callable
+            Converts the list of json entries into a list of assets
+        refresh : bool
+            If True the listing is revalidated even within the ttl (e.g.
+            because the node logs say the folder changed)
+
+        """
+        cached = self.listings.get(url)
+        headers = {}
+        if cached is not None:
+            if not refresh and time.time() - cached['time'] < self.ttl:
+                return [copy.copy(asset) for asset in cached['assets']]
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        reply = session.get(url, headers=headers, timeout=10.0)
+        if reply.status_code == 304 and cached is not None:
+            cached['time'] = time.time()
+            if self.ttl:  # (the time only matters if there is a ttl)
+                self._changed = True
+        else:
+            cached = {'assets': parse(listing_data(url, reply)),
+                      'etag': reply.headers.get('ETag'),
+                      'last_modified': reply.headers.get('Last-Modified'),
+                      'time': time.time()}
+            self.listings[url] = cached
+            self._changed = True
+        return [copy.copy(asset) for asset in cached['assets']]
+
+
+def listing_data(url, reply):
+    """The json entries of a folder listing reply (raising HTTPSError if
+    the folder couldn't be listed)
+    """
+    if reply.status_code != 200:
+        raise exceptions.HTTPSError(
+            "Failed to list {}: {}".format(url, reply.status_code),
+            status_code=reply.status_code)
+    return reply.json()['data']
 
 
 class BufferReader(object):
@@ -134,17 +346,19 @@ class PushPullThread(threading.Thread):
     def run(self):
         self.status = STARTED  # probably can't be read so don't bother?
         session = self.session()  # session is a self.weakref
-        if self.kind == 'push':
-            for asset in self.asset_list:
-                self.upload_file(asset, session)
-        else:
-            for asset in self.asset_list:
-                self.download_file(asset, session)
-                logging.info("Downloading {} from {}"
-                             .format(asset['local_path'], asset['url']))
-        self.status = FINISHED
-        if self.finished_callback:
-            self.finished_callback()
+        try:
+            if self.kind == 'push':
+                for asset in self.asset_list:
+                    self.upload_file(asset, session)
+            else:
+                for asset in self.asset_list:
+                    self.download_file(asset, session)
+                    logging.info("Downloading {} from {}"
+                                 .format(asset['local_path'], asset['url']))
+            self.status = FINISHED
+        finally:  # (even if a transfer failed)
+            if self.finished_callback:
+                self.finished_callback()
 
     def info_callback(self, progress):
         self.this_file_prog = progress
@@ -209,24 +423,38 @@ class Session(requests.Session):
         Provide either username and password for authentication with a new
         token, or provide a token from a previous session, or nothing for an
         anonymous user
+
+        Tokens are not checked with the server straight away but on first
+        use of `user_id`/`user_full_name`, or if a request is refused (401),
+        and a validated identity is cached (see `IdentityCache`)
         """
         requests.Session.__init__(self)
+        start_logfile()
 
         self.username = username
         self.password = password
-        self.user_id = None  # populate when token property is set
-        self.user_full_name = None
+        self.otp = otp
+        self.identity = None  # user_id, full_name, fingerprint once validated
         self.remember_me = remember_me
         self.authenticated = False
+        self.__dict__['token'] = None
+        self._auth_lock = threading.RLock()
+        self._local = threading.local()  # whether validating (per thread)
         # set token (which will update session headers as needed)
         if token is not None:
             self.token = token
         elif username is not None:
             self.authenticate(username, password, otp)
         self.headers.update({'content-type': 'application/json'})
-        # placeholders for up/downloader threads
+        # placeholders for up/downloader threads (the most recent ones)
         self.downloader = None
         self.uploader = None
+        # a shared Session (see SessionRegistry) can be transferring files
+        # for several Changes at once so threads are kept for each
+        # (keyed by a weakref so a new Changes that happens to get the id of
+        # an old one is never mistaken for it)
+        self._transfers = {}  # (kind, weakref to changes): PushPullThread
+        self._transfer_lock = threading.RLock()
         self.chunk_size = default_chunk_size
 
     def open_project(self, proj_id):
@@ -351,6 +579,24 @@ class Session(requests.Session):
             projs.append(OSFProject(session=self, id=entry))
         return projs
 
+    def request(self, method, url, **kwargs):
+        """Sends a request (see requests.Session.request). If the server
+        refuses the token (401) it is checked and, if it has expired, a new
+        one is requested using the password (if known) and the request sent
+        again. Otherwise an AuthError is raised
+        """
+        reply = self._request(method, url, **kwargs)
+        if reply.status_code == 401 and self.token is not None and \
+                not getattr(self._local, 'validating', False) and \
+                'auth' not in kwargs:
+            if not self.validate(force=True):
+                return reply  # token is fine but not for this request
+            reply = self._request(method, url, **kwargs)
+        return reply
+
+    def _request(self, method, url, **kwargs):
+        return requests.Session.request(self, method, url, **kwargs)
+
     @property
     def token(self):
         """The authorisation token for the current logged in user
@@ -358,36 +604,84 @@ class Session(requests.Session):
         return self.__dict__['token']
 
     @token.setter
-    def token(self, token, save=None):
-        """Set the token for this session and check that it works for auth
+    def token(self, token):
+        """Set the token for this session. It is validated when first needed
+        (see `validate()`)
         """
         self.__dict__['token'] = token
+        self.identity = None
         if token is None:
-            headers = {}
-        else:
-            headers = {
-                'Authorization': 'Bearer {}'.format(token),
-            }
-        self.headers.update(headers)
-        # then populate self.userID and self.userName
-        resp = self.get(constants.API_BASE+"/users/me/", timeout=10.0)
+            self.headers.pop('Authorization', None)
+            self.authenticated = False
+            return
+        self.headers.update({'Authorization': 'Bearer {}'.format(token)})
+        self.authenticated = True  # optimistically, until the server refuses
+        self.identity = identity_cache().get_identity(
+            token_fingerprint(token))
+
+    @property
+    def user_id(self):
+        """The OSF id of the authenticated user (None if anonymous)
+        """
+        if self.token is not None and self.identity is None:
+            self.validate()
+        if self.identity is not None:
+            return self.identity['user_id']
+
+    @property
+    def user_full_name(self):
+        if self.token is not None and self.identity is None:
+            self.validate()
+        if self.identity is not None:
+            return self.identity['full_name']
+
+    def validate(self, force=False):
+        """Checks the token with the server (unless there is a cached
+        identity for it) and fetches the user identity.
+
+        If the token is refused and the password is known a new token is
+        requested, otherwise an AuthError is raised
+
+        Returns
+        ----------
+
+        True if the token had to be replaced
+
+        """
+        with self._auth_lock:
+            return self._validate(force)
+
+    def _validate(self, force=False):
+        if self.token is None or (self.identity is not None and not force):
+            return False
+        fingerprint = token_fingerprint(self.token)
+        self._local.validating = True
+        try:
+            resp = self.get(constants.API_BASE+"/users/me/", timeout=10.0)
+        finally:
+            self._local.validating = False
         if resp.status_code != 200:
-            raise exceptions.AuthError("Invalid credentials trying to get "
-                                       "user data:\n{}".format(resp.json()))
-        else:
-            logging.info("Successful authentication with token")
-        json_resp = resp.json()
+            identity_cache().forget(fingerprint)
+            self.authenticated = False
+            if self.username is None or self.password is None:
+                raise exceptions.AuthError("Invalid credentials trying to get "
+                                           "user data:\n{}"
+                                           .format(resp.json()))
+            logging.info("Token refused, authenticating with password")
+            self._request_token(self.username, self.password, self.otp)
+            return True
+        logging.info("Successful authentication with token")
+        data = resp.json()['data']
+        self.identity = identity_cache().store(
+            fingerprint, data['id'], data['attributes']['full_name'])
         self.authenticated = True
-        data = json_resp['data']
-        self.user_id = data['id']
-        self.user_full_name = data['attributes']['full_name']
         # update stored tokens
-        if save is None:
-            save = self.remember_me
-        if save and self.username is not None:
-            tokens = TokenStorage()
-            tokens[self.username] = token
-            tokens.save()
+        if self.remember_me and self.username is not None:
+            tokens = stored_tokens()
+            if tokens.get(self.username) != self.token:
+                tokens[self.username] = self.token
+                tokens.save()
+        return False
 
     def authenticate(self, username, password=None, otp=None):
         """Authenticate according to username and password (if needed).
@@ -397,19 +691,19 @@ class Session(requests.Session):
         password will be sent (using https) and an auth token will be stored.
         """
         # try fetching a token first
-        tokens = TokenStorage()
+        tokens = stored_tokens()
         if username in tokens:
             logging.info("Found previous auth token for {}".format(username))
-            try:
-                self.token = tokens[username]
-                return 1
-            except exceptions.AuthError:
-                if password is None:
-                    raise exceptions.AuthError("User token didn't work and no "
-                                               "password has been provided")
+            self.token = tokens[username]  # validated when first needed
+            return 1
         elif password is None:
             raise exceptions.AuthError("No auth token found and no "
                                        "password given")
+        return self._request_token(username, password, otp)
+
+    def _request_token(self, username, password, otp=None):
+        """Creates a new token on the server using the password
+        """
         token_url = constants.API_BASE+'/tokens/'
         token_request_body = {
             'data': {
@@ -436,7 +730,7 @@ class Session(requests.Session):
             # code, notify the user to try again
             # This header appears for basic auth requests, and only when a
             # valid password is provided
-            otp_val = resp.headers.get('X-OSF-OTP', '', timeout=10.0)
+            otp_val = resp.headers.get('X-OSF-OTP', '')
             if otp_val.startswith('required'):
                 raise exceptions.AuthError('Must provide code for two-factor'
                                            'authentication')
@@ -447,8 +741,8 @@ class Session(requests.Session):
         else:
             json_resp = resp.json()
             logging.info("Successfully authenticated with username/password")
-            self.authenticated = True
             self.token = json_resp['data']['attributes']['token_id']
+            self.validate()  # fetches the identity and stores the token
             return 1
 
     def download_file(self, url, local_path,
@@ -465,13 +759,9 @@ class Session(requests.Session):
 
         """
         if threaded:
-            if self.downloader is None or \
-                    self.downloader.status != NOT_STARTED:  # can't re-use
-                self.downloader = PushPullThread(
-                    session=self, kind='pull',
-                    finished_callback=self.finished_downloads,
-                    changes=changes)
-            self.downloader.add_asset(url, local_path, size)
+            with self._transfer_lock:
+                self.downloader = self._transfer_thread('pull', changes)
+                self.downloader.add_asset(url, local_path, size)
         else:
             # download immediately
             reply = self.get(url, stream=True, timeout=30.0)
@@ -491,13 +781,9 @@ class Session(requests.Session):
         will be incremented).
         """
         if threaded:
-            if self.uploader is None or \
-                    self.uploader.status != NOT_STARTED:  # can't re-use
-                self.uploader = PushPullThread(
-                    session=self, kind='push',
-                    finished_callback=self.finished_uploads,
-                    changes=changes)
-            self.uploader.add_asset(url, local_path, size)
+            with self._transfer_lock:
+                self.uploader = self._transfer_thread('push', changes)
+                self.uploader.add_asset(url, local_path, size)
         else:
             with open(local_path, 'rb') as f:
                 reply = self.put(url, data=f, timeout=30.0)
@@ -506,7 +792,8 @@ class Session(requests.Session):
             if reply.status_code not in [200, 201]:
                 raise exceptions.HTTPSError(
                     "URL:{}\nreply:{}"
-                    .format(url, json.dumps(reply.json(), indent=2)))
+                    .format(url, json.dumps(reply.json(), indent=2)),
+                    status_code=reply.status_code)
             node = FileNode(self, reply.json()['data'])
             if local_md5 != node.json['attributes']['extra']['hashes']['md5']:
                 raise exceptions.OSFError(
@@ -517,43 +804,75 @@ class Session(requests.Session):
                 changes.add_to_index(local_path)  # signals success
             return node
 
+    def _transfer_thread(self, kind, changes):
+        """Returns the (not yet started) thread for transfers of this kind
+        for this Changes object, creating one if needed
+        """
+        key = (kind, None if changes is None else weakref.ref(changes))
+        with self._transfer_lock:
+            # (threads never started for a Changes that no longer exists)
+            for old_key, thread in list(self._transfers.items()):
+                if old_key[1] is not None and old_key[1]() is None and \
+                        thread.status == NOT_STARTED:
+                    del self._transfers[old_key]
+            thread = self._transfers.get(key)
+            if thread is None or thread.status != NOT_STARTED:  # can't reuse
+                thread = PushPullThread(session=self, kind=kind,
+                                        changes=changes)
+                thread.finished_callback = functools.partial(
+                    self._finished_transfer, key, thread)
+                self._transfers[key] = thread
+        return thread
+
+    def _finished_transfer(self, key, thread):
+        with self._transfer_lock:
+            if self._transfers.get(key) is thread:  # (not a newer one)
+                del self._transfers[key]
+            if thread is self.uploader:
+                self.finished_uploads()
+            elif thread is self.downloader:
+                self.finished_downloads()
+
+    def _threads_for(self, changes=None):
+        """The transfer threads for a Changes object (or all if None)
+        """
+        with self._transfer_lock:
+            return [thread for key, thread in self._transfers.items()
+                    if changes is None or
+                    (key[1] is not None and key[1]() is changes)]
+
     def finished_uploads(self):
         self.uploader = None
 
     def finished_downloads(self):
         self.downloader = None
 
-    def apply_changes(self):
+    def apply_changes(self, changes=None):
         """If threaded up/downloading is enabled then this begins the process
+        (for the given Changes object or for all of them)
         """
-        if self.uploader:
-            self.uploader.start()
-        if self.downloader:
-            self.downloader.start()
+        for thread in self._threads_for(changes):
+            if thread.status == NOT_STARTED:
+                thread.start()
 
-    def get_progress(self):
+    def get_progress(self, changes=None):
         """Returns either:
                     {'up': [done, total],
                      'down': [done, total]}
                 or:
                     1 for finished
+
+        for the transfers of the given Changes object (or all transfers)
         """
         done = True  # but we'll check for alive threads and set False
-        if self.uploader is None:
-            up = [0, 0]
-        else:
-            if self.uploader.isAlive():
+        up = [0, 0]
+        down = [0, 0]
+        for thread in self._threads_for(changes):
+            if thread.is_alive():
                 done = False
-            up = [self.uploader.finished_size,
-                  self.uploader.queue_size]
-
-        if self.downloader is None:
-            down = [0, 0]
-        else:
-            if self.downloader.isAlive():
-                done = False
-            down = [self.downloader.finished_size,
-                    self.downloader.queue_size]
+            totals = up if thread.kind == 'push' else down
+            totals[0] += thread.finished_size
+            totals[1] += thread.queue_size
 
         if not done:  # at least one thread reported being alive
             return {'up': up, 'down': down}
@@ -561,6 +880,65 @@ class Session(requests.Session):
             return 1
 
 
+class SessionRegistry(object):
+    """Hands out a shared Session for each username (or token) so that
+    projects of the same user share one connection pool and one validated
+    identity. Each `get()` should be matched by a `release()` and the
+    Session is closed when the last user releases it
+
+    Parameters
+    ----------
+
+    session_class : callable
+        Creates the sessions (with username, password, token kwargs)
+
+    """
+    def __init__(self, session_class=None):
+        self.session_class = session_class or Session
+        self._sessions = {}  # key: [session, refcount]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @staticmethod
+    def _key(username=None, token=None):
+        if username is not None:
+            return ('username', username)
+        elif token is not None:
+            return ('token', token_fingerprint(token))
+        return ('anonymous', None)
+
+    def get(self, username=None, token=None, password=None, **kwargs):
+        """Returns the shared Session for this username/token, creating it if
+        needed (other kwargs are passed to the Session when created)
+        """
+        key = self._key(username, token)
+        with self._lock:
+            if key not in self._sessions:
+                session = self.session_class(username=username, token=token,
+                                             password=password, **kwargs)
+                self._sessions[key] = [session, 0]
+            entry = self._sessions[key]
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, session):
+        """Finished with a session from `get()`. Closed when unused
+        """
+        with self._lock:
+            for key, entry in list(self._sessions.items()):
+                if entry[0] is session:
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del self._sessions[key]
+                        session.close()
+                    return
+
+
+sessions = SessionRegistry()  # the process-wide registry
+
+
 class Node(object):
     """The Node is an abstract class defined by OSF that could be a project
     or a subproject. It can contain files and children (which are themselves
@@ -580,6 +958,9 @@ class Node(object):
         retrieved already)
 
     """
+    listing_cache = None  # a ListingCache for the folder listings (optional)
+    compact = False  # store index entries as assets.Asset records
+
     def __init__(self, session, id):
         if session is None:
             session = Session()  # create a default (anonymous Session)
@@ -615,14 +996,15 @@ class Node(object):
                 raise exceptions.HTTPSError(
                     "Failed to fetch OSF Project with ID:\n {}: {}\n"
                     .format(reply, url))
-        # also get info about files if possible
-        files_reply = self.session.get("{}/nodes/{}/files"
-                                       .format(constants.API_BASE, id),
-                                       timeout=10.0)
-        if files_reply.status_code == 200:
-            for provider in files_reply.json()['data']:
-                if provider['attributes']['name'] == 'osfstorage':
-                    self.json['links'].update(provider['links'])
+        # also get info about files if possible (FileNodes have none)
+        if self.kind == 'node':
+            files_reply = self.session.get("{}/nodes/{}/files"
+                                           .format(constants.API_BASE, id),
+                                           timeout=10.0)
+            if files_reply.status_code == 200:
+                for provider in files_reply.json()['data']:
+                    if provider['attributes']['name'] == 'osfstorage':
+                        self.json['links'].update(provider['links'])
         self.id = id
 
     def __repr__(self):
@@ -690,27 +1072,46 @@ class Node(object):
         else:
             return Node(session=self.session, id=parent_URL)
 
-    def _node_file_list(self, url=None):
+    def _node_file_list(self, url=None, refresh=False):
         """Returns all the files within a node (including sub-folders)
+
+        With refresh=True cached listings are revalidated even within their
+        ttl (see `ListingCache.get`)
         """
         if url is None:  # use the root of this Node id
             url = "{}/nodes/{}/files/osfstorage".format(constants.API_BASE,
                                                         self.id)
-        reply = self.session.get(url, timeout=10.0).json()['data']
         file_list = []
-        for entry in reply:
-            f = FileNode(self.session, entry)
-            d = f.as_asset()
+        for d in self._folder_assets(url, refresh=refresh):
             # if folder then get the assets below as well
-            if f.kind == 'folder':
-                logging.info("folderHasPath: {}".format(f.path))
-                folder_url = f.links['move']
-                file_list.extend(self._node_file_list(folder_url))
+            if d['kind'] == 'folder':
+                logging.info("folderHasPath: {}".format(d['path']))
+                folder_url = d['links']['move']
+                file_list.extend(self._node_file_list(folder_url,
+                                                      refresh=refresh))
             # for folder of files store this asset
-            if f.path not in ['', '/']:
+            if d['path'] not in ['', '/']:
                 file_list.append(d)
         return file_list
 
+    def _folder_assets(self, url, refresh=False):
+        """Returns assets for the contents of a single folder (not
+        including the contents of its sub-folders)
+        """
+        if self.listing_cache is not None:
+            asset_list = self.listing_cache.get(self.session, url,
+                                                self._assets_from_listing,
+                                                refresh=refresh)
+        else:
+            reply = self.session.get(url, timeout=10.0)
+            asset_list = self._assets_from_listing(listing_data(url, reply))
+        if self.compact:
+            asset_list = compact_index(asset_list)
+        return asset_list
+
+    def _assets_from_listing(self, entries):
+        return [FileNode(self.session, entry).as_asset() for entry in entries]
+
     def create_index(self):
         """Returns a flat list of all files from this node down
         """
@@ -857,6 +1258,29 @@ class FileNode(Node):
                                    threaded=threaded)
 
 
+def _cursor_from_log(entry):
+    """The log cursor stores enough to find our place in the node logs
+    """
+    return {'id': entry['id'], 'date': entry['attributes']['date']}
+
+
+def _log_path(params):
+    """Gets the (index-style) path from the params of a log entry
+    """
+    path = params.get('materialized') or params.get('path')
+    if path is None:
+        return None
+    return path.strip('/')
+
+
+def _drop_subtree(index_p, path):
+    """Removes an asset, and anything below it, from a path-keyed index
+    """
+    for this_path in list(index_p.keys()):
+        if this_path == path or this_path.startswith(path+'/'):
+            del index_p[this_path]
+
+
 class OSFProject(Node):
     """A project Node from the OSF. Most methods are defined by Node
 
@@ -865,14 +1289,18 @@ class OSFProject(Node):
 
     session : a Session object
     id : the id of the project node on OSF
+    listing_cache : a ListingCache object (optional)
+        Stores the remote folder listings on disk between sessions
 
     """
-    def __init__(self, session, id):
+    def __init__(self, session, id, listing_cache=None):
         Node.__init__(self, session, id)
+        self.listing_cache = listing_cache
         self.containers = {}  # a dict of Nodes and folders to contain files
         self.path = ""  # provided for consistency with FileNode
         self.name = ""  # provided for consistency with FileNode
         self._index = None
+        self.log_cursor = None  # newest node log entry reflected in index
         self.uploader = None  # to cache asynchronous uploads
         self.downloader = None  # to cache asynchronous downloads
 
@@ -888,25 +1316,265 @@ class OSFProject(Node):
     def index_dict(self):
         return dict_from_list(self.index)
 
-    def rebuild_index(self):
+    def rebuild_index(self, scope=None):
         """Returns a flat list of all files from this node down
+
+        Parameters
+        ----------
+
+        scope : str or set
+            The path of a folder to crawl (just that folder and its
+            contents are indexed), found by listing only the folders on the
+            way to it. Or a set of paths (files or folders) each found that
+            way, with the folders crawled
+
+        """
+        if not scope:
+            file_list = Node.create_index(self)  # Node does the main leg work
+            self._set_index(file_list)
+            return
+        if not isinstance(scope, (set, frozenset, list, tuple)):
+            scope = [scope]
+        self.containers = {'': self.as_asset()}
+        listings = {}
+        file_list = []
+        for path in sorted(scope):
+            asset = self.lookup(path, listings)
+            if asset is None:
+                continue  # (not created yet)
+            file_list.append(asset)
+            if asset['kind'] == 'folder':
+                file_list.extend(self._node_file_list(
+                    asset['links']['move']))
+        ancestors = dict(self.containers)
+        self._set_index(file_list)
+        for path, asset in ancestors.items():
+            self.containers.setdefault(path, asset)
+
+    def _set_index(self, file_list):
+        """Stores the file list as the index and finds the containers
         """
-        file_list = Node.create_index(self)  # Node does the main leg work
         # for Project, find all folders and add them to their own index
         self.containers = {}
         for entry in file_list:
             if entry['kind'] == 'folder':
                 self.containers[entry['path']] = entry
         # now we can give containers 'modified dates' based on contents
+        dates = folder_dates(file_list)
         for path, entry in self.containers.items():
-            modified = '0'
-            for asset in file_list:
-                if asset['path'].startswith(path):
-                    if 'date_modified' in asset and \
-                            asset['date_modified'] > modified:
-                        modified = asset['date_modified']
-            entry['date_modified'] = modified
+            entry['date_modified'] = dates[path]
         self._index = file_list
+        if self.listing_cache is not None:
+            self.listing_cache.save()
+
+    def iter_folders(self):
+        """Lists the remote folders one at a time (breadth first), yielding
+        (folder, assets) for each: the folder path ('' for the root) and the
+        assets of its direct contents. Folders are added to `containers` as
+        they are found (their date_modified is only set once the whole index
+        is known, by `_set_index()`)
+        """
+        folders = deque([('', self._listing_url(''))])
+        while folders:
+            folder, url = folders.popleft()
+            assets = [d for d in self._folder_assets(url)
+                      if d['path'] not in ['', '/']]
+            for asset in assets:
+                if asset['kind'] == 'folder':
+                    self.containers[asset['path']] = asset
+                    folders.append((asset['path'], asset['links']['move']))
+            yield folder, assets
+
+    def download_zip(self, folder, fileobj):
+        """Streams the contents of a remote folder ('' for the whole project)
+        as a single zip archive into fileobj (opened for binary writing)
+
+        Returns True if the archive was fetched
+        """
+        if folder == '':
+            url = self.links['upload']
+        elif folder in self.containers:
+            url = self.containers[folder]['links']['upload']
+        else:
+            return False
+        reply = self.session.get(url + "?zip=", stream=True, timeout=30.0)
+        if reply.status_code != 200:
+            logging.warning("Failed to fetch {} as zip: {}"
+                            .format(url, reply.status_code))
+            return False
+        for chunk in reply.iter_content(self.session.chunk_size):
+            fileobj.write(chunk)
+        return True
+
+    def _listing_url(self, folder):
+        """The URL that lists the contents of a folder (or None if unknown)
+        """
+        if folder == '':
+            return "{}/nodes/{}/files/osfstorage".format(constants.API_BASE,
+                                                         self.id)
+        elif folder in self.containers:
+            return self.containers[folder]['links']['move']
+
+    def invalidate_listing(self, path=None):
+        """Forces the cached listing of the folder containing `path` (or of
+        all folders if path is None) to be fetched again on the next crawl
+        """
+        if self.listing_cache is None:
+            return
+        if path is not None:
+            url = self._listing_url(os.path.dirname(path))
+            if url is not None:
+                self.listing_cache.invalidate(url)
+                return
+        self.listing_cache.invalidate()
+
+    def update_index(self, index=None, cursor=None):
+        """Brings a previously cached index up to date using the node logs
+
+        Only the log entries newer than `cursor` are fetched and only the
+        folders they mention are listed again. If there is no cached index,
+        or the logs are truncated or ambiguous, this falls back to a full
+        crawl with `rebuild_index()`
+
+        Parameters
+        ----------
+
+        index : list
+            A remote index from a previous call (e.g. stored in the project
+            file)
+        cursor : dict
+            The `log_cursor` that was current when `index` was created
+
+        Returns
+        ----------
+
+        True if the index was updated from the logs, False if a full crawl
+        was needed
+
+        """
+        if index and cursor and not self.children:
+            entries = self._logs_since(cursor)
+            if entries is not None:
+                self._index = copy.deepcopy(index)
+                index_p = OrderedDict((asset['path'], asset)
+                                      for asset in self._index)
+                newest = cursor
+                for entry in reversed(entries):  # oldest first
+                    if not self._apply_log(entry, index_p):
+                        logging.info("Log entry {} needs a full crawl"
+                                     .format(entry['id']))
+                        break
+                    newest = _cursor_from_log(entry)
+                else:
+                    self._set_index(list(index_p.values()))
+                    self.log_cursor = newest
+                    logging.info("Updated remote index from {} log entries"
+                                 .format(len(entries)))
+                    return True
+        # fetch the cursor *before* crawling so no changes can be missed
+        self.log_cursor = self._latest_log_cursor()
+        self.rebuild_index()
+        return False
+
+    def _logs_url(self):
+        return "{}/nodes/{}/logs/".format(constants.API_BASE, self.id)
+
+    def _latest_log_cursor(self):
+        """Returns a cursor for the newest node log entry (or None)
+        """
+        reply = self.session.get(self._logs_url()+"?page[size]=1",
+                                 timeout=10.0)
+        if reply.status_code != 200 or not reply.json()['data']:
+            return None
+        return _cursor_from_log(reply.json()['data'][0])
+
+    def _logs_since(self, cursor, max_pages=LOG_MAX_PAGES):
+        """Returns the log entries (newest first) that are newer than
+        cursor, or None if the cursor wasn't found (truncated logs)
+        """
+        entries = []
+        url = self._logs_url()
+        for page in range(max_pages):
+            reply = self.session.get(url, timeout=10.0)
+            if reply.status_code != 200:
+                return None
+            reply = reply.json()
+            for entry in reply['data']:
+                if entry['id'] == cursor['id']:
+                    return entries
+                elif entry['attributes']['date'] < cursor['date']:
+                    return None  # went past the cursor without finding it
+                entries.append(entry)
+            url = reply['links'].get('next')
+            if not url:
+                break
+        return None
+
+    def _apply_log(self, entry, index_p):
+        """Applies a single log entry to the path-keyed index_p. Returns False
+        if that can't be done without a full crawl
+        """
+        action = entry['attributes']['action']
+        params = entry['attributes'].get('params') or {}
+        if action not in LOG_FILE_ACTIONS:
+            # wiki edits, contributors etc. don't change our files but any
+            # other osfstorage action is one we don't know how to handle
+            return not action.startswith('osf_storage')
+        change = LOG_FILE_ACTIONS[action]
+        if change in ['moved', 'copied']:
+            source = params.get('source') or {}
+            dest = params.get('destination') or {}
+            if change == 'moved' and \
+                    source.get('provider', 'osfstorage') == 'osfstorage':
+                _drop_subtree(index_p, _log_path(source))
+            if dest.get('provider', 'osfstorage') != 'osfstorage':
+                return True
+            path = _log_path(dest)
+        else:
+            path = _log_path(params)
+        if path is None:
+            return False
+        if change == 'removed':
+            _drop_subtree(index_p, path)
+            return True
+        return self._refresh_folder(os.path.dirname(path), index_p)
+
+    def _refresh_folder(self, folder, index_p):
+        """Lists a folder again and updates its contents in index_p. New
+        sub-folders are crawled but existing ones are left alone.
+        Returns False if the folder isn't in the index
+
+        The log says the folder changed so a cached listing is revalidated
+        even within its ttl (or the change would be lost, as the log cursor
+        moves on regardless)
+        """
+        if folder == '':
+            url = "{}/nodes/{}/files/osfstorage".format(constants.API_BASE,
+                                                        self.id)
+        elif folder in index_p and index_p[folder]['kind'] == 'folder':
+            url = index_p[folder]['links']['move']
+        else:
+            return False
+        listing = self._folder_assets(url, refresh=True)
+        found = set(asset['path'] for asset in listing)
+        for path in list(index_p.keys()):
+            if os.path.dirname(path) == folder and path not in found:
+                _drop_subtree(index_p, path)
+        for asset in listing:
+            previous = index_p.get(asset['path'])
+            if asset['kind'] == 'folder':
+                if previous is not None and previous['kind'] == 'folder':
+                    continue  # contents are updated by their own log entries
+                _drop_subtree(index_p, asset['path'])
+                index_p[asset['path']] = asset
+                for sub_asset in self._node_file_list(asset['links']['move'],
+                                                      refresh=True):
+                    index_p[sub_asset['path']] = sub_asset
+            else:
+                if previous is not None and previous['kind'] == 'folder':
+                    _drop_subtree(index_p, asset['path'])
+                index_p[asset['path']] = asset
+        return True
 
     def add_container(self, path, kind='folder', changes=None):
         """Adds a container (currently only a folder) recursively.
@@ -939,8 +1607,17 @@ class OSFProject(Node):
                 logging.info("Using existing {}".format(outer_path))
 
             url = "{}&name={}".format(url_create, name)
+            self.invalidate_listing(path)
             reply = self.session.put(url, timeout=10.0)
+            existing = None
             if reply.status_code == 409:
+                # e.g. created from elsewhere since we last looked
+                existing = next((d for d in self._folder_assets(
+                    self._listing_url(outer_path)) if d['path'] == path and
+                    d['kind'] == 'folder'), None)
+            if existing is not None:
+                asset = existing
+            elif reply.status_code == 409:
                 # conflict code indicating the folder does exist
                 errStr = ("Err409: {}\n"
                           " Tried URL: {}\n"
@@ -952,10 +1629,11 @@ class OSFProject(Node):
             elif reply.status_code not in [200, 201]:  # some other problem
                 raise exceptions.HTTPSError(
                     "URL:{}\nreply:{}"
-                    .format(url, json.dumps(reply.json(), indent=2)))
+                    .format(url, json.dumps(reply.json(), indent=2)),
+                    status_code=reply.status_code)
             else:
-                reply_json = reply.json()['data']
-            asset = FileNode(self.session, reply_json).as_asset()
+                asset = FileNode(self.session,
+                                 reply.json()['data']).as_asset()
             logging.info("Created remote {} with path={}"
                          .format(asset['kind'], asset['path']))
             if changes:
@@ -963,6 +1641,31 @@ class OSFProject(Node):
         self.containers[path] = asset
         return asset
 
+    def lookup(self, path, listings=None):
+        """Finds the remote asset at path (or returns None) by listing just
+        the folders on the way to it, rather than crawling the project
+
+        Parameters
+        ----------
+
+        listings : dict
+            Folder listings already fetched (keyed by URL), which this adds
+            to, so that looking up many paths lists each folder once
+
+        """
+        if listings is None:
+            listings = {}
+        folder = os.path.dirname(path)
+        if folder not in self.containers and folder != '':
+            container = self.lookup(folder, listings)
+            if container is None or container['kind'] != 'folder':
+                return None
+            self.containers[folder] = container
+        url = self._listing_url(folder)
+        if url not in listings:
+            listings[url] = self._folder_assets(url)
+        return next((d for d in listings[url] if d['path'] == path), None)
+
     def find_asset(self, path):
         """Finds an asset (including id and links) by its path
         """
@@ -996,14 +1699,17 @@ class OSFProject(Node):
             size = asset['size']
         else:
             size = 0
-        self.session.upload_file(url=url_upload, local_path=local_path,
-                                 size=size, threaded=threaded, changes=changes)
+        self.invalidate_listing(new_path)
+        return self.session.upload_file(url=url_upload, local_path=local_path,
+                                        size=size, threaded=threaded,
+                                        changes=changes)
 
     def rename_file(self, asset, new_path, changes=None):
         # ensure the target location exists
         new_folder, new_name = os.path.split(new_path)
         # get the url and perform the move
         url_move = asset['links']['move']
+        self.invalidate_listing(asset['path'])
         # there's actually a more complicated version allowing a *move*
         # (change of location) but we're just using rename
         body = """{"action":   "rename",
@@ -1019,6 +1725,7 @@ class OSFProject(Node):
 
     def del_file(self, asset, changes=None):
         url_del = asset['links']['delete']
+        self.invalidate_listing(asset['path'])
         reply = self.session.delete(url_del)
         if reply.status_code != 204:
             raise exceptions.HTTPSError(
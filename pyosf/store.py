@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""SQLite-based storage of the project info and file indices, as an
+alternative to the single json project file for very large projects
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import json
+import sqlite3
+try:
+    from psychopy import logging
+except ImportError:
+    import logging
+from .assets import as_dict
+
+SQLITE_EXTENSIONS = ['.db', '.sqlite', '.sqlite3']
+INDEX_TABLES = ['last_index', 'remote_index']
+
+
+def is_sqlite_path(proj_path):
+    """Whether a project file path should use the SQLiteStore
+    """
+    return os.path.splitext(proj_path)[1].lower() in SQLITE_EXTENSIONS
+
+
+class SQLiteStore(object):
+    """Stores the project info as key/value pairs and each index as a table
+    with one row per asset (keyed by path) so that changes to single assets
+    can be written without rewriting everything
+
+    Parameters
+    ----------
+
+    filename : str
+        The location of the database (created if needed)
+
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        folder = os.path.dirname(filename)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS info "
+                        "(key TEXT PRIMARY KEY, value TEXT)")
+        for table in INDEX_TABLES:
+            self.db.execute("CREATE TABLE IF NOT EXISTS {} "
+                            "(path TEXT PRIMARY KEY, kind TEXT, asset TEXT)"
+                            .format(table))
+        self.db.commit()
+
+    def __repr__(self):
+        return "SQLiteStore({})".format(self.filename)
+
+    def close(self):
+        self.db.close()
+
+    def load(self):
+        """Returns a dict of the info fields plus the indices (lists)
+        """
+        d = dict((key, json.loads(value)) for key, value in
+                 self.db.execute("SELECT key, value FROM info"))
+        for table in INDEX_TABLES:
+            d[table] = [json.loads(row[0]) for row in self.db.execute(
+                "SELECT asset FROM {} ORDER BY rowid".format(table))]
+        return d
+
+    def save_info(self, info):
+        """Saves a dict of info fields (values must be json-compatible)
+        """
+        self.db.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)",
+                            [(key, json.dumps(value))
+                             for key, value in info.items()])
+        self.db.commit()
+
+    def save_index(self, index, table='last_index'):
+        """Makes the table match a full index, writing only the rows that
+        have changed, in a single transaction
+        """
+        stored = dict(self.db.execute("SELECT path, asset FROM {}"
+                                      .format(table)))
+        rows = []
+        for asset in index:
+            asset_json = json.dumps(asset, sort_keys=True, default=as_dict)
+            if stored.pop(asset['path'], None) != asset_json:
+                rows.append((asset['path'], asset['kind'], asset_json))
+        with self.db:
+            self.db.executemany("DELETE FROM {} WHERE path=?".format(table),
+                                [(path,) for path in stored])
+            self.db.executemany("INSERT OR REPLACE INTO {} VALUES (?, ?, ?)"
+                                .format(table), rows)
+        logging.debug("SQLiteStore: {} rows changed, {} removed in {}"
+                      .format(len(rows), len(stored), table))
+
+    def put(self, asset, table='last_index'):
+        """Adds or replaces a single asset (call commit() when done)
+        """
+        self.db.execute("INSERT OR REPLACE INTO {} VALUES (?, ?, ?)"
+                        .format(table),
+                        (asset['path'], asset['kind'],
+                         json.dumps(asset, sort_keys=True,
+                                    default=as_dict)))
+
+    def delete(self, path, table='last_index'):
+        """Removes a single asset (call commit() when done)
+        """
+        self.db.execute("DELETE FROM {} WHERE path=?".format(table), (path,))
+
+    def commit(self):
+        self.db.commit()
+
+
+def migrate(json_path, db_path=None):
+    """Converts a json project file into an SQLiteStore database
+
+    Parameters
+    ----------
+
+    json_path : str
+        The existing (json) project file
+    db_path : str
+        The new database (defaults to the json_path with a .db extension)
+
+    Returns
+    ----------
+
+    The path of the new database
+
+    """
+    if db_path is None:
+        db_path = os.path.splitext(json_path)[0] + '.db'
+    with open(json_path, 'r') as f:
+        d = json.load(f)
+    db = SQLiteStore(db_path)
+    db.save_index(d.pop('index', []), 'last_index')
+    db.save_index(d.pop('remote_index', []), 'remote_index')
+    db.save_info(d)
+    db.close()
+    logging.info("Migrated project file {} to {}".format(json_path, db_path))
+    return db_path
@@ -15,13 +15,21 @@ from __future__ import absolute_import, print_function
 from .constants import SHA
 import copy
 import os
+import time
 import shutil
+import fnmatch
+import hashlib
+import zipfile
+import tempfile
 import weakref
+import threading
+from collections import OrderedDict, deque
 try:
     from psychopy import logging
 except ImportError:
     import logging
-from .tools import dict_from_list
+from .tools import folder_digests, in_scope, top_paths
+from . import constants, exceptions, journal
 
 """
 Resolutions table
@@ -44,12 +52,87 @@ search for e.g. code:010 to find the relevant python resolution
 
 class Changes(object):
     """This is essentially a dictionary of lists
+
+    With remote=False the local files are compared with the index of the
+    last sync only (no network access), so the add_remote, update_remote
+    and del_remote dicts hold the local changes waiting to be synced. Those
+    changes can't be applied.
+
+    With scan=False the local and remote indices start empty and nothing is
+    analyzed: the caller fills them in (see `pipeline.StreamingSync`).
+
+    With mirror=True the local files are made a read-only copy of the
+    remote: files unchanged since the last sync (by size and date) aren't
+    hashed again and only remote-to-local actions are found (see
+    `_resolve_mirror`), so nothing is ever written to the remote.
+
+    The files of each kind of transfer are applied in the `order` given
+    ('path', 'smallest', 'largest' or 'newest', see `transfer_order`) with
+    those matching the `priority` globs (e.g. ['data/*.csv']) first, and
+    `transfer_report()` shows how soon they were done.
+
+    With a scope (the path of a folder) only that folder and its contents
+    are scanned, crawled and analyzed; the index entries outside it are
+    kept as they were. Given `paths` instead (files or folders, e.g. those
+    touched since the last sync, see `watch.WatchSync`) only those paths
+    are rescanned (patching the live local index), looked up remotely
+    (listing just their parent folders) and analyzed.
     """
-    def __init__(self, proj):
+    engine = 'dict'  # the default engine for analyze()
+    order = 'path'  # the default order of transfers (see transfer_order)
+    priority = ()  # globs of the files to transfer first
+    zip_min_files = constants.ZIP_MIN_FILES  # see _zip_folders()
+
+    def __init__(self, proj, remote=True, engine=None, scan=True,
+                 mirror=False, scope=None, paths=None, order=None,
+                 priority=None):
         self.proj = weakref.ref(proj)
+        self.local_only = not remote
+        self.mirror = mirror
+        self.scope = scope.strip('/') if scope else None
+        self.paths = None
+        if paths is not None and '' not in top_paths(paths):
+            self.paths = top_paths(paths)
+        if engine is not None:
+            self.engine = engine
+        if order is not None:
+            self.order = order
+        if priority is not None:
+            self.priority = priority
+        # the part of the tree being synced (None for all of it)
+        self._area = self.paths if self.paths is not None else self.scope
+        if self._area is not None:
+            last_index = [asset for asset in proj.index
+                          if in_scope(asset['path'], self._area)]
+            self._outside = [asset for asset in proj.index
+                             if not in_scope(asset['path'], self._area)]
+            scan_options = {'scope': self._area}
+        else:
+            last_index = proj.index
+            self._outside = []
+            scan_options = {}
         # make sure indices are up to date
-        proj.local.rebuild_index()
-        proj.osf.rebuild_index()
+        local_index = None
+        if not scan:
+            pass  # the indices are filled in by the caller
+        elif self.paths is not None:
+            known = last_index if self.local_only or mirror else None
+            local_index = proj.local.update(self.paths, known=known)
+        elif self.local_only or mirror:
+            # files that look unchanged since last sync needn't be hashed
+            proj.local.rebuild_index(known=last_index, **scan_options)
+        else:
+            proj.local.rebuild_index(**scan_options)
+        if not scan or self.local_only:
+            pass  # (the last index stands in for the remote)
+        elif proj.remote_delta and self._area is None:
+            incremental = proj.osf.update_index(proj.remote_index,
+                                                proj.log_cursor)
+            if not incremental or proj.osf.log_cursor != proj.log_cursor:
+                proj.remote_index = proj.osf.index
+                proj.log_cursor = proj.osf.log_cursor
+        else:
+            proj.osf.rebuild_index(**scan_options)
         # create the names of the self attributes
         # the actual attributes will be created during _set_empty
         self._change_types = []
@@ -58,12 +141,152 @@ class Changes(object):
             for target in ['local', 'remote']:
                 self._change_types.append("{}_{}".format(action, target))
         self._set_empty()
-        self.local_index = proj.local.index
-        self.remote_index = proj.osf.index
-        self.last_index = proj.index
-        self.analyze()
+        # path-keyed maps of the three indices (kept up to date as transfers
+        # complete so that lookups are O(1))
+        if not scan:
+            self.local_index = []
+            self.remote_index = []
+        else:
+            if local_index is None:
+                local_index = proj.local.index
+            self.local_index = local_index
+            if self.local_only:
+                self.remote_index = last_index
+            else:
+                self.remote_index = proj.osf.index
+        self.last_index = last_index
+        # index changes from other (transfer) threads are queued as events
+        # and applied by the thread that owns this object
+        self._owner = threading.current_thread()
+        self._events = deque()
+        self._event_time = None  # when the event being applied was posted
+        # with an SQLite project store each change is also written there
+        # (but those made while analyzing wait until the changes are applied
+        # so that analyzing, e.g. for a dry run, leaves the store untouched)
+        self._store = proj.store
+        self._deferred = []  # (store method, arg) until applying
+        self._journal = None  # a journal.Journal while applying
+        self._applied = None  # (estimate, start time) once applying
+        self._transfer_log = []  # (time, path) as files are transferred
+        self._generation = 0
+        self._snapshot = (None, ())
+        self._start_generation = self._generation
+        if scan:
+            self.analyze()
         self._status = 0
 
+    @property
+    def change_types(self):
+        """The kinds of change (e.g. 'add_remote'), in the order they are
+        applied
+        """
+        return list(self._change_types)
+
+    @property
+    def local_index(self):
+        return list(self._local_p.values())
+
+    @local_index.setter
+    def local_index(self, index):
+        self._local_p = OrderedDict((asset['path'], asset) for asset in index)
+
+    @property
+    def remote_index(self):
+        return list(self._remote_p.values())
+
+    @remote_index.setter
+    def remote_index(self, index):
+        self._remote_p = OrderedDict((asset['path'], asset) for asset in index)
+
+    @property
+    def last_index(self):
+        """The index as of the last sync, updated as the changes are applied
+        (an ordered list, as stored in the project file)
+        """
+        return list(self._last_p.values())
+
+    @last_index.setter
+    def last_index(self, index):
+        self._last_p = OrderedDict((asset['path'], asset) for asset in index)
+        self._generation = getattr(self, '_generation', 0) + 1
+
+    def _post_event(self, method, *args):
+        """Index changes requested by other threads are queued (deque.append
+        is atomic) rather than changing the index under the owner's feet,
+        with the time they were posted (when the transfer finished)
+        """
+        if threading.current_thread() is self._owner:
+            self.apply_pending()
+            result = method(*args)
+            if self._store is not None:
+                self._store.commit()
+            return result
+        self._events.append((method, args, time.time()))
+        return 1
+
+    def _store_write(self, op, arg):
+        """Writes an index change ('put' an asset or 'delete' a path) to the
+        SQLite store (if any), or keeps it until `_flush_store()`
+        """
+        if self._store is None:
+            return
+        elif self._deferred is not None:
+            self._deferred.append((op, arg))
+        else:
+            getattr(self._store, op)(arg)
+
+    def _flush_store(self):
+        """Writes the index changes made while analyzing to the store (as
+        the changes are about to be applied) and writes later ones at once
+        """
+        deferred, self._deferred = self._deferred, None
+        if self._store is not None and deferred:
+            for op, arg in deferred:
+                getattr(self._store, op)(arg)
+            self._store.commit()
+
+    def take_ownership(self):
+        """Makes the calling thread the one that applies the queued index
+        changes (e.g. when the Changes was created in another thread).
+        `apply()`, `push()` and `finish_sync()` do this themselves so the
+        thread that applies the changes is the one that owns them
+        """
+        self._owner = threading.current_thread()
+
+    def apply_pending(self, max_events=None):
+        """Applies queued index changes (from transfer threads) in a batch.
+        Only has an effect in the thread that created this object.
+
+        Returns the number of changes applied
+        """
+        if threading.current_thread() is not self._owner:
+            return 0
+        n_applied = 0
+        while self._events and n_applied != max_events:
+            method, args, self._event_time = self._events.popleft()
+            try:
+                method(*args)
+            finally:
+                self._event_time = None
+            n_applied += 1
+        if n_applied and self._store is not None:
+            self._store.commit()  # one transaction for the batch
+        return n_applied
+
+    def snapshot(self):
+        """Returns a consistent (immutable) copy of the last_index
+
+        From the owner thread any pending changes are applied first, and the
+        copy is only rebuilt when the index has changed since last time.
+        Other threads get the most recent copy that the owner made
+        """
+        if threading.current_thread() is self._owner:
+            self.apply_pending()
+            if self._snapshot[0] != self._generation:
+                self._snapshot = (self._generation,
+                                  tuple(self._last_p.values()))
+        return self._snapshot[1]
+
     def __str__(self):
         s = "\t Add\t Del\t Mv\t Update\n"
         for kind in ['local', 'remote']:
@@ -77,7 +300,54 @@ class Changes(object):
         return s
 
     def __len__(self):
-        return len(self.dry_run())
+        return sum(len(getattr(self, action_type))
+                   for action_type in self._change_types)
+
+    def estimate(self):
+        """Estimates the cost of applying the changes, before starting
+
+        Returns
+        ----------
+
+        A dict with the bytes to transfer ('upload_bytes' and
+        'download_bytes'), the expected 'requests' by HTTP method (a dict)
+        and in total ('n_requests'), and the expected 'seconds' to apply
+        them at the 'throughput' (bytes/s) and 'latency' (seconds per
+        request) fitted to this project's previous syncs (see
+        `transfer_rates`)
+
+        """
+        requests = dict((method, 0) for method in
+                        ['GET', 'PUT', 'POST', 'DELETE'])
+        upload_bytes = download_bytes = 0
+        zipped = set()
+        for folder, assets in self._zip_folders().items():
+            requests['GET'] += 1  # (one archive for the folder)
+            download_bytes += sum(asset.get('size', 0)
+                                  for asset in assets.values())
+            zipped.update(assets)
+        for action_type in ['add_local', 'update_local']:
+            for path, asset in getattr(self, action_type).items():
+                if asset['kind'] == 'file' and path not in zipped:
+                    requests['GET'] += 1
+                    download_bytes += asset.get('size', 0)
+        for action_type in ['add_remote', 'update_remote']:
+            for asset in getattr(self, action_type).values():
+                requests['PUT'] += 1  # (folders are created by a PUT too)
+                if asset['kind'] == 'file':
+                    upload_bytes += asset.get('size', 0)
+        requests['POST'] += len(self.mv_remote)
+        requests['DELETE'] += len(self.del_remote)
+        n_requests = sum(requests.values())
+        history = getattr(self.proj(), 'sync_history', None) or []
+        throughput, latency = transfer_rates(history)
+        seconds = (n_requests * latency +
+                   (upload_bytes + download_bytes) / float(throughput))
+        return {'upload_bytes': upload_bytes,
+                'download_bytes': download_bytes,
+                'requests': requests, 'n_requests': n_requests,
+                'seconds': seconds, 'throughput': throughput,
+                'latency': latency}
 
     def _set_empty(self):
         for attrib_name in self._change_types:
@@ -128,6 +398,98 @@ class Changes(object):
                      .format(new_path))
         return 1
 
+    def _zip_folders(self):
+        """Finds the folders ('' for the whole project) that are missing
+        locally and whose remote contents are all to be added locally (e.g.
+        on the initial clone) so that each can be fetched as one zip
+        archive. Only folders with at least `zip_min_files` files count.
+
+        Returns a dict of {folder: {path: asset}} for the files within each
+        """
+        if not self.zip_min_files:
+            return {}
+        incomplete = set()  # folders with contents that aren't added
+        below = {}  # folder: {path: asset} of the files added within it
+        for path, asset in self._remote_p.items():
+            folder = os.path.dirname(path)
+            if self.add_local.get(path) is not asset:
+                while folder not in incomplete:
+                    incomplete.add(folder)
+                    if folder == '':
+                        break
+                    folder = os.path.dirname(folder)
+            elif asset['kind'] == 'file':
+                while True:
+                    below.setdefault(folder, {})[path] = asset
+                    if folder == '':
+                        break
+                    folder = os.path.dirname(folder)
+        zip_folders = {}
+        for folder in sorted(below):
+            if folder in incomplete or \
+                    len(below[folder]) < self.zip_min_files:
+                continue
+            elif folder != '' and (folder in self._local_p or
+                                   folder not in self.add_local):
+                continue
+            elif self._area is not None and not in_scope(folder, self._area):
+                continue  # (the zip would be of more than the scope)
+            elif _is_below(folder, zip_folders):
+                continue  # already within one
+            zip_folders[folder] = below[folder]
+        return zip_folders
+
+    def apply_add_local_zip(self, folder, assets):
+        """Downloads a remote folder as a single zip archive (rather than a
+        request per file) and extracts its files one at a time, checking
+        each against its asset from the remote index.
+
+        Returns the set of paths that were added (any others are left for
+        the usual per-file download)
+        """
+        proj = self.proj()
+        added = set()
+        with tempfile.TemporaryFile() as f:
+            if not proj.osf.download_zip(folder, f):
+                return added
+            f.seek(0)
+            try:
+                archive = zipfile.ZipFile(f)
+            except zipfile.BadZipfile:
+                logging.warning("Sync.Changes: bad zip archive for {!r}"
+                                .format(folder))
+                return added
+            for info in archive.infolist():
+                parts = [folder] if folder else []
+                parts.extend(info.filename.split('/'))
+                path = os.path.join(*parts)
+                asset = assets.get(path)
+                if asset is None:
+                    continue  # (folders are created as needed)
+                full_path = os.path.join(proj.local.root_path, path)
+                container = os.path.dirname(full_path)
+                if not os.path.isdir(container):
+                    self._make_dirs(container)
+                digest = getattr(hashlib, SHA.lower())()
+                src = archive.open(info)
+                with open(full_path, 'wb') as dst:
+                    chunk = src.read(proj.osf.session.chunk_size)
+                    while chunk:
+                        digest.update(chunk)
+                        dst.write(chunk)
+                        chunk = src.read(proj.osf.session.chunk_size)
+                src.close()
+                if digest.hexdigest() != asset[SHA]:
+                    logging.warning("Sync.Changes: {} from the zip archive "
+                                    "doesn't match the index".format(path))
+                    os.remove(full_path)
+                    continue
+                self.add_to_index(full_path)
+                added.add(path)
+        logging.info("Sync.Changes done: {} files from zip of {!r}"
+                     .format(len(added), folder))
+        return added
+
     def apply_add_remote(self, asset, new_path=None, threaded=False):
         proj = self.proj()
         if new_path in proj.osf.containers:
@@ -213,38 +575,43 @@ class Changes(object):
                      .format(new_path))
         return 1
 
-    def _asset_from_path(self, path):
-        """Try to find asset and return it
+    def _rel_path(self, path):
+        """Converts a full local path to the path used as the index key
         """
         root = self.proj().root_path
         if path.startswith(root):
             path = path.replace(root, '')
             while path.startswith('/'):
                 path = path[1:]
-        path = path.replace(self.proj().root_path, '')
-        local_dict = dict_from_list(self.local_index, 'path')
-        last_dict = dict_from_list(self.last_index, 'path')
-        remote_dict = dict_from_list(self.remote_index, 'path')
-        if path in local_dict:
-            return local_dict[path]
-        elif path in last_dict:
-            return last_dict[path]
-        elif path in remote_dict:
-            return remote_dict[path]
+        return path
+
+    def _asset_from_path(self, path):
+        """Try to find asset and return it
+        """
+        path = self._rel_path(path)
+        if path in self._local_p:
+            return self._local_p[path]
+        elif path in self._last_p:
+            return self._last_p[path]
+        elif path in self._remote_p:
+            return self._remote_p[path]
         else:
-            for ky in remote_dict.keys():
-                print('  - {}, '.format(ky, remote_dict[ky]['path']))
             return 0  # fail
 
     def add_to_index(self, path):
-        """Tries to find the asset from the path to delete it
+        """Tries to find the asset from the path to add it
 
         Path is ideally a local path (which acts as a key to the asset in
         the local index) but if it's a URL we'll try to deduce the local path
+
+        Safe to call from any thread (see `apply_pending()`)
         """
+        return self._post_event(self._add_to_index, path)
+
+    def _add_to_index(self, path):
         asset = self._asset_from_path(path)
         if asset:
-            self.last_index.append(asset)
+            self._put_in_index(asset)
             return 1  # success
         else:
             logging.error("Was asked to add {} to index but "
@@ -252,10 +619,29 @@ class Changes(object):
                           .format(path))
             return 0  # fail
 
+    def _put_in_index(self, asset):
+        if self._applied is not None and asset['kind'] == 'file':
+            when = self._event_time or time.time()
+            self._transfer_log.append((when, asset['path']))
+        self._last_p[asset['path']] = asset
+        self._generation += 1
+        self._store_write('put', asset)
+        if self._journal is not None:
+            self._journal.put(asset)
+
     def remove_from_index(self, path):
-        asset = self._asset_from_path(path)
-        if asset:
-            self.last_index.remove(asset)
+        """Safe to call from any thread (see `apply_pending()`)
+        """
+        return self._post_event(self._remove_from_index, path)
+
+    def _remove_from_index(self, path):
+        path = self._rel_path(path)
+        if path in self._last_p:
+            del self._last_p[path]
+            self._generation += 1
+            self._store_write('delete', path)
+            if self._journal is not None:
+                self._journal.delete(path)
             return 1  # success
         else:
             logging.error("Was asked to remove {} from index but "
@@ -265,10 +651,22 @@ class Changes(object):
 
 
     def rename_in_index(self, asset, new_path):
-        last_dict = dict_from_list(self.last_index, 'path')
-        if asset['path'] in last_dict:
-            new_asset = last_dict[asset['path']]
+        """Safe to call from any thread (see `apply_pending()`)
+        """
+        return self._post_event(self._rename_in_index, asset, new_path)
+
+    def _rename_in_index(self, asset, new_path):
+        if asset['path'] in self._last_p:
+            new_asset = self._last_p.pop(asset['path'])
+            self._store_write('delete', new_asset['path'])
+            if self._journal is not None:
+                self._journal.delete(new_asset['path'])
             new_asset['path'] = new_path
+            self._last_p[new_path] = new_asset
+            self._generation += 1
+            self._store_write('put', new_asset)
+            if self._journal is not None:
+                self._journal.put(new_asset)
             return 1
         else:
             logging.error("Was asked to remove {} from index but "
@@ -281,36 +679,209 @@ class Changes(object):
         """Apply the changes using the given remote.Session object
         returns a list of strings about what happened (or will happen if
         dry_run=True)
+
+        The operations and the index changes as they complete are written
+        to a journal next to the project file (see `journal`) so that an
+        interrupted sync can be resumed (`Project.resume()`)
         """
+        if self.local_only and not dry_run:
+            raise exceptions.OSFError("These changes were analyzed without "
+                                      "the remote (remote=False) so they "
+                                      "can't be applied")
         proj = self.proj()
         self._status = 1
         actions = []
+        zipped = set()  # files added locally from zip archives
+        if not dry_run:
+            self.begin_apply()
+            for folder, assets in self._zip_folders().items():
+                zipped.update(self.apply_add_local_zip(folder, assets))
         # would it be wise to perform del operations before others?
         for action_type in self._change_types:
             action_dict = getattr(self, action_type)
-            path_list = list(action_dict.keys())  # for Python3 convert to list
-            # sort by path
-            if action_type[:3] in ['del', 'mv_']:
-                reverse = True  # so folders deleted last
-            else:
-                reverse = False  # so folders created first
-            path_list.sort(reverse=reverse)
+            path_list = self.apply_order(action_type)
             # get the self.apply___() function to be applied
             func_apply = getattr(self, "apply_{}".format(action_type))
             for new_path in path_list:
                 asset = action_dict[new_path]
+                if action_type == 'add_local' and new_path in zipped:
+                    continue
                 if dry_run:
                     actions.append("{}: {}".format(action_type, new_path))
                 else:
                     func_apply(asset, new_path, threaded=threaded)
         if not dry_run:
-            proj.local._needs_rebuild_index = True
+            if self.paths is None:  # (else the paths are rescanned)
+                proj.local._needs_rebuild_index = True
             if threaded:
-                proj.osf.session.apply_changes()  # starts the up/downloads
+                proj.osf.session.apply_changes(self)  # starts the up/downloads
             else:
                 self.finish_sync()
         return actions
 
+    def apply_order(self, action_type, action_dict=None):
+        """The paths of one kind of change (or of `action_dict`, a subset of
+        them) in the order they are applied: moves and deletions by path
+        in reverse (so folders are deleted last) and the rest with folders
+        first then the files in the chosen `order` (see `transfer_order`)
+        """
+        if action_dict is None:
+            action_dict = getattr(self, action_type)
+        if action_type[:3] in ['del', 'mv_']:
+            return sorted(action_dict, reverse=True)
+        return transfer_order(action_dict, self.order, self.priority)
+
+    def begin_apply(self):
+        """Prepares to apply the changes: the calling thread takes ownership
+        (see `take_ownership()`), what was planned and when is noted (for
+        the project's sync_history and `transfer_report()`) and the journal
+        is started. `apply()` does this itself; call it first when applying
+        the operations some other way (as manager.SyncManager does)
+        """
+        self.take_ownership()
+        self._flush_store()
+        if self._applied is None:
+            self._applied = (self.estimate(), time.time())
+            self._transfer_log = []
+        self.start_journal()
+
+    def start_journal(self):
+        """Writes the operations about to be applied to a new journal next
+        to the project file (unless one was started already) in which the
+        index changes are then recorded as the operations complete
+        """
+        proj = self.proj()
+        if self._journal is not None or not proj.project_file:
+            return
+        proj.unfinished = proj._journal_records = None  # (superseded)
+        self._journal = journal.Journal(
+            journal.journal_path(proj.project_file))
+        self._journal.start(dict((action_type, getattr(self, action_type))
+                                 for action_type in self._change_types))
+
+    def push(self):
+        """Uploads the local additions and updates found without the remote
+        (remote=False) and doesn't list the remote at all: the folders and
+        links come from the last index, which is then patched from the
+        upload replies (folders it has no links for are looked up once).
+        Local deletions are not pushed (for machines that only ever add
+        data).
+
+        If the server rejects a new file because one was added at that path
+        from elsewhere, the local copy is uploaded with a _CONFLICT name
+        (and neither is entered in the index, so the next full sync sees
+        them both). The _CONFLICT name comes from the local date so later
+        pushes of the same version find it uploaded already. An update of a
+        file deleted remotely is uploaded anew.
+
+        Returns a list of strings about what happened
+        """
+        if not self.local_only:
+            raise exceptions.OSFError("push() is for changes analyzed "
+                                      "without the remote (remote=False)")
+        self.take_ownership()
+        self._flush_store()
+        proj = self.proj()
+        osf = proj.osf
+        # the known folders mean no crawl is needed to find containers
+        osf.containers = dict((path, asset)
+                              for path, asset in self._last_p.items()
+                              if asset['kind'] == 'folder' and
+                              'links' in asset)
+        osf.containers[''] = osf.as_asset()
+        self._listings = {}  # for looking up links missing from the index
+        self._status = 1
+        # folders uploaded by a full sync have no links in the index: look
+        # them up (and keep their links) rather than trying to create them
+        parents = set()
+        for path in self.add_remote:
+            folder = os.path.dirname(path)
+            while folder and folder not in parents:
+                parents.add(folder)
+                folder = os.path.dirname(folder)
+        for folder in sorted(parents):
+            last = self._last_p.get(folder)
+            if folder in osf.containers or last is None or \
+                    last['kind'] != 'folder':
+                continue
+            remote_folder = osf.lookup(folder, self._listings)
+            if remote_folder is not None and \
+                    remote_folder['kind'] == 'folder':
+                osf.containers[folder] = remote_folder
+                self._put_in_index(_pushed(last, remote_folder))
+        actions = []
+        for path in sorted(self.add_remote):
+            asset = self.add_remote[path]
+            if asset['kind'] == 'folder':
+                self._put_in_index(_pushed(asset, osf.add_container(path)))
+                actions.append("add_remote: {}".format(path))
+            else:
+                actions.append(self._push_file(asset, update=False))
+        for path in sorted(self.update_remote):
+            actions.append(self._push_file(self.update_remote[path],
+                                           update=True))
+        if self.del_remote:
+            logging.info("Sync.push: {} local deletions not pushed"
+                         .format(len(self.del_remote)))
+        if self._store is not None:
+            self._store.commit()
+        snapshot = self.snapshot()
+        if self._generation != self._start_generation:
+            proj.index = self._outside + list(snapshot)
+        self._set_empty()
+        self._status = -1
+        proj.save(defer=True)
+        return actions
+
+    def _push_file(self, asset, update):
+        """Uploads a single file for push(), returning what happened
+        """
+        osf = self.proj().osf
+        path = asset['path']
+        action = "update_remote" if update else "add_remote"
+        if update:
+            last = self._last_p.get(path)
+            if last is not None and 'links' in last:
+                links = last['links']
+            else:  # (e.g. uploaded by a full sync, which stores no links)
+                remote_asset = osf.lookup(path, self._listings)
+                links = remote_asset and remote_asset['links']
+            asset = copy.copy(asset)
+            if links:
+                asset['links'] = links
+            else:
+                update = False  # not found remotely so add it anew
+        try:
+            node = osf.add_file(asset, update=update)
+        except exceptions.HTTPSError as err:
+            if update and err.status_code in [404, 410]:
+                # deleted remotely: upload it anew
+                logging.warning("Sync.push: {} was deleted remotely so "
+                                "uploading it again".format(path))
+                node = osf.add_file(asset)
+            elif not update and err.status_code == 409:
+                # added from elsewhere too (code:011 without the remote)
+                new_path = conflict_paths(path, asset['date_modified'],
+                                          None)[0]
+                try:
+                    osf.add_file(asset, new_path=new_path)
+                except exceptions.HTTPSError as err:
+                    if err.status_code != 409:
+                        raise
+                    # (named by the local date so this version was uploaded
+                    # by an earlier push, awaiting a full sync)
+                    logging.info("Sync.push: {} conflict already uploaded "
+                                 "as {}".format(path, new_path))
+                else:
+                    logging.warning("Sync.push: {} conflict (added remotely "
+                                    "too) uploaded as {}"
+                                    .format(path, new_path))
+                return "conflict: {} -> {}".format(path, new_path)
+            else:
+                raise
+        self._put_in_index(_pushed(asset, node.as_asset()))
+        return "{}: {}".format(action, path)
+
     def dry_run(self):
         """Doesn't do anything but returns a list of strings describing the
         actions
@@ -324,10 +895,11 @@ class Changes(object):
             dict during sync {'up':[done, total], 'down':[done, total]}
             1 for finished
         """
+        self.apply_pending()  # keep the index up to date with transfers
         if self._status in [0, -1]:  # not started or had already finished
             return self._status
         # otherwise we're partway through sync so check with session
-        prog = self.proj().osf.session.get_progress()
+        prog = self.proj().osf.session.get_progress(self)
         if prog == 1:
             self._status = -1  # was running but now finished
         else:
@@ -337,36 +909,288 @@ class Changes(object):
     def finish_sync(self):
         """Rebuilds index and saves project file when the sync has finished
         """
+        self.take_ownership()  # (so the queued index changes are applied)
+        self._flush_store()
         proj = self.proj()
         # when local/remote updates are complete refresh index based on local
-        proj.local.rebuild_index()
-        # proj.index = proj.local.index
+        snapshot = self.snapshot()
+        scan_options = {'scope': self.scope} if self.scope else {}
+        if self.paths is not None:
+            # (files as hashed for the analysis needn't be hashed again)
+            known = snapshot if self.mirror else self.local_index
+            local_index = proj.local.update(self.paths, known=known)
+        elif self.mirror:
+            proj.local.rebuild_index(known=snapshot, **scan_options)
+            local_index = proj.local.index
+        else:
+            proj.local.rebuild_index(**scan_options)
+        n_noted = 0
+        if self.mirror:
+            n_noted = self._note_local_dates(snapshot, local_index)
+        if n_noted or self._generation != self._start_generation:
+            # marks the project as needing save
+            proj.index = self._outside + list(snapshot)
+        if n_noted:
+            # (noted on the assets in place, so the index compares equal)
+            proj.mark_dirty()
+        if self._applied is not None:
+            self._record_sync(*self._applied)
+            self._report = self.transfer_report()
+            self._applied = None
         self._set_empty()
-        proj.save()
+        proj.save(defer=True)
+        if self._journal is not None:
+            proj.flush()  # (the journal is only needed until it's saved)
+            self._journal.finish()
+            self._journal = None
         if hasattr(logging, 'flush'):  # psychopy.logging has control of flush
             logging.flush()
 
-    def analyze(self):
-        """Take a list of files
+    def transfer_report(self):
+        """How soon the files were transferred by (the last) `apply()` with
+        its order policy, to compare policies by the time to the first
+        useful data
+
+        Returns a dict with the 'order' (see `order_name`), the number of
+        files transferred ('n_files') and the seconds from the start of
+        `apply()` until the first file was done ('first_file'), until the
+        first and the last file matching the `priority` globs were done
+        ('first_useful' and 'all_useful', for any file if there are no
+        globs) and until the last file was done ('seconds'), or None for
+        times with no such files
+        """
+        if self._applied is None:
+            return getattr(self, '_report', None)  # (since finished)
+        start = self._applied[1]
+        times = [when - start for when, path in self._transfer_log]
+        useful = [when - start for when, path in self._transfer_log
+                  if not self.priority or
+                  _priority_of(path, self.priority) < len(self.priority)]
+        return {'order': order_name(self.order, self.priority),
+                'n_files': len(times),
+                'first_file': min(times) if times else None,
+                'first_useful': min(useful) if useful else None,
+                'all_useful': max(useful) if useful else None,
+                'seconds': max(times) if times else None}
+
+    def _record_sync(self, planned, start):
+        """Adds the bytes, requests and seconds taken by this sync to the
+        project's sync_history (the last constants.SYNC_HISTORY syncs) from
+        which later estimates are made
         """
-        local = self.local_index
-        remote = self.remote_index
-        index = self.last_index
-        # copies of the three asset lists.
+        proj = self.proj()
+        if not planned['n_requests']:
+            return  # (nothing to learn from)
+        report = self.transfer_report()
+        record = {'bytes': planned['upload_bytes'] +
+                  planned['download_bytes'],
+                  'requests': planned['n_requests'],
+                  'seconds': round(time.time() - start, 3),
+                  'order': report['order']}
+        if report['first_useful'] is not None:
+            record['first_useful'] = round(report['first_useful'], 3)
+        history = proj.sync_history + [record]
+        proj.sync_history = history[-constants.SYNC_HISTORY:]
+
+    def load_plan(self, plan):
+        """Sets the operations to apply from a plan, {action_type: {path:
+        asset}} (e.g. what was left of an interrupted sync, see `journal`),
+        so that a Changes created with scan=False can apply them without
+        scanning or crawling. The remote folders are taken from the last
+        index
+
+        Returns a list of the actions as "action_type: path"
+        """
+        actions = []
+        for action_type in self._change_types:
+            action_dict = dict(plan.get(action_type, {}))
+            setattr(self, action_type, action_dict)
+            for path, asset in sorted(action_dict.items()):
+                actions.append("{}: {}".format(action_type, path))
+                # (the assets to enter in the index as operations complete)
+                if action_type.endswith('_remote'):
+                    self._local_p[asset['path']] = asset
+                else:
+                    self._remote_p[asset['path']] = asset
+        osf = self.proj().osf
+        if not osf.containers:
+            osf.containers = dict((path, asset)
+                                  for path, asset in self._last_p.items()
+                                  if asset['kind'] == 'folder' and
+                                  'links' in asset)
+            osf.containers[''] = osf.as_asset()
+        return actions
+
+    def _note_local_dates(self, index, local_index):
+        """Stores the local date (as 'local_modified') of the files in the
+        index whose entry has the remote date (i.e. downloads) but matches
+        the local copy, so that later mirror syncs needn't hash them again.
+
+        Returns the number of entries changed
+        """
+        local_p = dict((asset['path'], asset) for asset in local_index)
+        n_noted = 0
+        for asset in index:
+            local_asset = local_p.get(asset['path'])
+            if asset['kind'] != 'file' or local_asset is None or \
+                    local_asset.get(SHA) != asset.get(SHA):
+                continue
+            local_date = local_asset['date_modified']
+            if local_date not in [asset['date_modified'],
+                                  asset.get('local_modified')]:
+                asset['local_modified'] = local_date
+                n_noted += 1
+        return n_noted
+
+    def _unchanged_folders(self):
+        """Returns the set of folders whose contents are identical in the
+        local, remote and last-sync indices (by comparing folder digests)
+        """
+        local = folder_digests(self._local_p.values(), SHA)
+        remote = folder_digests(self._remote_p.values(), SHA)
+        last = folder_digests(self._last_p.values(), SHA)
+        return set(path for path, digest in local.items()
+                   if remote.get(path) == digest and last.get(path) == digest)
+
+    def analyze(self, engine=None):
+        """Compares the local, remote and last-sync indices and fills in the
+        change dicts
+
+        Parameters
+        ----------
+
+        engine : 'dict', 'merge' or 'numpy' (defaults to self.engine)
+            'dict' looks each path up in path-keyed copies of the indices
+            and skips folders whose contents match everywhere. 'merge'
+            walks the three indices in path order in a single pass (see
+            `_merge_join`). It only streams them, without copying, where
+            they are already sorted by path: the others are sorted first,
+            which costs O(n log n) time and a list of each of them.
+            'numpy' (needs numpy) finds the paths needing no action with
+            array operations and only resolves the rest one by one.
+            All give the same changes
+
+        """
+        if engine is None:
+            engine = self.engine
+        if engine == 'merge':
+            return self._analyze_merge()
+        elif engine == 'numpy':
+            return self._analyze_numpy()
+        elif engine != 'dict':
+            raise ValueError("Unknown analyze engine: {}".format(engine))
+        # copies of the three path-keyed maps.
         # Safe to alter these only at top level
-        local_p = dict_from_list(local, 'path')
-        remote_p = dict_from_list(remote, 'path')
-        index_p = dict_from_list(index, 'path')
+        local_p = dict(self._local_p)
+        remote_p = dict(self._remote_p)
+        index_p = dict(self._last_p)
+        # contents of folders that match everywhere need no analysis
+        unchanged = self._unchanged_folders()
+        if unchanged:
+            for this_dict in [local_p, remote_p, index_p]:
+                for path in list(this_dict.keys()):
+                    if _is_below(path, unchanged):
+                        del this_dict[path]
+            logging.debug("Sync.analyze skipped {} unchanged folders"
+                          .format(len(unchanged)))
 
         # go through the files in the database
         for path, asset in index_p.items():
             # code:1xx all these files existed at last sync
-            if path in remote_p.keys() and path in local_p.keys():
+            if self._resolve(path, asset, local_p.pop(path, None),
+                             remote_p.pop(path, None)):
+                self.remove_from_index(path)
+        # go through the files in the local
+        for path, local_asset in local_p.items():
+            # code:01x we know these files aren't in index but are local
+            self._resolve(path, None, local_asset, remote_p.pop(path, None))
+        # go through the files in the remote
+        for path, remote_asset in remote_p.items():
+            # code:001 has been created remotely
+            self._resolve(path, None, None, remote_asset)
+
+    def _analyze_merge(self):
+        """The 'merge' engine for analyze(): a three-way merge-join of the
+        indices sorted by path (each index not yet in path order is sorted
+        into a new list first)
+        """
+        removed = []  # (the index can't change while we're walking it)
+        for path, asset, local_asset, remote_asset in _merge_join(
+                _path_sorted(self._last_p.values()),
+                _path_sorted(self._local_p.values()),
+                _path_sorted(self._remote_p.values())):
+            if self._resolve(path, asset, local_asset, remote_asset):
+                removed.append(path)
+        for path in removed:
+            self.remove_from_index(path)
+
+    def _analyze_numpy(self):
+        """The 'numpy' engine for analyze(): the paths (as sorted arrays of
+        utf-8 bytes) of the three indices are matched with searchsorted and
+        the rows that need no action (files identical everywhere, folders
+        in all three, files added identically on both sides) are masked
+        out by comparing fixed-width digest arrays. Only the remaining rows
+        go through `_resolve()`
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("The 'numpy' analyze engine needs numpy")
+        indices = [_IndexArrays(np, self._last_p.values()),
+                   _IndexArrays(np, self._local_p.values()),
+                   _IndexArrays(np, self._remote_p.values())]
+        all_paths = np.unique(np.concatenate([ind.paths for ind in indices]))
+        last, local, remote = [ind.match(all_paths) for ind in indices]
+        rows = []  # for each index: (present, digest, is_folder, has_sha)
+        for ind, pos in zip(indices, [last, local, remote]):
+            present = pos >= 0
+            safe = np.where(present, pos, 0)
+            if len(ind.paths):
+                rows.append((present, ind.digests[safe],
+                             ind.is_folder[safe], ind.has_sha[safe]))
+            else:
+                rows.append((present, np.zeros(len(pos), 'S1'),
+                             np.zeros(len(pos), bool),
+                             np.zeros(len(pos), bool)))
+        (in_last, d_last, folder_last, sha_last), \
+            (in_local, d_local, folder_local, sha_local), \
+            (in_remote, d_remote, folder_remote, sha_remote) = rows
+        # code:111 folders and files that match everywhere: no action
+        all_three = in_last & in_local & in_remote
+        quiet = all_three & folder_last
+        quiet |= all_three & sha_last & sha_local & sha_remote \
+            & (d_last == d_local) & (d_last == d_remote)
+        # code:011 files (identical or not, there's no action)
+        identical = d_local == d_remote if self.mirror else True
+        quiet |= ~in_last & in_local & in_remote & ~folder_local \
+            & sha_local & sha_remote & identical
+        removed = []
+        for ii in np.nonzero(~quiet)[0]:
+            assets = [ind.asset(pos[ii]) for ind, pos in
+                      zip(indices, [last, local, remote])]
+            path = all_paths[ii].decode('utf-8')
+            if self._resolve(path, *assets):
+                removed.append(path)
+        for path in removed:
+            self.remove_from_index(path)
+        logging.debug("Sync.analyze (numpy) resolved {} of {} paths"
+                      .format(len(quiet) - int(quiet.sum()), len(quiet)))
+
+    def _resolve(self, path, asset, local_asset, remote_asset):
+        """Decides the action for one path given its asset in the last index,
+        the local and the remote (each None if absent), following the
+        resolutions table above, and adds it to the change dicts.
+
+        Returns True if the path should be removed from the index
+        """
+        if self.mirror:
+            return self._resolve_mirror(path, asset, local_asset,
+                                        remote_asset)
+        if asset is not None:
+            # code:1xx all these files existed at last sync
+            if remote_asset is not None and local_asset is not None:
                 # code:111
                 # Still exists in all. Check for local/remote modifications
-                local_asset = local_p[path]
-                remote_asset = remote_p[path]
-
                 if asset['kind'] == 'folder':
                     # for folders check /contents/ not folder itself
                     logging.debug("Sync.analyze 111a: {} no action"
@@ -400,7 +1224,7 @@ class Changes(object):
                     # TODO: we know the files differ and we presume the remote
                     # is the newer one. Could check the date_modified?
                     # But if they differed wouldn't that mean a clock err?
-                    self.update_local['path'] = remote_asset
+                    self.update_local[path] = remote_asset
                     logging.info("Sync.analyze 111d: {} changed remotely"
                                  .format(path))
 
@@ -410,25 +1234,21 @@ class Changes(object):
                     # is the newer one. Could check the date_modified?
                     # But if they differed wouldn't that mean a clock err?
                     # fetch the links from the remote so we can do an update op
-                    local_asset['links'] = remote_asset['links']
-                    self.update_remote['path'] = local_asset
+                    if 'links' in remote_asset:  # (not when local_only)
+                        local_asset['links'] = remote_asset['links']
+                    self.update_remote[path] = local_asset
                     logging.info("Sync.analyze 111e: {} changed locally"
                                  .format(path))
 
-                # don't re-analyze
-                del local_p[path]
-                del remote_p[path]
-
-            elif path not in remote_p.keys() and path not in local_p.keys():
+            elif remote_asset is None and local_asset is None:
                 # code:100
                 # Was deleted in both. Remove from index
                 logging.debug("Sync.analyze 100: {}"
                               "deleted locally and remotely"
                               .format(path))
-                self.remove_from_index(path)
+                return True
 
-            elif path not in local_p.keys():
-                remote_asset = remote_p[path]
+            elif local_asset is None:
                 # code:101 has been deleted locally but exists remotely
                 if asset['date_modified'] < remote_asset['date_modified']:
                     # deleted locally but changed on remote. Recreate
@@ -447,12 +1267,10 @@ class Changes(object):
                     logging.info("Sync.analyze 101b: {}  "
                                   "deleted locally (and unchanged remotely)"
                                   .format(path))
-                del remote_p[path]  # remove so we don't re-analyze
 
-            elif path not in remote_p.keys():
+            else:
                 # has been deleted remotely but exists locally
                 # code:110
-                local_asset = local_p[path]
                 if asset['date_modified'] < local_asset['date_modified']:
                     # deleted remotely but changed on local. Recreate
                     # make new path and get the newer asset info
@@ -470,36 +1288,257 @@ class Changes(object):
                     logging.info("Sync.analyze 110b: {} "
                                  "deleted remotely (and unchanged locally)"
                                  .format(path))
-                del local_p[path]  # remove so we don't re-analyse
 
-        # go through the files in the local
-        for path, local_asset in local_p.items():
+        elif local_asset is not None:
             # code:01x we know these files aren't in index but are local
-            if path in remote_p.keys():
-                if local_asset['kind'] == 'folder':  # if folder then leave
-                    continue
-                # TODO: do we need to handle the case that the user creates a
-                # folder in one place and file in another with same names?!
-                remote_asset = remote_p[path]
-                # code:011
-                if remote_asset[SHA] == local_asset[SHA]:
-                    # both copies match but not in index (user uplaoded?)
-                    logging.debug("Sync.analyze 011a: {} "
-                                  "added remotely and locally (identical file)"
-                                  .format(path))
-                del remote_p[path]
-            else:
+            if remote_asset is None:
                 # code:010
                 self.add_remote[path] = local_asset
                 logging.info("Sync.analyze 010a: {} added locally"
                              .format(path))
+            elif local_asset['kind'] == 'folder':
+                # code:011 for a folder: added locally by the remote version
+                # (which brings its links) so that it gets into the index
+                self.add_local[path] = remote_asset
+                logging.info("Sync.analyze 011b: {} folder added remotely "
+                             "and locally".format(path))
+            # TODO: do we need to handle the case that the user creates a
+            # folder in one place and file in another with same names?!
+            elif remote_asset[SHA] == local_asset[SHA]:
+                # code:011
+                # both copies match but not in index (user uplaoded?)
+                logging.debug("Sync.analyze 011a: {} "
+                              "added remotely and locally (identical file)"
+                              .format(path))
 
-        # go through the files in the remote
-        for path, remote_asset in remote_p.items():
+        else:
             # code:001 has been created remotely
             self.add_local[path] = remote_asset
             logging.info("Sync.analyze 001a: {} added remotely"
                          .format(path))
+        return False
+
+
+    def _resolve_mirror(self, path, asset, local_asset, remote_asset):
+        """The `_resolve()` for mirror=True: the remote always wins and
+        only local actions are found. Files that were only ever local
+        (not in the last index) are left alone
+        """
+        if remote_asset is None:
+            if asset is not None and local_asset is not None:
+                self.del_local[path] = asset
+                logging.info("Sync.analyze mirror: {} deleted remotely"
+                             .format(path))
+            return asset is not None and local_asset is None
+        elif local_asset is None:
+            self.add_local[path] = remote_asset
+            logging.info("Sync.analyze mirror: {} missing locally"
+                         .format(path))
+        elif remote_asset['kind'] == 'folder':
+            if asset is None:  # so that it gets into the index
+                self.add_local[path] = remote_asset
+        elif local_asset[SHA] != remote_asset[SHA]:
+            self.update_local[path] = remote_asset
+            logging.info("Sync.analyze mirror: {} differs from remote"
+                         .format(path))
+        return False
+
+
+class _IndexArrays(object):
+    """An index as numpy arrays sorted by path (utf-8 bytes) with the
+    digests as fixed-width bytes, for the 'numpy' analyze engine
+    """
+    def __init__(self, np, assets):
+        self.assets = list(assets)
+        paths, digests, is_folder, has_sha = [], [], [], []
+        for asset in self.assets:
+            digest = asset.get(SHA)
+            paths.append(asset['path'].encode('utf-8'))
+            digests.append((digest or '').encode('utf-8'))
+            is_folder.append(asset['kind'] == 'folder')
+            has_sha.append(digest is not None)
+        paths = np.array(paths, dtype=bytes)
+        self.order = np.argsort(paths, kind='stable')
+        self.paths = paths[self.order]
+        self.digests = np.array(digests, dtype=bytes)[self.order]
+        self.is_folder = np.array(is_folder, dtype=bool)[self.order]
+        self.has_sha = np.array(has_sha, dtype=bool)[self.order]
+        self.np = np
+
+    def match(self, all_paths):
+        """The position of each of all_paths in this index (or -1)
+        """
+        np = self.np
+        if not len(self.paths):
+            return np.full(len(all_paths), -1)
+        pos = np.searchsorted(self.paths, all_paths)
+        safe = np.minimum(pos, len(self.paths) - 1)
+        return np.where(self.paths[safe] == all_paths, safe, -1)
+
+    def asset(self, pos):
+        return self.assets[self.order[pos]] if pos >= 0 else None
+
+
+def _path_sorted(assets):
+    """Returns the assets in order of path: as they are if already sorted
+    (checked in one pass) or else as a new sorted list (O(n) extra memory
+    and O(n log n) time)
+    """
+    if all(a['path'] < b['path'] for a, b in _pairs(assets)):
+        return assets
+    return sorted(assets, key=_path_of)
+
+
+def _path_of(asset):
+    return asset['path']
+
+
+def _pairs(items):
+    """Yields consecutive pairs from an iterable
+    """
+    items = iter(items)
+    previous = next(items, None)
+    for item in items:
+        yield previous, item
+        previous = item
+
+
+def _merge_join(*streams):
+    """Walks several path-sorted streams of assets together, yielding
+    (path, asset_or_None, ...) for every path in any of them
+    """
+    iterators = [iter(stream) for stream in streams]
+    heads = [next(iterator, None) for iterator in iterators]
+    while True:
+        paths = [head['path'] for head in heads if head is not None]
+        if not paths:
+            return
+        path = min(paths)
+        row = [path]
+        for ii, head in enumerate(heads):
+            if head is not None and head['path'] == path:
+                row.append(head)
+                heads[ii] = next(iterators[ii], None)
+            else:
+                row.append(None)
+        yield tuple(row)
+
+
+def _is_below(path, folders):
+    """Checks whether a path is inside any of the given folders
+    """
+    folder = os.path.dirname(path)
+    while folder not in folders:
+        if folder == '':
+            return False
+        folder = os.path.dirname(folder)
+    return True
+
+
+def transfer_rates(history):
+    """Fits the time taken by previous syncs, as records of their 'bytes',
+    'requests' and 'seconds', to seconds = requests * latency + bytes /
+    throughput (by least squares)
+
+    Returns (throughput, latency) in bytes/s and seconds per request, using
+    constants.DEFAULT_LATENCY (and DEFAULT_THROUGHPUT) for what the history
+    can't tell apart
+    """
+    history = [record for record in history if record['seconds'] > 0]
+    s_rr = sum(record['requests']**2 for record in history)
+    s_bb = sum(record['bytes']**2 for record in history)
+    s_rb = sum(record['requests'] * record['bytes'] for record in history)
+    s_rt = sum(record['requests'] * record['seconds'] for record in history)
+    s_bt = sum(record['bytes'] * record['seconds'] for record in history)
+    det = float(s_rr * s_bb - s_rb**2)
+    if det > 1e-6 * s_rr * s_bb:
+        latency = (s_rt * s_bb - s_bt * s_rb) / det
+        per_byte = (s_bt * s_rr - s_rt * s_rb) / det
+        if latency >= 0 and per_byte > 0:
+            return 1 / per_byte, latency
+    # otherwise assume the default latency and fit the throughput alone
+    latency = constants.DEFAULT_LATENCY
+    n_bytes = sum(record['bytes'] for record in history)
+    seconds = sum(max(record['seconds'] - record['requests'] * latency, 0)
+                  for record in history)
+    if n_bytes and seconds:
+        return n_bytes / seconds, latency
+    return constants.DEFAULT_THROUGHPUT, latency
+
+
+ORDERS = ['path', 'smallest', 'largest', 'newest']
+
+
+def transfer_order(action_dict, order='path', priority=()):
+    """Returns the paths of transfers, {path: asset}, in the order to apply
+    them. With the 'path' order and no priority that is alphabetical (so
+    folders come before their contents). Otherwise the folders come first
+    (alphabetically) then the files:
+
+        'path' : alphabetically
+        'smallest' : the smallest first (many small files are done soonest)
+        'largest' : the largest first (so that parallel transfers finish at
+            about the same time rather than one large file at the end)
+        'newest' : the most recently modified first
+
+    with the files matching the priority globs (fnmatch patterns of paths
+    such as 'data/*.csv', where * also matches '/') before the others, in
+    the order of the globs
+    """
+    if order not in ORDERS:
+        raise ValueError("Unknown transfer order {!r} (use one of {})"
+                         .format(order, ORDERS))
+    if order == 'path' and not priority:
+        return sorted(action_dict)
+    folders = sorted(path for path, asset in action_dict.items()
+                     if asset['kind'] == 'folder')
+    files = sorted(path for path, asset in action_dict.items()
+                   if asset['kind'] != 'folder')
+    if order == 'smallest':
+        files.sort(key=lambda path: action_dict[path].get('size') or 0)
+    elif order == 'largest':
+        files.sort(key=lambda path: action_dict[path].get('size') or 0,
+                   reverse=True)
+    elif order == 'newest':
+        files.sort(key=lambda path: action_dict[path].get('date_modified')
+                   or '', reverse=True)
+    if priority:
+        files.sort(key=lambda path: _priority_of(path, priority))
+    return folders + files
+
+
+def _priority_of(path, priority):
+    """The index of the first glob matching the path (len(priority) if
+    none does)
+    """
+    for n, pattern in enumerate(priority):
+        if fnmatch.fnmatch(path, pattern):
+            return n
+    return len(priority)
+
+
+def order_name(order, priority=()):
+    """A name for an order policy, e.g. 'smallest' or 'path+data/*.csv'
+    """
+    return '+'.join([order] + list(priority))
+
+
+def compare_orders(history):
+    """Summarizes the syncs in a project's `sync_history` by their order
+    policy, to pick the one that gets useful data (see `transfer_report`)
+    soonest
+
+    Returns {order: {'n_syncs': n, 'first_useful': mean seconds}}
+    """
+    summary = {}
+    for record in history:
+        if record.get('first_useful') is None:
+            continue
+        times = summary.setdefault(record.get('order', 'path'), [])
+        times.append(record['first_useful'])
+    return dict((order, {'n_syncs': len(times),
+                         'first_useful': sum(times) / len(times)})
+                for order, times in summary.items())
 
 
 def recreated_path(path):
@@ -510,6 +1549,18 @@ def recreated_path(path):
     return root+"_DELETED"+ext
 
 
+def _pushed(local_asset, remote_asset):
+    """The index entry for a pushed file or folder: the local asset (whose
+    size and date let the next push skip hashing it) with the id and links
+    from the remote
+    """
+    asset = copy.copy(local_asset)
+    for key in ['id', 'links', 'url']:
+        if key in remote_asset:
+            asset[key] = remote_asset[key]
+    return asset
+
+
 def conflict_paths(path, local_time, server_time):
     """
     """
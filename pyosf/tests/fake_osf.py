@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""An in-memory stand-in for the OSF API and file service so that the sync
+machinery can be tested without going online
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import datetime
+import hashlib
+import json
+import io
+import zipfile
+try:
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from urlparse import urlparse, parse_qs
+import os
+from pyosf import remote, project, constants
+
+
+class FakeResponse(object):
+    """Mimics the parts of requests.Response that pyosf uses
+    """
+    def __init__(self, status_code, data=None, content=b'', headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+    def iter_content(self, chunk_size=1):
+        for ii in range(0, len(self.content), chunk_size):
+            yield self.content[ii:ii+chunk_size]
+
+
+class FakeOSF(object):
+    """A single OSF project node with an osfstorage provider
+
+    Files are stored by path ('folder/file.txt'), folders as paths with no
+    content. All mutations are recorded in the node logs (newest first when
+    served, as on the OSF) and every request is recorded in `self.requests`
+    """
+    files_base = 'https://files.fake.osf/v1/resources'
+
+    def __init__(self, node_id='fake1', log_page_size=10):
+        self.node_id = node_id
+        self.log_page_size = log_page_size
+        self.entries = {}  # path: dict(id, kind, content, modified)
+        self.logs = []  # oldest first
+        self.requests = []
+        self.n_not_modified = 0  # count of 304 replies
+        self.valid_tokens = None  # a set of tokens to enforce auth
+        self._n_ids = 0
+        self._time = datetime.datetime(2020, 1, 1)
+
+    # ---- helpers to change the project "on the server" ----
+
+    def _now(self):
+        self._time += datetime.timedelta(seconds=1)
+        return self._time.isoformat()
+
+    def _new_id(self):
+        self._n_ids += 1
+        return "{}f{:06d}".format(self.node_id, self._n_ids)
+
+    def _log(self, action, **params):
+        self.logs.append({'id': "log{:06d}".format(len(self.logs)+1),
+                          'type': 'logs',
+                          'attributes': {'action': action,
+                                         'date': self._time.isoformat(),
+                                         'params': params}})
+
+    def _add_parents(self, path, log=True):
+        parent = path.rpartition('/')[0]
+        if parent and parent not in self.entries:
+            self.add_folder(parent, log=log)
+
+    def add_folder(self, path, log=True):
+        self._add_parents(path, log=log)
+        self.entries[path] = {'id': self._new_id(), 'kind': 'folder',
+                              'modified': self._now()}
+        if log:
+            self._log('osf_storage_folder_created', path='/'+path+'/')
+        return self.entries[path]
+
+    def add_file(self, path, content, log=True):
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        self._add_parents(path, log=log)
+        if path in self.entries:
+            entry = self.entries[path]
+            action = 'osf_storage_file_updated'
+        else:
+            entry = self.entries[path] = {'id': self._new_id(),
+                                          'kind': 'file'}
+            action = 'osf_storage_file_added'
+        entry['content'] = content
+        entry['modified'] = self._now()
+        if log:
+            self._log(action, path='/'+path)
+        return entry
+
+    def remove(self, path, log=True):
+        kind = self.entries[path]['kind']
+        for this_path in list(self.entries):
+            if this_path == path or this_path.startswith(path+'/'):
+                del self.entries[this_path]
+        self._now()
+        if log:
+            if kind == 'folder':
+                path += '/'
+            self._log('osf_storage_file_removed', path='/'+path)
+
+    def move(self, path, new_path, log=True):
+        kind = self.entries[path]['kind']
+        self._add_parents(new_path, log=log)
+        for this_path in sorted(self.entries):
+            if this_path == path or this_path.startswith(path+'/'):
+                moved = new_path + this_path[len(path):]
+                self.entries[moved] = self.entries.pop(this_path)
+        self._now()
+        if log:
+            trail = '/' if kind == 'folder' else ''
+            self._log('addon_file_moved',
+                      source={'materialized': '/'+path+trail,
+                              'provider': 'osfstorage'},
+                      destination={'materialized': '/'+new_path+trail,
+                                   'provider': 'osfstorage'})
+
+    # ---- JSON representations ----
+
+    def _storage_url(self, entry_id=''):
+        return "{}/{}/providers/osfstorage/{}".format(
+            self.files_base, self.node_id, entry_id)
+
+    def _entry_json(self, path):
+        entry = self.entries[path]
+        name = path.rpartition('/')[2]
+        attrs = {'name': name, 'kind': entry['kind'],
+                 'path': '/'+entry['id'],
+                 'modified': entry['modified']}
+        links = {'info': "{}/files/{}/".format(constants.API_BASE,
+                                                entry['id'])}
+        if entry['kind'] == 'folder':
+            url = self._storage_url(entry['id']+'/')
+            attrs['materialized'] = '/'+path+'/'
+            links['new_folder'] = url+'?kind=folder'
+        else:
+            url = self._storage_url(entry['id'])
+            content = entry['content']
+            attrs['materialized'] = '/'+path
+            attrs['size'] = len(content)
+            attrs['extra'] = {'hashes': {
+                'md5': hashlib.md5(content).hexdigest(),
+                'sha256': hashlib.sha256(content).hexdigest()}}
+            links['download'] = url
+        links['move'] = links['upload'] = links['delete'] = url
+        return {'id': entry['id'], 'type': 'files',
+                'attributes': attrs, 'links': links}
+
+    def _listing(self, folder, headers=None):
+        children = [path for path in sorted(self.entries)
+                    if path.rpartition('/')[0] == folder]
+        data = {'data': [self._entry_json(path) for path in children]}
+        etag = '"{}"'.format(hashlib.md5(
+            json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest())
+        if (headers or {}).get('If-None-Match') == etag:
+            self.n_not_modified += 1
+            return FakeResponse(304, headers={'ETag': etag})
+        return FakeResponse(200, data, headers={'ETag': etag})
+
+    def _zip(self, folder):
+        """The files below folder as a zip archive (named relative to it)
+        """
+        prefix = folder + '/' if folder else ''
+        data = io.BytesIO()
+        archive = zipfile.ZipFile(data, 'w')
+        for path in sorted(self.entries):
+            if path.startswith(prefix) and \
+                    self.entries[path]['kind'] == 'file':
+                archive.writestr(path[len(prefix):],
+                                 self.entries[path]['content'])
+        archive.close()
+        return FakeResponse(200, content=data.getvalue())
+
+    def _path_from_id(self, entry_id):
+        entry_id = entry_id.strip('/')
+        if entry_id == '':
+            return ''
+        for path, entry in self.entries.items():
+            if entry['id'] == entry_id:
+                return path
+
+    # ---- the request handling ----
+
+    def handle(self, method, url, params=None, data=None, headers=None,
+               **kwargs):
+        self.requests.append((method, url))
+        auth = (headers or {}).get('Authorization', '')
+        if self.valid_tokens is not None and 'auth' not in kwargs and \
+                auth[len('Bearer '):] not in self.valid_tokens:
+            return FakeResponse(401, {'errors': 'not authorized'})
+        parsed = urlparse(url)
+        query = dict((key, val[0]) for key, val in
+                     parse_qs(parsed.query, keep_blank_values=True).items())
+        base = "{}://{}{}".format(parsed.scheme, parsed.netloc, parsed.path)
+        node_url = "{}/nodes/{}".format(constants.API_BASE, self.node_id)
+        storage_url = self._storage_url()
+        if base.startswith(storage_url):
+            return self._handle_storage(method, base[len(storage_url):],
+                                        query, data, headers)
+        elif method == 'POST' and base.rstrip('/') == \
+                constants.API_BASE+'/tokens':
+            token = "token{}".format(len(self.requests))
+            if self.valid_tokens is not None:
+                self.valid_tokens.add(token)
+            return FakeResponse(201, {'data': {
+                'attributes': {'token_id': token}}})
+        elif method != 'GET':
+            return FakeResponse(405, {'errors': 'not supported'})
+        elif base.rstrip('/') == node_url:
+            return FakeResponse(200, {'data': {
+                'id': self.node_id, 'type': 'nodes',
+                'attributes': {'title': 'Fake project'},
+                'relationships': {}, 'links': {}}})
+        elif base.rstrip('/') == node_url+'/files':
+            root_url = storage_url
+            return FakeResponse(200, {'data': [{
+                'attributes': {'name': 'osfstorage'},
+                'links': {'upload': root_url,
+                          'new_folder': root_url+'?kind=folder'}}]})
+        elif base.rstrip('/') == node_url+'/files/osfstorage':
+            return self._listing('', headers)
+        elif base.rstrip('/') == node_url+'/logs':
+            return self._handle_logs(url, query)
+        elif base.rstrip('/') == constants.API_BASE+'/users/me':
+            return FakeResponse(200, {'data': {
+                'id': 'fakeuser', 'attributes': {'full_name': 'Fake User'}}})
+        return FakeResponse(404, {'errors': 'not found'})
+
+    def _handle_logs(self, url, query):
+        page = int(query.get('page', 1))
+        size = int(query.get('page[size]', self.log_page_size))
+        newest_first = self.logs[::-1]
+        data = newest_first[(page-1)*size:page*size]
+        if page*size < len(newest_first):
+            next_url = "{}/nodes/{}/logs/?page={}".format(
+                constants.API_BASE, self.node_id, page+1)
+            if 'page[size]' in query:
+                next_url += "&page[size]={}".format(size)
+        else:
+            next_url = None
+        return FakeResponse(200, {'data': data, 'links': {'next': next_url}})
+
+    def _handle_storage(self, method, entry_id, query, data, headers):
+        path = self._path_from_id(entry_id)
+        if path is None:
+            return FakeResponse(404, {'errors': 'not found'})
+        entry = self.entries.get(path, {'kind': 'folder'})  # '' is root
+        if method == 'GET':
+            if entry['kind'] == 'folder' and 'zip' in query:
+                return self._zip(path)
+            elif entry['kind'] == 'folder':
+                return self._listing(path, headers)
+            return FakeResponse(200, content=entry['content'])
+        elif method == 'PUT':
+            if entry['kind'] == 'file':
+                self.add_file(path, _read_all(data))
+                return FakeResponse(200, {'data': self._entry_json(path)})
+            new_path = query['name'] if path == '' \
+                else "{}/{}".format(path, query['name'])
+            if new_path in self.entries:
+                return FakeResponse(409, {'errors': 'conflict'})
+            if query.get('kind') == 'folder':
+                self.add_folder(new_path)
+            else:
+                self.add_file(new_path, _read_all(data))
+            return FakeResponse(201, {'data': self._entry_json(new_path)})
+        elif method == 'DELETE':
+            self.remove(path)
+            return FakeResponse(204)
+        elif method == 'POST':
+            body = json.loads(data)
+            new_path = body['rename'] if '/' not in path \
+                else "{}/{}".format(path.rpartition('/')[0], body['rename'])
+            self.move(path, new_path)
+            return FakeResponse(200, {'data': self._entry_json(new_path)})
+        return FakeResponse(405, {'errors': 'not supported'})
+
+
+def _read_all(data):
+    if data is None:
+        return b''
+    elif hasattr(data, 'read'):
+        chunks = []
+        while True:
+            chunk = data.read(remote.default_chunk_size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+    return data
+
+
+class FakeSession(remote.Session):
+    """A remote.Session whose requests are all answered by a FakeOSF
+    """
+    def __init__(self, server, username=None, password=None, token=None):
+        self.server = server
+        remote.Session.__init__(self, username=username, password=password,
+                                token=token)
+        self.username = username
+
+    def _request(self, method, url, **kwargs):
+        kwargs['headers'] = dict(self.headers, **(kwargs.get('headers') or {}))
+        return self.server.handle(method, url, **kwargs)
+
+
+def fake_project(server, folder, **kwargs):
+    """Creates a Project in `folder` (files in folder/files) that syncs with
+    a FakeOSF server
+    """
+    osf = remote.OSFProject(session=FakeSession(server), id=server.node_id)
+    kwargs.setdefault('autosave', False)
+    return project.Project(project_file=os.path.join(folder, 'test.proj'),
+                           root_path=os.path.join(folder, 'files'),
+                           osf=osf, **kwargs)
+
+
+class IndexOnly(object):
+    """Stands in for LocalFiles/OSFProject with a ready-made index
+    """
+    def __init__(self, index):
+        self.index = index
+
+    def rebuild_index(self):
+        pass
+
+
+class IndexOnlyProject(object):
+    """Just enough of a Project for sync.Changes to analyze indices
+    """
+    remote_delta = False
+    root_path = '/nowhere'
+    store = None
+
+    def __init__(self, local_index, remote_index, last_index):
+        self.local = IndexOnly(local_index)
+        self.osf = IndexOnly(remote_index)
+        self.index = last_index
+
+
+def synthetic_index(n_files, files_per_folder=100):
+    index = []
+    for n in range(n_files):
+        folder = "folder{:05d}".format(n // files_per_folder)
+        if n % files_per_folder == 0:
+            index.append({'path': folder, 'kind': 'folder'})
+        index.append({'path': "{}/file{:07d}.csv".format(folder, n),
+                      'kind': 'file', 'md5': "{:032x}".format(n),
+                      'size': 10, 'date_modified': '2020-01-01T00:00:00'})
+    return index
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Checks that the 'merge' and 'numpy' analyze engines give the same
+changes as the 'dict' engine, and benchmarks them. Set PYOSF_BENCHMARK_SIZE
+(e.g. to 1000000) for a larger benchmark than the default
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import sync
+from fake_osf import IndexOnlyProject, synthetic_index
+import os
+import copy
+import time
+import random
+import tracemalloc
+import pytest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BENCHMARK_SIZE = int(os.environ.get('PYOSF_BENCHMARK_SIZE', 20000))
+
+
+def random_indices(n_paths, seed):
+    """last, local and remote indices with every combination of presence,
+    hash and date (including folders)
+    """
+    rng = random.Random(seed)
+    last, local, remote = [], [], []
+    for n in range(n_paths):
+        folder = "f{}".format(rng.randint(0, 5))
+        if n % 10 == 0:
+            path, kind = "{}/sub{}".format(folder, n), 'folder'
+        else:
+            path, kind = "{}/file{}.txt".format(folder, n), 'file'
+        for index in [last, local, remote]:
+            if rng.random() < 0.7:
+                asset = {'path': path, 'kind': kind,
+                         'date_modified': "2020-01-0{}".format(
+                             rng.randint(1, 3))}
+                if kind == 'file':
+                    asset['md5'] = rng.choice(['aaa', 'bbb'])
+                    asset['links'] = {'move': 'http://move/'+path}
+                index.append(asset)
+    for index in [last, local, remote]:
+        rng.shuffle(index)
+    return last, local, remote
+
+
+def analyze(indices, engine):
+    last, local, remote = copy.deepcopy(indices)
+    proj = IndexOnlyProject(local, remote, last)
+    return sync.Changes(proj, engine=engine)
+
+
+def summary(changes):
+    """The change dicts as path: (asset path, md5) plus the final index
+    """
+    d = {'last_index': sorted(asset['path'] for asset in changes.last_index)}
+    for kind in changes._change_types:
+        d[kind] = dict((path, (asset['path'], asset.get('md5')))
+                       for path, asset in getattr(changes, kind).items())
+    return d
+
+
+def test_engines_agree():
+    for seed in range(20):
+        indices = random_indices(200, seed)
+        assert summary(analyze(indices, 'merge')) == \
+            summary(analyze(indices, 'dict'))
+
+
+@pytest.mark.skipif(numpy is None, reason="needs numpy")
+def test_numpy_engine_agrees():
+    for seed in range(20):
+        indices = random_indices(200, seed)
+        assert summary(analyze(indices, 'numpy')) == \
+            summary(analyze(indices, 'dict'))
+    # including empty indices
+    for indices in [([], [], []), random_indices(50, 0)[:2] + ([],)]:
+        assert summary(analyze(indices, 'numpy')) == \
+            summary(analyze(indices, 'dict'))
+
+
+def large_indices(n_files):
+    """Three large indices that differ in a few percent of their files
+    """
+    last = synthetic_index(n_files)
+    local = list(last)
+    remote = list(last)
+    for n in range(1, len(last), 50):
+        local[n] = dict(local[n], md5='changed locally')
+    for n in range(2, len(last), 70):
+        remote[n] = dict(remote[n], md5='changed remotely')
+    local = [asset for n, asset in enumerate(local)
+             if n % 500 != 3 or asset['kind'] == 'folder']
+    return last, local, remote
+
+
+def time_engine(indices, engine):
+    last, local, remote = indices
+    t0 = time.time()
+    changes = sync.Changes(IndexOnlyProject(local, remote, last),
+                           engine=engine)
+    duration = time.time() - t0
+    # then again to measure the memory (tracemalloc slows it down)
+    tracemalloc.start()
+    sync.Changes(IndexOnlyProject(local, remote, last), engine=engine)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return changes, duration, peak
+
+
+def test_benchmark():
+    indices = large_indices(BENCHMARK_SIZE)
+    results = {}
+    engines = ['dict', 'merge'] + (['numpy'] if numpy else [])
+    for engine in engines:
+        changes, duration, peak = time_engine(indices, engine)
+        results[engine] = summary(changes)
+        print("{} entries, {} engine: {:.2f}s, peak {}MB".format(
+            len(indices[0]), engine, duration, peak // 2**20))
+    for engine in engines:
+        assert results[engine] == results['dict']
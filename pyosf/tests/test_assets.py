@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import assets, project
+from pyosf.assets import Asset
+from fake_osf import FakeOSF, fake_project
+import os
+import copy
+import json
+import pickle
+import tracemalloc
+
+
+def remote_asset(n):
+    file_id = "abcde{:08d}".format(n)
+    url = "https://files.osf.io/v1/resources/xyz12/providers/osfstorage/" + \
+        file_id
+    return {'id': file_id, 'kind': 'file',
+            'path': "data/sub{:03d}/s{:06d}.csv".format(n // 100, n),
+            'name': "s{:06d}.csv".format(n),
+            'links': {'info': "https://api.osf.io/v2/files/{}/"
+                      .format(file_id),
+                      'move': url, 'upload': url, 'delete': url,
+                      'download': url},
+            'url': url, 'md5': "{:032x}".format(n),
+            'sha256': "{:064x}".format(n), 'size': n,
+            'date_modified': '2020-01-01T00:00:00.000000'}
+
+
+def local_asset(root, path):
+    return {'path': path, 'full_path': os.path.join(root, path),
+            'kind': 'file', 'size': 10, 'sha256': "{:064x}".format(10),
+            'date_modified': '2020-01-01T00:00:00'}
+
+
+class TestAsset(object):
+
+    def test_round_trip(self):
+        for d in [remote_asset(5), local_asset('/data/root', 'a/b.txt'),
+                  {'path': 'folder', 'kind': 'folder', 'extra': [1, 2]}]:
+            asset = Asset.from_dict(d, root='/data/root')
+            assert asset == d
+            assert asset.to_dict() == dict(asset) == d
+            assert sorted(asset.keys()) == sorted(d.keys())
+            assert json.loads(json.dumps(asset, default=assets.as_dict)) == d
+            assert pickle.loads(pickle.dumps(asset)) == d
+            assert copy.deepcopy(asset) == d
+
+    def test_compact_storage(self):
+        asset = Asset.from_dict(remote_asset(7))
+        other = Asset.from_dict(remote_asset(8))
+        assert isinstance(asset._links, assets.LinkTemplate)
+        assert asset._links is other._links  # shared by all similar assets
+        assert asset._has_url and asset._has_name
+        assert len(asset._md5) == 16  # raw bytes
+        assert asset._folder is other._folder  # interned
+        assert asset._extra is None
+        local = Asset.from_dict(local_asset('/data/root', 'a/b.txt'),
+                                root='/data/root')
+        assert local._extra is None  # full_path derived from the root
+
+    def test_irregular_values_are_kept(self):
+        d = remote_asset(3)
+        d['links'] = dict(d['links'], download='https://elsewhere/x')
+        d['md5'] = 'NOT-HEX'
+        d['sha256'] = d['sha256'].upper()
+        asset = Asset.from_dict(d)
+        assert asset == d
+
+    def test_dict_behaviour(self):
+        asset = Asset.from_dict(local_asset('/root', 'a/b.txt'), root='/root')
+        moved = copy.copy(asset)
+        moved['path'] = 'c/d.txt'
+        moved['links'] = {'move': 'http://somewhere'}
+        assert asset['path'] == 'a/b.txt'
+        assert 'links' not in asset
+        assert moved['links'] == {'move': 'http://somewhere'}
+        # full_path no longer follows from path so it is kept as it was
+        assert moved['full_path'] == os.path.join('/root', 'a/b.txt')
+        del moved['size']
+        assert 'size' not in moved and moved.get('size', 5) == 5
+        assert moved != asset
+
+    def test_set_then_get(self):
+        values = {'path': 'other/x.csv', 'kind': 'folder', 'size': 3,
+                  'date_modified': '2021-01-01T00:00:00', 'id': 'fghij',
+                  'full_path': '/elsewhere/x.csv', 'extra': {'a': 1}}
+        # each field set to a compact and to an irregular value
+        for key, compact, irregular in [
+                ('md5', "{:032x}".format(9), 'NOT-HEX'),
+                ('sha256', "{:064x}".format(9), "{:064X}".format(9)),
+                ('name', 's000005.csv', 'renamed.csv'),
+                ('url', remote_asset(5)['url'], 'https://elsewhere/x'),
+                ('links', remote_asset(5)['links'], {'move': 'http://x'}),
+                ('links', remote_asset(5)['links'], 'not a dict')]:
+            asset = Asset.from_dict(remote_asset(5))
+            for value in [irregular, compact, irregular]:
+                asset[key] = value
+                assert asset[key] == value
+                assert dict(asset)[key] == value
+        for key, value in values.items():
+            asset = Asset.from_dict(remote_asset(5))
+            asset[key] = value
+            assert asset[key] == value
+            assert pickle.loads(pickle.dumps(asset))[key] == value
+
+    def test_memory(self):
+        dicts = [remote_asset(n) for n in range(5000)]
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        as_dicts = json.loads(json.dumps(dicts))
+        dict_bytes = tracemalloc.get_traced_memory()[0] - before
+        before = tracemalloc.get_traced_memory()[0]
+        as_assets = assets.compact_index(json.loads(json.dumps(dicts)))
+        asset_bytes = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        assert len(as_dicts) == len(as_assets)
+        print("dicts: {}kB, assets: {}kB".format(dict_bytes // 1024,
+                                                  asset_bytes // 1024))
+        assert asset_bytes < dict_bytes / 2
+
+
+def test_compact_project_sync(tmpdir):
+    server = FakeOSF()
+    server.add_file('README.txt', 'read me')
+    server.add_file('data/s01.csv', 'a,b\n1,2\n')
+    proj = fake_project(server, str(tmpdir), compact=True, save_delay=0)
+    files = os.path.join(str(tmpdir), 'files')
+    os.makedirs(os.path.join(files, 'results'))
+    with open(os.path.join(files, 'results', 'r01.txt'), 'w') as f:
+        f.write('local result')
+    changes = proj.get_changes()
+    changes.apply()
+    proj.save()
+    assert all(isinstance(asset, Asset) for asset in proj.local.index)
+    assert all(isinstance(asset, Asset) for asset in proj.osf.index)
+    paths = sorted(asset['path'] for asset in proj.index)
+    assert 'results/r01.txt' in paths and 'data/s01.csv' in paths
+    reloaded = project.Project(project_file=proj.project_file, osf=proj.osf,
+                               autosave=False, compact=True)
+    assert reloaded.index == proj.index
+    assert all(isinstance(asset, Asset) for asset in reloaded.index)
+    changes = reloaded.get_changes()
+    assert len(changes) == 0
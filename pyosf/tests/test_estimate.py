@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import sync, constants
+from fake_osf import FakeOSF, fake_project
+import os
+import pytest
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, *path.split('/'))
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+class TestEstimate(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s01.csv', 'a' * 100)
+        self.server.add_file('data/s02.csv', 'b' * 200)
+
+    def test_estimate(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        assert len(proj.sync_history) == 1
+        assert proj.sync_history[0]['bytes'] == 307
+        assert proj.sync_history[0]['requests'] == 3
+        # changes of every kind
+        write(proj.root_path, 'data/new/s03.csv', 'c' * 1000)
+        write(proj.root_path, 'data/s01.csv', 'd' * 50)
+        self.server.add_file('data/s04.csv', 'e' * 400)
+        os.remove(os.path.join(proj.root_path, 'data', 's02.csv'))
+        changes = proj.get_changes()
+        assert len(changes) == len(changes.dry_run()) == 5
+        estimate = changes.estimate()
+        assert estimate['upload_bytes'] == 1050
+        assert estimate['download_bytes'] == 400
+        assert estimate['requests'] == {'GET': 1, 'PUT': 3, 'POST': 0,
+                                        'DELETE': 1}
+        assert estimate['n_requests'] == 5
+        throughput, latency = sync.transfer_rates(proj.sync_history)
+        assert estimate['seconds'] == pytest.approx(
+            5 * latency + 1450.0 / throughput)
+        changes.apply()
+        assert proj.sync_history[-1]['requests'] == 5
+        # the history is kept with the project
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        assert len(proj.sync_history) == 2
+        assert proj.get_changes().estimate()['seconds'] == 0
+
+    def test_transfer_rates(self, monkeypatch):
+        assert sync.transfer_rates([]) == (constants.DEFAULT_THROUGHPUT,
+                                           constants.DEFAULT_LATENCY)
+        history = [{'bytes': n_bytes, 'requests': n_requests,
+                    'seconds': n_requests * 0.1 + n_bytes / 2e6}
+                   for n_bytes, n_requests in [(1e6, 10), (5e7, 20),
+                                               (2e5, 300), (0, 4)]]
+        throughput, latency = sync.transfer_rates(history)
+        assert throughput == pytest.approx(2e6)
+        assert latency == pytest.approx(0.1)
+        # one sync can't tell latency from throughput
+        monkeypatch.setattr(constants, 'DEFAULT_LATENCY', 0.05)
+        throughput, latency = sync.transfer_rates(history[:1])
+        assert latency == 0.05
+        assert throughput == pytest.approx(1e6 / (1.5 - 10 * 0.05))
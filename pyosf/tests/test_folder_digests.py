@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import tools
+from fake_osf import FakeOSF, fake_project
+import os
+
+
+def make_index():
+    return [
+        {'path': 'a', 'kind': 'folder'},
+        {'path': 'a/b', 'kind': 'folder'},
+        {'path': 'a/b/x.txt', 'kind': 'file', 'md5': '1',
+         'date_modified': '2020-01-02'},
+        {'path': 'a/y.txt', 'kind': 'file', 'md5': '2',
+         'date_modified': '2020-01-01'},
+        {'path': 'c/z.txt', 'kind': 'file', 'md5': '3',
+         'date_modified': '2020-01-03'},
+        ]
+
+
+def test_folder_digests():
+    index = make_index()
+    digests = tools.folder_digests(index, 'md5')
+    assert sorted(digests.keys()) == ['', 'a', 'a/b', 'c']
+    # order of the index doesn't matter
+    assert tools.folder_digests(index[::-1], 'md5') == digests
+    # changing a file changes the digests of its folders only
+    index[2] = dict(index[2], md5='changed')
+    changed = tools.folder_digests(index, 'md5')
+    assert sorted(path for path in digests
+                  if digests[path] != changed[path]) == ['', 'a', 'a/b']
+    # an implied folder differs from an explicit (empty) one
+    explicit = tools.folder_digests(index + [{'path': 'c', 'kind': 'folder'}],
+                                    'md5')
+    assert explicit[''] != changed['']
+
+
+def test_folder_dates():
+    dates = tools.folder_dates(make_index())
+    assert dates['a/b'] == '2020-01-02'
+    assert dates['a'] == '2020-01-02'
+    assert dates['c'] == '2020-01-03'
+    assert dates[''] == '2020-01-03'
+
+
+def test_analyze_skips_unchanged_folders(tmpdir):
+    server = FakeOSF()
+    server.add_file('README.txt', 'read me')
+    server.add_file('data/s01.csv', 'a,b\n1,2\n')
+    server.add_file('stimuli/faces/face.png', 'not really a png')
+    proj = fake_project(server, str(tmpdir))
+    proj.get_changes().apply()
+    changes = proj.get_changes()
+    assert len(changes) == 0
+    assert '' in changes._unchanged_folders()
+    # change a local file and only its branch needs analysis
+    with open(os.path.join(proj.root_path, 'data', 's01.csv'), 'a') as f:
+        f.write('3,4\n')
+    changes = proj.get_changes()
+    unchanged = changes._unchanged_folders()
+    assert 'stimuli' in unchanged and 'stimuli/faces' in unchanged
+    assert 'data' not in unchanged and '' not in unchanged
+    assert [asset['path'] for asset in changes.update_remote.values()] \
+        == ['data/s01.csv']
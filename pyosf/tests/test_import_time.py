@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import sys
+import subprocess
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason="lazy imports need Python 3.7")
+
+package_root = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+MAX_IMPORT_MS = 50  # generous: importing pyosf alone takes ~1ms
+
+
+def run_python(code, home):
+    env = dict(os.environ, HOME=home, PYTHONPATH=package_root)
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          env=env, cwd=home, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def import_times(stderr):
+    """module: cumulative microseconds, from the -X importtime output
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            self_us, cumulative, module = line[12:].split('|')
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_import_is_cheap(tmpdir):
+    reply = run_python('import pyosf', str(tmpdir))
+    assert reply.returncode == 0, reply.stderr
+    times = import_times(reply.stderr)
+    assert 'pyosf' in times
+    for heavy in ['requests', 'pyosf.remote', 'pyosf.project', 'sqlite3']:
+        assert heavy not in times
+    print("import pyosf: {}us".format(times['pyosf']))
+    assert times['pyosf'] < MAX_IMPORT_MS * 1000
+    # and nothing was written to disk
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_lazy_attributes(tmpdir):
+    code = ("import pyosf, os\n"
+            "assert pyosf.OSFError.__module__ == 'pyosf.exceptions'\n"
+            "assert not os.path.exists(pyosf.constants.PYOSF_FOLDER)\n"
+            "assert pyosf.Project.__module__ == 'pyosf.project'\n"
+            "assert 'Session' in dir(pyosf)\n"
+            "pyosf.Session()\n"
+            "assert os.path.isfile(pyosf.logfile_path)\n")
+    reply = run_python(code, str(tmpdir))
+    assert reply.returncode == 0, reply.stderr
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import local, constants
+import os
+import hashlib
+
+
+class CountingHash(object):
+    """Wraps a hashlib object to count the bytes fed to it
+    """
+    n_bytes = 0
+
+    def __init__(self):
+        self._hash = hashlib.md5()
+
+    def update(self, data):
+        CountingHash.n_bytes += len(data)
+        self._hash.update(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class CountingHashlib(object):
+    md5 = CountingHash
+
+
+def md5(path):
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+class TestIncrementalHash(object):
+
+    def setup_method(self, method):
+        CountingHash.n_bytes = 0
+
+    def _digest(self, files, path):
+        files.rebuild_index()
+        return [asset[constants.SHA] for asset in files.index
+                if asset['path'] == os.path.relpath(path, files.root_path)][0]
+
+    def test_appends(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(local, 'hashlib', CountingHashlib)
+        files = local.LocalFiles(str(tmpdir), incremental=True)
+        path = os.path.join(str(tmpdir), 'data.csv')
+        with open(path, 'wb') as f:
+            f.write(b'trial,rt\n' * 1000)
+        assert self._digest(files, path) == md5(path)
+        assert CountingHash.n_bytes == 9000
+        with open(path, 'ab') as f:
+            f.write(b'1,0.5\n')
+        assert self._digest(files, path) == md5(path)
+        assert CountingHash.n_bytes == 9006  # just the new row was hashed
+        # a rewrite of the end (or a truncation) is hashed again in full
+        with open(path, 'r+b') as f:
+            f.seek(-6, os.SEEK_END)
+            f.write(b'2,0.7\n')
+        assert self._digest(files, path) == md5(path)
+        assert CountingHash.n_bytes == 2 * 9006
+        with open(path, 'wb') as f:
+            f.write(b'trial,rt\n')
+        assert self._digest(files, path) == md5(path)
+        # as is one with the same length but new first bytes
+        with open(path, 'wb') as f:
+            f.write(b'TRIAL,RT\n1,0.1\n')
+        assert self._digest(files, path) == md5(path)
+
+    def test_edit_in_the_middle(self, tmpdir):
+        files = local.LocalFiles(str(tmpdir), incremental=True)
+        path = os.path.join(str(tmpdir), 'data.csv')
+        with open(path, 'wb') as f:
+            f.write(b'trial,rt\n' * 2000)
+        assert self._digest(files, path) == md5(path)
+        # same length, same first and last bytes, one row changed
+        with open(path, 'r+b') as f:
+            f.seek(9000)
+            f.write(b'TRIAL,RT\n')
+        assert self._digest(files, path) == md5(path)
+        # an edit at the end of the bytes hashed before, with rows appended
+        with open(path, 'r+b') as f:
+            f.seek(-9, os.SEEK_END)
+            f.write(b'1,0.5\n')
+            f.seek(0, os.SEEK_END)
+            f.write(b'2,0.7\n')
+        assert self._digest(files, path) == md5(path)
+
+    def test_replaced(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(local, 'hashlib', CountingHashlib)
+        files = local.LocalFiles(str(tmpdir), incremental=True)
+        path = os.path.join(str(tmpdir), 'data.csv')
+        with open(path, 'wb') as f:
+            f.write(b'trial,rt\n' * 1000)
+        assert self._digest(files, path) == md5(path)
+        # a new file (saved by an editor, say) is hashed in full even where
+        # its first bytes are the same
+        os.rename(path, str(tmpdir) + '.bak')  # (keeping its inode in use)
+        with open(path, 'wb') as f:
+            f.write(b'trial,rt\n' * 1000 + b'1,0.5\n')
+        assert self._digest(files, path) == md5(path)
+        assert CountingHash.n_bytes == 9000 + 9006
+
+    def test_states_limited(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(constants, 'HASH_STATES', 3)
+        files = local.LocalFiles(str(tmpdir), incremental=True)
+        for n in range(5):
+            with open(os.path.join(str(tmpdir), 'f{}.csv'.format(n)),
+                      'w') as f:
+                f.write(str(n))
+        files.rebuild_index()
+        assert len(files._hash_states) == 3
+        assert not local.LocalFiles(str(tmpdir)).incremental
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import sync
+from fake_osf import (FakeOSF, fake_project, IndexOnlyProject,
+                      synthetic_index)
+import threading
+import time
+
+
+def test_transfer_threads_queue_index_changes():
+    index = synthetic_index(4000)
+    proj = IndexOnlyProject(index, [], [])
+    changes = sync.Changes(proj)
+    paths = [asset['path'] for asset in index]
+    n_threads = 4
+
+    def complete_transfers(paths):
+        for path in paths:
+            changes.add_to_index(path)
+
+    threads = [threading.Thread(target=complete_transfers,
+                                args=(paths[n::n_threads],))
+               for n in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    # the owner keeps reading consistent snapshots while threads add
+    sizes = []
+    while any(thread.is_alive() for thread in threads):
+        sizes.append(len(changes.snapshot()))
+    for thread in threads:
+        thread.join()
+    assert sizes == sorted(sizes)  # the index only ever grew
+    snapshot = changes.snapshot()
+    assert len(snapshot) == len(index)
+    assert snapshot is changes.snapshot()  # unchanged so no new copy
+    # other threads can't apply events but do get the latest snapshot
+    result = []
+    worker = threading.Thread(
+        target=lambda: result.append((changes.apply_pending(),
+                                      changes.snapshot())))
+    worker.start()
+    worker.join()
+    assert result == [(0, snapshot)]
+
+
+def test_queued_events_applied_in_order():
+    index = synthetic_index(10)
+    proj = IndexOnlyProject(index, [], [])
+    changes = sync.Changes(proj)
+    path = index[1]['path']
+
+    def add_then_remove():
+        changes.add_to_index(path)
+        changes.remove_from_index(path)
+        changes.add_to_index(path)
+    worker = threading.Thread(target=add_then_remove)
+    worker.start()
+    worker.join()
+    assert len(changes.last_index) == 0  # nothing applied yet
+    assert changes.apply_pending() == 3
+    assert [asset['path'] for asset in changes.last_index] == [path]
+
+
+def test_threaded_sync(tmpdir):
+    server = FakeOSF()
+    server.add_file('README.txt', 'read me')
+    server.add_file('data/s01.csv', 'a,b\n1,2\n')
+    proj = fake_project(server, str(tmpdir))
+    changes = proj.get_changes()
+    changes.apply(threaded=True)
+    while changes.progress != -1:
+        time.sleep(0.01)
+    changes.finish_sync()
+    assert sorted(asset['path'] for asset in proj.index) == \
+        ['README.txt', 'data', 'data/s01.csv']
+    assert len(proj.get_changes()) == 0
+
+
+def test_changes_from_another_thread(tmpdir):
+    server = FakeOSF()
+    server.add_file('README.txt', 'read me')
+    server.add_file('data/s01.csv', 'a,b\n1,2\n')
+    proj = fake_project(server, str(tmpdir))
+    # analyzed in a background thread, applied from this one
+    found = []
+    scanner = threading.Thread(target=lambda: found.append(
+        proj.get_changes()))
+    scanner.start()
+    scanner.join()
+    changes = found[0]
+    changes.apply(threaded=True)
+    while changes.progress != -1:
+        time.sleep(0.01)
+    changes.finish_sync()
+    assert sorted(asset['path'] for asset in proj.index) == \
+        ['README.txt', 'data', 'data/s01.csv']
+    # or finished from yet another thread
+    server.add_file('data/s02.csv', 'a,b\n3,4\n')
+    changes = proj.get_changes()
+    changes.apply(threaded=True)
+    while changes.progress != -1:
+        time.sleep(0.01)
+    finisher = threading.Thread(target=changes.finish_sync)
+    finisher.start()
+    finisher.join()
+    assert 'data/s02.csv' in [asset['path'] for asset in proj.index]
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import journal, constants
+from fake_osf import FakeOSF, fake_project
+import os
+import pytest
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingOSF(FakeOSF):
+    """A FakeOSF whose connection is lost (raising Crash) at the upload
+    number `crash_at`
+    """
+    crash_at = None
+
+    def handle(self, method, url, **kwargs):
+        if method == 'PUT' and 'kind=file' in url and \
+                self.crash_at is not None:
+            self.crash_at -= 1
+            if self.crash_at == 0:
+                raise Crash("connection lost")
+        return FakeOSF.handle(self, method, url, **kwargs)
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, *path.split('/'))
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+class TestJournal(object):
+
+    def setup_method(self, method):
+        self.server = CrashingOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s00.csv', 'remote')
+
+    def _uploads(self, since=0):
+        return sorted(self.server._path_from_id(url.rpartition('/')[2])
+                      if 'name=' not in url else url.rpartition('name=')[2]
+                      for method, url in self.server.requests[since:]
+                      if method == 'PUT' and 'kind=folder' not in url)
+
+    def test_resume(self, tmpdir):
+        folder = str(tmpdir)
+        proj = fake_project(self.server, folder, save_delay=0)
+        proj.get_changes().apply()
+        for n in range(1, 6):
+            write(proj.root_path, 'data/s{:02d}.csv'.format(n), str(n))
+        self.server.add_file('data/r01.csv', 'remote')
+        journal_file = journal.journal_path(proj.project_file)
+        self.server.crash_at = 3
+        with pytest.raises(Crash):
+            proj.get_changes().apply()
+        assert os.path.isfile(journal_file)
+        self.server.crash_at = None
+        # a new process finds what was done and what's left
+        with open(journal_file) as f:
+            logged = f.read()
+        proj = fake_project(self.server, folder, save_delay=0)
+        assert list(proj.unfinished) == ['add_remote']
+        assert sorted(proj.unfinished['add_remote']) == [
+            'data/s03.csv', 'data/s04.csv', 'data/s05.csv']
+        # (but loading wrote nothing, as the sync might still be running)
+        with open(journal_file) as f:
+            assert f.read() == logged
+        assert 'data/r01.csv' not in [asset['path'] for asset in proj.index]
+        reloaded = fake_project(self.server, folder, save_delay=0)
+        assert reloaded.unfinished == proj.unfinished
+        n_requests = len(self.server.requests)
+        actions = proj.resume()
+        assert actions == ['add_remote: data/s03.csv',
+                           'add_remote: data/s04.csv',
+                           'add_remote: data/s05.csv']
+        # the completed operations were folded into the index
+        paths = [asset['path'] for asset in proj.index]
+        for path in ['data/r01.csv', 'data/s01.csv', 'data/s02.csv',
+                     'data/s05.csv']:
+            assert path in paths
+        # just the rest were uploaded (and nothing was listed)
+        assert self._uploads(n_requests) == ['s03.csv', 's04.csv', 's05.csv']
+        assert not [url for method, url in self.server.requests[n_requests:]
+                    if url.endswith('/') or url.endswith('osfstorage')]
+        assert not os.path.isfile(journal_file)
+        assert proj.unfinished is None and proj.resume() == []
+        assert self.server.entries['data/s05.csv']['content'] == b'5'
+        assert len(proj.get_changes()) == 0
+
+    def test_all_done_before_crash(self, tmpdir):
+        folder = str(tmpdir)
+        proj = fake_project(self.server, folder, save_delay=0)
+        write(proj.root_path, 'data/s01.csv', '1')
+        changes = proj.get_changes()
+        changes.apply()
+        # as if the process died after the transfers but before saving
+        sync_journal = journal.Journal(journal.journal_path(
+            proj.project_file))
+        sync_journal.start({'add_remote': {'data/s02.csv': {
+            'path': 'data/s02.csv', 'kind': 'file'}}})
+        sync_journal.put({'path': 'data/s02.csv', 'kind': 'file'})
+        sync_journal.close()
+        proj = fake_project(self.server, folder, save_delay=0)
+        assert proj.unfinished is None
+        assert proj.resume() == []
+        assert 'data/s02.csv' in [asset['path'] for asset in proj.index]
+        assert not sync_journal.exists()
+
+    def test_batched_fsync(self, tmpdir, monkeypatch):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        for n in range(1, 41):
+            write(proj.root_path, 'data/s{:02d}.csv'.format(n), str(n))
+        n_fsyncs = []
+        fsync = os.fsync
+
+        def counting_fsync(fd):
+            n_fsyncs.append(fd)
+            fsync(fd)
+        monkeypatch.setattr(os, 'fsync', counting_fsync)
+        monkeypatch.setattr(constants, 'JOURNAL_SYNC_INTERVAL', 60)
+        monkeypatch.setattr(constants, 'JOURNAL_SYNC_RECORDS', 25)
+        proj.get_changes().apply()
+        # the plan, one batch of 25 records and the project file (not 41)
+        assert len(n_fsyncs) <= 4
+
+    def test_finished_sync(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        write(proj.root_path, 'data/s01.csv', '1')
+        proj.get_changes().apply()
+        assert not os.path.isfile(journal.journal_path(proj.project_file))
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        assert proj.unfinished is None
+
+    def test_partial_record(self, tmpdir):
+        path = str(tmpdir.join('test.proj.journal'))
+        sync_journal = journal.Journal(path)
+        sync_journal.start({'del_local': {'a.txt': {'path': 'a.txt'}},
+                            'add_remote': {'b.txt': {'path': 'b.txt'}}})
+        sync_journal.put({'path': 'b.txt', 'kind': 'file'})
+        sync_journal.close()
+        with open(path, 'a') as f:
+            f.write('{"delete": "a.t')  # (the process died mid-write)
+        plan, records = sync_journal.load()
+        assert records == [{'put': {'path': 'b.txt', 'kind': 'file'}}]
+        assert journal.remaining(plan, records) == {
+            'del_local': {'a.txt': {'path': 'a.txt'}}}
+        index = [{'path': 'a.txt'}, {'path': 'c.txt'}]
+        assert [asset['path'] for asset in
+                journal.fold(index, records + [{'delete': 'c.txt'}])] == \
+            ['a.txt', 'b.txt']
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import remote, exceptions
+from fake_osf import FakeOSF, FakeSession
+import os
+import pytest
+
+
+class TestListingCache(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s01.csv', 'a,b\n1,2\n')
+        self.server.add_file('stimuli/face.png', 'not really a png')
+        self.session = FakeSession(self.server)
+
+    def _open(self, cache_file, ttl=0):
+        cache = remote.ListingCache(self.server.node_id, ttl=ttl,
+                                    filename=cache_file)
+        return remote.OSFProject(session=self.session, id=self.server.node_id,
+                                 listing_cache=cache)
+
+    def test_revalidation(self, tmpdir):
+        cache_file = os.path.join(str(tmpdir), 'listings.json')
+        first = self._open(cache_file)
+        paths = sorted(asset['path'] for asset in first.index)
+        assert os.path.isfile(cache_file)
+        assert self.server.n_not_modified == 0
+        # a new process/project reuses the listings with 3 cheap 304s
+        second = self._open(cache_file)
+        assert sorted(asset['path'] for asset in second.index) == paths
+        assert self.server.n_not_modified == 3
+        # a change on the server is picked up in that folder only
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+        third = self._open(cache_file)
+        assert 'data/s02.csv' in [asset['path'] for asset in third.index]
+        assert self.server.n_not_modified == 3 + 2
+
+    def test_ttl_and_invalidation(self, tmpdir):
+        cache_file = os.path.join(str(tmpdir), 'listings.json')
+        self._open(cache_file, ttl=60).rebuild_index()
+        osf = self._open(cache_file, ttl=60)
+        del self.server.requests[:]
+        osf.rebuild_index()  # within the ttl so no listings requested
+        assert not [req for req in self.server.requests
+                    if 'osfstorage' in req[1]]
+        # our own changes invalidate the relevant folder
+        asset = osf.find_asset('data/s01.csv')
+        osf.del_file(asset)
+        osf.rebuild_index()
+        assert 'data/s01.csv' not in [a['path'] for a in osf.index]
+        # explicit invalidation of everything
+        osf.invalidate_listing()
+        del self.server.requests[:]
+        osf.rebuild_index()
+        assert len([req for req in self.server.requests
+                    if 'osfstorage' in req[1]]) == 3
+
+    def test_logged_changes_within_ttl(self, tmpdir):
+        cache_file = os.path.join(str(tmpdir), 'listings.json')
+        osf = self._open(cache_file, ttl=60)
+        osf.update_index()
+        index, cursor = osf.index, osf.log_cursor
+        # folders named in the logs are listed again despite the ttl
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+        self.server.move('stimuli', 'images')
+        assert osf.update_index(index, cursor)
+        paths = [asset['path'] for asset in osf.index]
+        assert 'data/s02.csv' in paths
+        assert 'images/face.png' in paths and 'stimuli' not in paths
+        # and the unchanged folders still come from the cache
+        del self.server.requests[:]
+        osf.rebuild_index()
+        assert not [req for req in self.server.requests
+                    if 'osfstorage' in req[1]]
+        assert 'data/s02.csv' in [asset['path'] for asset in osf.index]
+
+    def test_failed_listing(self, tmpdir):
+        osf = self._open(os.path.join(str(tmpdir), 'listings.json'))
+        url = osf._listing_url('data')
+        self.server.remove('data')
+        with pytest.raises(exceptions.HTTPSError):
+            osf._folder_assets(url)
+        assert url not in osf.listing_cache.listings
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import project, local, exceptions
+from fake_osf import FakeOSF, fake_project
+import os
+import pytest
+
+
+class TestLocalChanges(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s01.csv', 'a,b\n1,2\n')
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+
+    def _synced_project(self, folder):
+        proj = fake_project(self.server, folder, save_delay=0)
+        proj.get_changes().apply()
+        proj.save()
+        return proj
+
+    def test_offline_changes(self, tmpdir):
+        proj = self._synced_project(str(tmpdir))
+        files = proj.root_path
+        with open(os.path.join(files, 'data', 's03.csv'), 'w') as f:
+            f.write('a,b\n5,6\n')
+        with open(os.path.join(files, 'README.txt'), 'w') as f:
+            f.write('read me again')
+        os.remove(os.path.join(files, 'data', 's01.csv'))
+        n_requests = len(self.server.requests)
+        # reopening from the file and analyzing needs no network at all
+        offline = project.Project(project_file=proj.project_file,
+                                  autosave=False)
+        changes = offline.get_changes(remote=False)
+        assert len(self.server.requests) == n_requests
+        assert offline._osf is None and not offline.connected
+        assert list(changes.add_remote) == [os.path.join('data', 's03.csv')]
+        assert list(changes.update_remote) == ['README.txt']
+        assert list(changes.del_remote) == [os.path.join('data', 's01.csv')]
+        for kind in ['add_local', 'update_local', 'del_local', 'mv_local',
+                     'mv_remote']:
+            assert getattr(changes, kind) == {}
+        assert len(changes) == 3
+        with pytest.raises(exceptions.OSFError):
+            changes.apply()
+
+    def test_no_offline_changes(self, tmpdir):
+        proj = self._synced_project(str(tmpdir))
+        assert len(proj.get_changes(remote=False)) == 0
+
+    def test_hashes_reused(self, tmpdir):
+        root = str(tmpdir)
+        with open(os.path.join(root, 'a.txt'), 'w') as f:
+            f.write('some text')
+        files = local.LocalFiles(root)
+        known = [dict(asset) for asset in files.index]
+        known[0]['md5'] = 'not really the hash'
+        files.rebuild_index(known=known)
+        assert files.index[0]['md5'] == 'not really the hash'
+        known[0]['size'] += 1  # so the file looks changed
+        files.rebuild_index(known=known)
+        assert files.index[0]['md5'] != 'not really the hash'
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import pipeline
+from fake_osf import FakeOSF, fake_project
+import os
+import shutil
+import time
+
+MTIME = time.mktime((2030, 1, 1, 0, 0, 0, 0, 0, -1))
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, path)
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+def local_tree(root):
+    tree = {}
+    for folder, dirs, files in os.walk(root):
+        for name in dirs:
+            tree[os.path.relpath(os.path.join(folder, name), root)] = None
+        for name in files:
+            with open(os.path.join(folder, name)) as f:
+                tree[os.path.relpath(os.path.join(folder, name), root)] = \
+                    f.read()
+    return tree
+
+
+def server_tree(server):
+    return dict((path, entry.get('content'))
+                for path, entry in server.entries.items())
+
+
+class TestStreamingSync(object):
+
+    def _scenario(self, folder):
+        """A synced project that then changed on both sides
+        """
+        server = FakeOSF()
+        server.add_file('README.txt', 'read me')
+        server.add_file('data/s01.csv', 'a,b\n1,2\n')
+        server.add_file('data/s02.csv', 'a,b\n3,4\n')
+        server.add_file('data/old/s00.csv', 'a,b\n0,0\n')
+        server.add_file('stimuli/a.png', 'not really a png')
+        proj = fake_project(server, folder, save_delay=0)
+        proj.get_changes().apply()
+        proj.save()
+        # remote changes
+        server.add_file('data/s04.csv', 'remote new')
+        server.add_file('results/deep/r1.txt', 'remote nested')
+        server.add_file('data/s02.csv', 'a,b\n3,5\n')
+        server.remove('stimuli/a.png')
+        server.add_file('README.txt', 'read me (remote)')
+        # local changes
+        root = proj.root_path
+        for path, content in [(os.path.join('data', 's03.csv'), 'new'),
+                              (os.path.join('local', 'new', 'l1.txt'), 'l1'),
+                              (os.path.join('data', 's01.csv'), 'a,b\n1,3'),
+                              ('README.txt', 'read me (local)')]:
+            write(root, path, content)
+            # the same dates in both scenarios (for the conflict names)
+            os.utime(os.path.join(root, path), (MTIME, MTIME))
+        shutil.rmtree(os.path.join(root, 'data', 'old'))
+        return server, proj
+
+    def test_same_as_standard_sync(self, tmpdir):
+        server, proj = self._scenario(os.path.join(str(tmpdir), 'std'))
+        proj.get_changes().apply()
+        stream_server, stream_proj = self._scenario(
+            os.path.join(str(tmpdir), 'stream'))
+        sync = pipeline.StreamingSync(stream_proj, queue_size=1, workers=3)
+        sync.run()
+        assert server_tree(stream_server) == server_tree(server)
+        assert local_tree(stream_proj.root_path) == \
+            local_tree(proj.root_path)
+        assert sorted(asset['path'] for asset in stream_proj.index) == \
+            sorted(asset['path'] for asset in proj.index)
+        assert len(stream_proj.get_changes()) == len(proj.get_changes())
+        assert sync.stats['n_transfers'] > 0
+        assert sync.stats['first_transfer'] <= sync.stats['transferred']
+        # the conflict was resolved as usual too
+        assert len([path for path in server_tree(server)
+                    if 'README' in path]) == 2
+
+    def test_initial_and_no_op(self, tmpdir):
+        server = FakeOSF()
+        for n in range(20):
+            server.add_file('folder{}/sub/f{}.txt'.format(n, n), str(n))
+        proj = fake_project(server, str(tmpdir), save_delay=0)
+        write(proj.root_path, 'mine.txt', 'local only')
+        proj.streaming_sync(queue_size=2, workers=2)
+        assert len(local_tree(proj.root_path)) == 61
+        assert server.entries['mine.txt']['content'] == b'local only'
+        assert len(proj.get_changes()) == 0
+        n_entries = len(server.entries)
+        changes = proj.streaming_sync()
+        assert len(server.entries) == n_entries
+        assert len(changes) == 0
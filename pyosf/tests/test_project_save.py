@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import project
+from fake_osf import FakeOSF, fake_project
+import os
+import json
+import time
+import gc
+import pytest
+
+
+def saved_name(proj_file):
+    with open(proj_file, 'r') as f:
+        return json.load(f)['name']
+
+
+class TestProjectSave(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+
+    def test_unchanged_project_not_written(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir))
+        assert proj.dirty
+        assert proj.save()
+        assert not proj.dirty
+        mtime = os.path.getmtime(proj.project_file)
+        assert not proj.save()
+        # loading a project and letting it go doesn't write either
+        os.utime(proj.project_file, (mtime - 10, mtime - 10))
+        reloaded = project.Project(project_file=proj.project_file,
+                                   osf=proj.osf, autosave=True)
+        assert not reloaded.dirty
+        del reloaded
+        gc.collect()
+        assert os.path.getmtime(proj.project_file) == mtime - 10
+
+    def test_sync_without_changes_not_written(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        mtime = os.path.getmtime(proj.project_file)
+        os.utime(proj.project_file, (mtime - 10, mtime - 10))
+        proj.get_changes().apply()  # nothing to do
+        proj.save()
+        assert os.path.getmtime(proj.project_file) == mtime - 10
+
+    def test_saves_are_coalesced(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0.2)
+        assert proj.save()
+        proj.name = 'first'
+        assert not proj.save(defer=True)  # deferred
+        proj.name = 'second'
+        assert not proj.save(defer=True)
+        assert saved_name(proj.project_file) == ''
+        time.sleep(0.5)
+        assert saved_name(proj.project_file) == 'second'
+        assert not proj.dirty
+        # flush() writes any pending save immediately
+        proj.name = 'third'
+        proj.save(defer=True)
+        proj.flush()
+        assert saved_name(proj.project_file) == 'third'
+        # as does an explicit save()
+        proj.name = 'fourth'
+        assert proj.save()
+        assert saved_name(proj.project_file) == 'fourth'
+
+    def test_deferred_save_not_lost(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=60)
+        assert not proj.autosave
+        proj.save()
+        proj_file = proj.project_file
+        proj.name = 'renamed'
+        assert not proj.save(defer=True)
+        del proj
+        gc.collect()
+        assert saved_name(proj_file) == 'renamed'
+
+    def test_failed_write_keeps_old_file(self, tmpdir, monkeypatch):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.name = 'good'
+        proj.save()
+
+        def broken_fsync(fd):
+            raise IOError("disk full")
+        monkeypatch.setattr(os, 'fsync', broken_fsync)
+        proj.name = 'lost'
+        with pytest.raises(IOError):
+            proj.save()
+        assert saved_name(proj.project_file) == 'good'
+        assert sorted(os.listdir(str(tmpdir))) == ['files', 'test.proj']
+        assert proj.dirty
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import local
+from fake_osf import FakeOSF, fake_project
+import os
+import hashlib
+import pytest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def read(root, path):
+    with open(os.path.join(root, *path.split('/'))) as f:
+        return f.read()
+
+
+def write(root, path, content):
+    with open(os.path.join(root, *path.split('/')), 'w') as f:
+        f.write(content)
+
+
+class CountingHashlib(object):
+    """Stands in for hashlib in pyosf.local to count the files hashed
+    """
+    def __init__(self):
+        self.n_hashed = 0
+
+    def md5(self, *args):
+        self.n_hashed += 1
+        return hashlib.md5(*args)
+
+
+class TestPullMirror(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s01.csv', 'a,b\n1,2\n')
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+        self.server.add_file('data/s03.csv', 'a,b\n5,6\n')
+
+    def _writes(self):
+        return [method for method, url in self.server.requests
+                if method != 'GET']
+
+    @pytest.mark.parametrize('engine', [
+        'dict', 'merge',
+        pytest.param('numpy', marks=pytest.mark.skipif(
+            numpy is None, reason="needs numpy"))])
+    def test_mirror(self, tmpdir, engine):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.pull()
+        root = proj.root_path
+        assert read(root, 'data/s02.csv') == 'a,b\n3,4\n'
+        # changes on both sides
+        self.server.add_file('data/s04.csv', 'remote new')
+        self.server.add_file('data/s01.csv', 'a,b\n1,3\n')
+        self.server.remove('README.txt')
+        write(root, 'data/s02.csv', 'edited locally')
+        os.remove(os.path.join(root, 'data', 's03.csv'))
+        write(root, 'notes.txt', 'only ever local')
+        changes = proj.get_changes(mirror=True, engine=engine)
+        for kind in ['add_remote', 'update_remote', 'mv_remote',
+                     'del_remote', 'mv_local']:
+            assert getattr(changes, kind) == {}
+        assert sorted(changes.add_local) == ['data/s03.csv', 'data/s04.csv']
+        assert sorted(changes.update_local) == ['data/s01.csv',
+                                                'data/s02.csv']
+        assert list(changes.del_local) == ['README.txt']
+        changes.apply()
+        assert read(root, 'data/s01.csv') == 'a,b\n1,3\n'
+        assert read(root, 'data/s02.csv') == 'a,b\n3,4\n'
+        assert read(root, 'data/s03.csv') == 'a,b\n5,6\n'
+        assert read(root, 'data/s04.csv') == 'remote new'
+        assert read(root, 'notes.txt') == 'only ever local'
+        assert not os.path.exists(os.path.join(root, 'README.txt'))
+        assert self._writes() == []
+        assert len(proj.get_changes(mirror=True)) == 0
+
+    def test_checked_by_stat(self, tmpdir, monkeypatch):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.pull()
+        counter = CountingHashlib()
+        monkeypatch.setattr(local, 'hashlib', counter)
+        proj.pull()
+        assert counter.n_hashed == 0  # downloads are known by their dates
+        self.server.add_file('data/s05.csv', 'new')
+        proj.pull()
+        assert counter.n_hashed == 1
+        assert self._writes() == []
+
+    def test_local_dates_saved(self, tmpdir, monkeypatch):
+        folder = str(tmpdir)
+        proj = fake_project(self.server, folder, save_delay=0)
+        proj.pull()
+        # touched without changing the contents (so nothing is downloaded)
+        path = os.path.join(proj.root_path, 'data', 's01.csv')
+        os.utime(path, (1000000000, 1000000000))
+        proj.pull()
+        assert not proj.dirty  # (saved)
+        reloaded = fake_project(self.server, folder, save_delay=0)
+        noted = [asset for asset in reloaded.index
+                 if asset['path'] == os.path.join('data', 's01.csv')][0]
+        assert noted['local_modified'].startswith('2001-09-')
+        # so a new process checks it by its date alone
+        counter = CountingHashlib()
+        monkeypatch.setattr(local, 'hashlib', counter)
+        reloaded.pull()
+        assert counter.n_hashed == 0
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from fake_osf import FakeOSF, fake_project
+import os
+import pytest
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, *path.split('/'))
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+class TestPushOnly(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s01.csv', 'a,b\n1,2\n')
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+
+    def _synced_project(self, folder, **kwargs):
+        proj = fake_project(self.server, folder, save_delay=0, **kwargs)
+        write(proj.root_path, 'mine.csv', 'uploaded by a full sync')
+        proj.get_changes().apply()
+        proj.save()
+        return proj
+
+    def _listings(self, since):
+        """The folder listings (crawling) requested since request n
+        """
+        return [url for method, url in self.server.requests[since:]
+                if method == 'GET' and (url.endswith('/') or
+                                        url.endswith('osfstorage'))]
+
+    @pytest.mark.parametrize('compact', [False, True])
+    def test_push(self, tmpdir, compact):
+        proj = self._synced_project(str(tmpdir), compact=compact)
+        root = proj.root_path
+        write(root, 'data/s03.csv', 'a,b\n5,6\n')
+        write(root, 'data/s01.csv', 'a,b\n1,3\n')
+        write(root, 'data/new/s04.csv', 'a,b\n7,8\n')
+        os.remove(os.path.join(root, 'data', 's02.csv'))
+        n_requests = len(self.server.requests)
+        actions = proj.push()
+        assert sorted(actions) == ['add_remote: data/new',
+                                   'add_remote: data/new/s04.csv',
+                                   'add_remote: data/s03.csv',
+                                   'update_remote: data/s01.csv']
+        assert self._listings(n_requests) == []
+        entries = self.server.entries
+        assert entries['data/s03.csv']['content'] == b'a,b\n5,6\n'
+        assert entries['data/s01.csv']['content'] == b'a,b\n1,3\n'
+        assert entries['data/new/s04.csv']['content'] == b'a,b\n7,8\n'
+        assert 'data/s02.csv' in entries  # deletions aren't pushed
+        index = dict((asset['path'], asset) for asset in proj.index)
+        assert index['data/s03.csv']['links']['upload'].endswith(
+            entries['data/s03.csv']['id'])
+        # the index is patched so the next push updates without lookups
+        write(root, 'data/s03.csv', 'a,b\n5,7\n')
+        write(root, 'mine.csv', 'changed')
+        n_requests = len(self.server.requests)
+        assert sorted(proj.push()) == ['update_remote: data/s03.csv',
+                                       'update_remote: mine.csv']
+        # (mine.csv was uploaded by a full sync so needs the root listed)
+        assert len(self._listings(n_requests)) == 1
+        assert entries['data/s03.csv']['content'] == b'a,b\n5,7\n'
+        assert entries['mine.csv']['content'] == b'changed'
+        n_requests = len(self.server.requests)
+        assert proj.push() == []
+        assert len(self.server.requests) == n_requests
+
+    def test_folders_from_a_full_sync(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        root = proj.root_path
+        write(root, 'results/a/r01.csv', 'uploaded by a full sync')
+        proj.get_changes().apply()
+        write(root, 'results/a/r02.csv', 'pushed')
+        write(root, 'results/r03.csv', 'pushed')
+        n_requests = len(self.server.requests)
+        assert sorted(proj.push()) == ['add_remote: results/a/r02.csv',
+                                       'add_remote: results/r03.csv']
+        requests = self.server.requests[n_requests:]
+        # the existing folders were looked up, not created again
+        assert [url for method, url in requests
+                if method == 'PUT' and 'kind=folder' in url] == []
+        assert len(self._listings(n_requests)) == 2
+        assert self.server.entries['results/a/r02.csv']['content'] == \
+            b'pushed'
+        # and their links were kept so the next push needs no lookups
+        write(root, 'results/a/r04.csv', 'pushed')
+        n_requests = len(self.server.requests)
+        assert proj.push() == ['add_remote: results/a/r04.csv']
+        assert [method for method, url in
+                self.server.requests[n_requests:]] == ['PUT']
+
+    def test_rejected_and_deleted(self, tmpdir):
+        proj = self._synced_project(str(tmpdir))
+        root = proj.root_path
+        # added on the server from elsewhere, and locally
+        self.server.add_file('data/s05.csv', 'theirs')
+        write(root, 'data/s05.csv', 'ours')
+        # a folder added from elsewhere too
+        self.server.add_file('extra/a.csv', 'theirs')
+        write(root, 'extra/b.csv', 'ours')
+        # deleted remotely but changed locally
+        self.server.remove('data/s01.csv')
+        write(root, 'data/s01.csv', 'a,b\n1,4\n')
+        actions = proj.push()
+        conflicts = [action for action in actions
+                     if action.startswith('conflict: data/s05.csv')]
+        assert len(conflicts) == 1
+        entries = self.server.entries
+        assert entries['data/s05.csv']['content'] == b'theirs'
+        conflict_path = conflicts[0].split(' -> ')[1]
+        assert entries[conflict_path]['content'] == b'ours'
+        assert entries['extra/b.csv']['content'] == b'ours'
+        assert entries['data/s01.csv']['content'] == b'a,b\n1,4\n'
+        paths = [asset['path'] for asset in proj.index]
+        assert 'data/s05.csv' not in paths and conflict_path not in paths
+        # later pushes find the conflict uploaded already
+        assert proj.push() == conflicts
+        assert proj.push() == conflicts
+        assert entries[conflict_path]['content'] == b'ours'
+        # until the local file changes again
+        write(root, 'data/s05.csv', 'ours again')
+        os.utime(os.path.join(root, 'data', 's05.csv'), (0, 0))
+        new_conflict = proj.push()[0].split(' -> ')[1]
+        assert new_conflict != conflict_path
+        assert entries[new_conflict]['content'] == b'ours again'
+        # and a full sync then gets the remote copies
+        proj.get_changes().apply()
+        with open(os.path.join(root, 'extra', 'a.csv')) as f:
+            assert f.read() == 'theirs'
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import remote, project
+from fake_osf import FakeOSF, FakeSession
+import os
+
+
+def index_summary(index):
+    """path: (kind, md5) for comparing indices
+    """
+    return dict((asset['path'], (asset['kind'], asset.get('md5')))
+                for asset in index)
+
+
+class TestRemoteDelta(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s01.csv', 'a,b\n1,2\n')
+        self.server.add_file('stimuli/face.png', 'not really a png')
+        self.session = FakeSession(self.server)
+        self.osf = remote.OSFProject(session=self.session,
+                                     id=self.server.node_id)
+        self.osf.update_index()  # first time is always a full crawl
+        self.index = self.osf.index
+        self.cursor = self.osf.log_cursor
+
+    def _check_matches_full_crawl(self):
+        full = remote.OSFProject(session=self.session, id=self.server.node_id)
+        assert index_summary(self.osf.index) == index_summary(full.index)
+
+    def test_no_changes(self):
+        del self.server.requests[:]
+        assert self.osf.update_index(self.index, self.cursor)
+        # only the logs should have been fetched, no folder listings
+        assert len(self.server.requests) == 1
+        self._check_matches_full_crawl()
+
+    def test_add_update_remove_move(self):
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+        self.server.add_file('README.txt', 'read me again')
+        self.server.remove('stimuli/face.png')
+        self.server.add_file('new/deeper/notes.txt', 'some notes')
+        self.server.move('data', 'results')
+        del self.server.requests[:]
+        assert self.osf.update_index(self.index, self.cursor)
+        # the stimuli folder lost a file but never needed listing again
+        stim_url = self.index_asset('stimuli')['links']['move']
+        assert ('GET', stim_url) not in self.server.requests
+        self._check_matches_full_crawl()
+        assert self.osf.log_cursor['id'] == self.server.logs[-1]['id']
+
+    def test_truncated_logs_need_full_crawl(self):
+        self.server.log_page_size = 2
+        for n in range(remote.LOG_MAX_PAGES*2+1):
+            self.server.add_file('data/s{:02d}.csv'.format(n), str(n))
+        assert not self.osf.update_index(self.index, self.cursor)
+        self._check_matches_full_crawl()
+
+    def test_unknown_storage_action_needs_full_crawl(self):
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+        self.server._log('osf_storage_something_new', path='/data/')
+        self.server._log('wiki_updated', page='home')
+        assert not self.osf.update_index(self.index, self.cursor)
+        self._check_matches_full_crawl()
+
+    def test_project_stores_cursor(self, tmpdir):
+        proj_file = os.path.join(str(tmpdir), 'test.proj')
+        proj = project.Project(project_file=proj_file,
+                               root_path=os.path.join(str(tmpdir), 'files'),
+                               osf=self.osf, remote_delta=True,
+                               autosave=False)
+        changes = proj.get_changes()
+        changes.apply()
+        proj.save()
+        self.server.add_file('data/s02.csv', 'a,b\n3,4\n')
+        osf = remote.OSFProject(session=self.session, id=self.server.node_id)
+        proj = project.Project(project_file=proj_file, osf=osf,
+                               autosave=False, remote_delta=True)
+        assert proj.log_cursor == self.cursor
+        changes = proj.get_changes()
+        assert list(changes.add_local.keys()) == ['data/s02.csv']
+        assert proj.log_cursor['id'] == self.server.logs[-1]['id']
+
+    def index_asset(self, path):
+        for asset in self.index:
+            if asset['path'] == path:
+                return asset
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from fake_osf import FakeOSF, fake_project
+import os
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, *path.split('/'))
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+class TestScopedSync(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        for station in range(1, 4):
+            for n in range(3):
+                self.server.add_file(
+                    'data/station{}/s{}.csv'.format(station, n),
+                    '{},{}'.format(station, n))
+
+    def _listed(self, since):
+        """The paths of the folders listed since request n
+        """
+        listed = []
+        for method, url in self.server.requests[since:]:
+            if method == 'GET' and url.endswith('osfstorage'):
+                listed.append('')
+            elif method == 'GET' and url.endswith('/'):
+                entry_id = url.rstrip('/').rpartition('/')[2]
+                listed.append(self.server._path_from_id(entry_id))
+        return sorted(listed)
+
+    def test_scoped(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        outside = dict((asset['path'], dict(asset)) for asset in proj.index
+                       if not asset['path'].startswith('data/station3'))
+        # changes at this station and at another one
+        write(proj.root_path, 'data/station3/s3.csv', 'mine')
+        self.server.add_file('data/station3/s4.csv', 'from elsewhere')
+        self.server.add_file('data/station1/s3.csv', 'not mine')
+        n_requests = len(self.server.requests)
+        changes = proj.get_changes(scope='data/station3/')
+        assert self._listed(n_requests) == ['', 'data', 'data/station3']
+        assert list(changes.add_remote) == ['data/station3/s3.csv']
+        assert list(changes.add_local) == ['data/station3/s4.csv']
+        assert len(changes) == 2
+        changes.apply()
+        assert self.server.entries['data/station3/s3.csv']['content'] == \
+            b'mine'
+        index = dict((asset['path'], asset) for asset in proj.index)
+        for path, asset in outside.items():
+            assert dict(index[path]) == asset
+        assert 'data/station3/s4.csv' in index
+        assert 'data/station1/s3.csv' not in index
+        # a full sync then just finds the other station's change
+        changes = proj.get_changes()
+        assert list(changes.add_local) == ['data/station1/s3.csv']
+        assert len(changes) == 1
+
+    def test_new_station(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        write(proj.root_path, 'data/station4/s0.csv', '4,0')
+        proj.get_changes(scope='data/station4').apply()
+        assert self.server.entries['data/station4/s0.csv']['content'] == \
+            b'4,0'
+        assert sorted(asset['path'] for asset in proj.index) == \
+            ['data/station4', 'data/station4/s0.csv']
+        # and an existing one on a fresh machine only fetches its own files
+        proj.get_changes(scope='data/station2').apply()
+        assert sorted(os.listdir(os.path.join(proj.root_path, 'data'))) == \
+            ['station2', 'station4']
+        assert len(proj.get_changes(scope='data/station2')) == 0
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import remote, constants, exceptions
+from fake_osf import FakeOSF, FakeSession
+import pytest
+
+
+class TestSessionAuth(object):
+
+    @pytest.fixture(autouse=True)
+    def pyosf_folder(self, tmpdir, monkeypatch):
+        # keep tokens and identities out of the real PYOSF_FOLDER
+        monkeypatch.setattr(constants, 'PYOSF_FOLDER', str(tmpdir))
+        monkeypatch.setattr(remote, '_token_storage', None)
+        monkeypatch.setattr(remote, '_identity_cache', None)
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.valid_tokens = set(['good'])
+        self.node_url = "{}/nodes/{}/".format(constants.API_BASE,
+                                              self.server.node_id)
+
+    def test_validation_is_deferred_and_cached(self):
+        session = FakeSession(self.server, token='good')
+        assert self.server.requests == []
+        assert session.get(self.node_url).status_code == 200
+        assert len(self.server.requests) == 1  # no extra round trip
+        assert session.user_id == 'fakeuser'
+        assert session.user_full_name == 'Fake User'
+        assert len(self.server.requests) == 2
+        assert session.identity['fingerprint'] == \
+            remote.token_fingerprint('good')
+        # another session with that token reuses the validated identity
+        other = FakeSession(self.server, token='good')
+        assert other.user_id == 'fakeuser'
+        assert len(self.server.requests) == 2
+        # unless it has expired
+        remote.identity_cache().ttl = 0
+        other = FakeSession(self.server, token='good')
+        assert other.user_id == 'fakeuser'
+        assert len(self.server.requests) == 3
+
+    def test_stored_token_needs_no_requests(self):
+        tokens = remote.stored_tokens()
+        tokens['me@example.com'] = 'good'
+        tokens.save()
+        assert remote.stored_tokens() is tokens  # not read again
+        session = FakeSession(self.server, username='me@example.com')
+        assert session.token == 'good'
+        assert self.server.requests == []
+
+    def test_expired_token_renewed_with_password(self):
+        tokens = remote.stored_tokens()
+        tokens['me@example.com'] = 'expired'
+        tokens.save()
+        session = FakeSession(self.server, username='me@example.com',
+                              password='secret')
+        assert self.server.requests == []
+        # the 401 leads to a new token and the request being sent again
+        assert session.get(self.node_url).status_code == 200
+        assert session.token in self.server.valid_tokens
+        assert remote.stored_tokens()['me@example.com'] == session.token
+        assert session.user_id == 'fakeuser'
+
+    def test_invalid_token_without_password(self):
+        session = FakeSession(self.server, token='bad')
+        with pytest.raises(exceptions.AuthError):
+            session.get(self.node_url)
+        assert not session.authenticated
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import remote, project, constants
+from fake_osf import FakeOSF, FakeSession
+import os
+import json
+import time
+import threading
+import functools
+import pytest
+
+
+class TestSessionRegistry(object):
+
+    @pytest.fixture(autouse=True)
+    def registry(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(constants, 'PYOSF_FOLDER', str(tmpdir))
+        monkeypatch.setattr(remote, '_token_storage', None)
+        monkeypatch.setattr(remote, '_identity_cache', None)
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        self.server.add_file('data/s01.csv', 'a,b\n1,2\n')
+        tokens = remote.stored_tokens()
+        tokens['me@example.com'] = 'good'
+        tokens.save()
+        self.registry = remote.SessionRegistry(
+            session_class=functools.partial(FakeSession, self.server))
+        monkeypatch.setattr(remote, 'sessions', self.registry)
+
+    def test_shared_and_refcounted(self):
+        first = self.registry.get('me@example.com')
+        assert self.registry.get('me@example.com') is first
+        assert self.registry.get(token='abc') is not first
+        assert len(self.registry) == 2
+        self.registry.release(first)
+        assert len(self.registry) == 2
+        self.registry.release(first)
+        assert len(self.registry) == 1
+        assert self.registry.get('me@example.com') is not first
+
+    def test_thread_safe(self):
+        got = []
+        threads = [threading.Thread(
+            target=lambda: got.append(self.registry.get('me@example.com')))
+            for n in range(10)]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+        assert len(set(id(session) for session in got)) == 1
+        assert self.registry._sessions[('username', 'me@example.com')][1] \
+            == 10
+
+    def _project(self, folder):
+        proj_file = os.path.join(folder, 'test.proj')
+        os.makedirs(folder)
+        with open(proj_file, 'w') as f:
+            json.dump({'username': 'me@example.com', 'index': [],
+                       'project_id': self.server.node_id,
+                       'root_path': os.path.join(folder, 'files')}, f)
+        return project.Project(project_file=proj_file, autosave=False)
+
+    def test_projects_share_session(self, tmpdir):
+        projs = [self._project(os.path.join(str(tmpdir), str(n)))
+                 for n in range(5)]
+        sessions = set(id(proj.osf.session) for proj in projs)
+        assert len(sessions) == 1
+        assert len(self.registry) == 1
+        # threaded transfers for each project on the shared session
+        all_changes = [proj.get_changes() for proj in projs[:2]]
+        for changes in all_changes:
+            changes.apply(threaded=True)
+        for changes in all_changes:
+            while changes.progress != -1:
+                time.sleep(0.01)
+            changes.finish_sync()
+        for proj in projs[:2]:
+            assert sorted(asset['path'] for asset in proj.index) == \
+                ['README.txt', 'data', 'data/s01.csv']
+            assert len(proj.get_changes()) == 0
+        for proj in projs:
+            proj.close()
+        assert len(self.registry) == 0
+
+    def test_transfers_keyed_by_changes(self):
+        session = self.registry.get(token='good')
+
+        class Changes(object):
+            def add_to_index(self, path):
+                pass
+
+        old = Changes()
+        thread = session._transfer_thread('push', old)
+        assert session._threads_for(old) == [thread]
+        old_id = id(old)
+        del old
+        # a new Changes (even with the same id) has none of its threads
+        new = Changes()
+        assert session._threads_for(new) == []
+        assert session.get_progress(new) == 1
+        new_thread = session._transfer_thread('push', new)
+        assert session._threads_for(new) == [new_thread]
+        if id(new) == old_id:  # (the stale thread was dropped)
+            assert thread not in session._threads_for()
+        # and threads are dropped when they finish
+        session.apply_changes(new)
+        new_thread.join()
+        assert session._threads_for() == []
+        self.registry.release(session)
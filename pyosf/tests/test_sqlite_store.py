@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import project, store
+from fake_osf import FakeOSF, fake_project
+import os
+import sqlite3
+import time
+
+
+def make_server():
+    server = FakeOSF()
+    server.add_file('README.txt', 'read me')
+    server.add_file('data/s01.csv', 'a,b\n1,2\n')
+    return server
+
+
+def stored_paths(db_path):
+    db = sqlite3.connect(db_path)
+    paths = sorted(row[0] for row in db.execute("SELECT path FROM last_index"))
+    db.close()
+    return paths
+
+
+def test_migrate_json_project(tmpdir):
+    server = make_server()
+    proj = fake_project(server, str(tmpdir))
+    proj.get_changes().apply()
+    db_path = store.migrate(proj.project_file)
+    assert db_path.endswith('test.db')
+    reloaded = project.Project(project_file=db_path, osf=proj.osf,
+                               autosave=False)
+    assert reloaded.root_path == proj.root_path
+    assert reloaded.index == proj.index
+    assert len(reloaded.get_changes()) == 0
+    # or migrate from the Project itself
+    db_path = proj.migrate_to_sqlite(os.path.join(str(tmpdir), 'other.db'))
+    assert proj.project_file == db_path
+    assert stored_paths(db_path) == stored_paths(
+        os.path.join(str(tmpdir), 'test.db'))
+
+
+def test_incremental_updates(tmpdir):
+    server = make_server()
+    proj = fake_project(server, str(tmpdir))
+    proj.migrate_to_sqlite()
+    db_path = proj.project_file
+    changes = proj.get_changes()
+    changes.apply(threaded=True)
+    while changes.progress != -1:
+        time.sleep(0.01)
+    # completed downloads were committed before any call to save()
+    assert stored_paths(db_path) == ['README.txt', 'data', 'data/s01.csv']
+    changes.finish_sync()
+    os.remove(os.path.join(proj.root_path, 'README.txt'))
+    proj.get_changes().apply()
+    assert stored_paths(db_path) == ['data', 'data/s01.csv']
+
+
+def test_analysis_leaves_store_untouched(tmpdir):
+    server = make_server()
+    proj = fake_project(server, str(tmpdir))
+    proj.migrate_to_sqlite()
+    db_path = proj.project_file
+    proj.get_changes().apply()
+    # deleted on both sides, so the analysis drops it from the index
+    os.remove(os.path.join(proj.root_path, 'README.txt'))
+    server.remove('README.txt')
+    mtime = os.path.getmtime(db_path)
+    os.utime(db_path, (mtime - 10, mtime - 10))
+    proj.get_changes(remote=False)
+    changes = proj.get_changes()
+    changes.dry_run()
+    assert 'README.txt' in stored_paths(db_path)
+    assert os.path.getmtime(db_path) == mtime - 10
+    changes.apply()
+    assert stored_paths(db_path) == ['data', 'data/s01.csv']
+
+
+def test_sqlite_saves_not_deferred(tmpdir):
+    server = make_server()
+    proj = fake_project(server, str(tmpdir), save_delay=60)
+    proj.migrate_to_sqlite()
+    proj.get_changes().apply()
+    # no timer thread that could commit while a sync writes to the store
+    proj.name = 'renamed'
+    assert proj.save(defer=True)
+    assert proj._save_timer is None
+    assert not proj.dirty
+    assert stored_paths(proj.project_file) == [
+        'README.txt', 'data', 'data/s01.csv']
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf.manager import SyncManager
+from fake_osf import FakeOSF, FakeResponse, fake_project
+import os
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, *path.split('/'))
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+class LoggedOSF(FakeOSF):
+    """A FakeOSF that also records its uploads and downloads in a log
+    shared with other servers (to see how they interleave)
+    """
+    def __init__(self, node_id, log):
+        FakeOSF.__init__(self, node_id=node_id)
+        self.log = log
+
+    def handle(self, method, url, **kwargs):
+        if (method == 'PUT' and 'kind=folder' not in url) or \
+                (method == 'GET' and '/providers/osfstorage/' in url and
+                 not url.endswith('/')):
+            self.log.append(self.node_id)
+        return FakeOSF.handle(self, method, url, **kwargs)
+
+
+class DownOSF(FakeOSF):
+    """A FakeOSF that can't be reached once `down` is set
+    """
+    down = False
+
+    def handle(self, method, url, **kwargs):
+        if not self.down:
+            return FakeOSF.handle(self, method, url, **kwargs)
+        self.requests.append((method, url))
+        return FakeResponse(503, {'errors': 'unavailable'})
+
+
+class TestSyncManager(object):
+
+    def setup_method(self, method):
+        self.log = []
+        self.servers = []
+        for n in range(3):
+            server = LoggedOSF('node{}'.format(n), self.log)
+            for i in range(8):
+                server.add_file('data/s{}.csv'.format(i), '{},{}'.format(n, i))
+            self.servers.append(server)
+
+    def _projects(self, tmpdir):
+        projects = []
+        for server in self.servers:
+            folder = str(tmpdir.mkdir(server.node_id))
+            proj = fake_project(server, folder, save_delay=0,
+                                name=server.node_id)
+            write(proj.root_path, 'mine/m.csv', server.node_id)
+            projects.append(proj)
+        return projects
+
+    def test_sync_all(self, tmpdir):
+        projects = self._projects(tmpdir)
+        manager = SyncManager(projects, workers=2, scanners=3, queue_size=2)
+        report = manager.run()
+        assert [result['project'] for result in report] == \
+            ['node0', 'node1', 'node2']
+        for result, proj, server in zip(report, projects, self.servers):
+            assert result['state'] == 'done' and result['error'] is None
+            assert result['n_done'] == result['n_transfers'] == 9
+            with open(os.path.join(proj.root_path, 'data', 's5.csv')) as f:
+                assert f.read() == '{},5'.format(server.node_id[-1])
+            assert server.entries['mine/m.csv']['content'] == \
+                server.node_id.encode()
+            assert len(proj.get_changes()) == 0
+        assert manager.progress()['done'] == manager.progress()['total'] == 27
+        # the transfers were shared out between the projects, not one
+        # project's after another's
+        assert len(self.log) == 27
+        assert len(set(self.log[9:18])) > 1
+
+    def test_one_fails(self, tmpdir):
+        self.servers[1] = DownOSF('node1')
+        projects = self._projects(tmpdir)
+        self.servers[1].down = True
+        manager = SyncManager()
+        for proj in projects:
+            manager.add(proj)
+        report = manager.run()
+        assert [result['state'] for result in report] == \
+            ['done', 'failed', 'done']
+        assert report[1]['error'] is not None
+        for n in [0, 2]:
+            assert len(projects[n].get_changes()) == 0
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks to check that sync.Changes scales linearly with project size
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import sync
+from fake_osf import IndexOnlyProject, synthetic_index
+import time
+
+
+def time_completing_transfers(n_files):
+    """Times add_to_index() for every file as if they'd all been uploaded
+    """
+    index = synthetic_index(n_files)
+    proj = IndexOnlyProject(index, [], [])
+    changes = sync.Changes(proj)
+    assert len(changes.add_remote) == len(index)
+    t0 = time.time()
+    for path in changes.add_remote:
+        changes.add_to_index(path)
+    duration = time.time() - t0
+    assert len(changes.last_index) == len(index)
+    return duration
+
+
+def test_index_updates_scale_linearly():
+    small = min(time_completing_transfers(2500) for rep in range(3))
+    large = min(time_completing_transfers(10000) for rep in range(3))
+    print("add_to_index: 2.5k files {:.4f}s, 10k files {:.4f}s"
+          .format(small, large))
+    # 4x the files should take ~4x the time (quadratic would be ~16x)
+    assert large < small * 10 + 0.01
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import sync, manager
+from fake_osf import FakeOSF, fake_project
+import os
+import threading
+import time
+import pytest
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, *path.split('/'))
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+class TestTransferOrder(object):
+
+    def setup_method(self, method):
+        self.assets = {
+            'data': {'kind': 'folder'},
+            'data/s01.csv': {'kind': 'file', 'size': 200,
+                             'date_modified': '2016-01-03T00:00:00'},
+            'data/s02.csv': {'kind': 'file', 'size': 100,
+                             'date_modified': '2016-01-01T00:00:00'},
+            'stimuli': {'kind': 'folder'},
+            'stimuli/movie.mp4': {'kind': 'file', 'size': 5000,
+                                  'date_modified': '2016-01-02T00:00:00'},
+            'notes.txt': {'kind': 'file', 'size': 10,
+                          'date_modified': '2015-12-01T00:00:00'}}
+
+    def test_policies(self):
+        order = sync.transfer_order
+        assert order(self.assets) == sorted(self.assets)
+        folders = ['data', 'stimuli']
+        assert order(self.assets, 'smallest') == folders + [
+            'notes.txt', 'data/s02.csv', 'data/s01.csv', 'stimuli/movie.mp4']
+        assert order(self.assets, 'largest') == folders + [
+            'stimuli/movie.mp4', 'data/s01.csv', 'data/s02.csv', 'notes.txt']
+        assert order(self.assets, 'newest') == folders + [
+            'data/s01.csv', 'stimuli/movie.mp4', 'data/s02.csv', 'notes.txt']
+        # the priority globs come first (in their order) whatever the policy
+        assert order(self.assets, 'largest',
+                     ['*.txt', 'data/*.csv']) == folders + [
+            'notes.txt', 'data/s01.csv', 'data/s02.csv', 'stimuli/movie.mp4']
+        assert order(self.assets, 'path', ['stimuli/*']) == folders + [
+            'stimuli/movie.mp4', 'data/s01.csv', 'data/s02.csv', 'notes.txt']
+        with pytest.raises(ValueError):
+            order(self.assets, 'random')
+
+    def test_compare_orders(self):
+        history = [{'order': 'path', 'first_useful': 4.0},
+                   {'order': 'smallest', 'first_useful': 1.0},
+                   {'order': 'path', 'first_useful': 2.0},
+                   {'bytes': 10, 'seconds': 1.0}]  # (before orders)
+        assert sync.compare_orders(history) == {
+            'path': {'n_syncs': 2, 'first_useful': 3.0},
+            'smallest': {'n_syncs': 1, 'first_useful': 1.0}}
+
+
+class TestOrderedSync(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+
+    def _uploads(self, since=0):
+        return [url.rpartition('name=')[2]
+                for method, url in self.server.requests[since:]
+                if method == 'PUT' and 'kind=file' in url]
+
+    def _add_files(self, root):
+        write(root, 'stimuli/movie.mp4', 'm' * 5000)
+        write(root, 'data/s01.csv', 'a' * 200)
+        write(root, 'data/s02.csv', 'b' * 100)
+        write(root, 'notes.txt', 'n' * 10)
+
+    def test_apply(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        self._add_files(proj.root_path)
+        n_requests = len(self.server.requests)
+        changes = proj.get_changes(order='smallest', priority=['data/*'])
+        assert changes.dry_run() == [
+            'add_remote: data', 'add_remote: stimuli',
+            'add_remote: data/s02.csv', 'add_remote: data/s01.csv',
+            'add_remote: notes.txt', 'add_remote: stimuli/movie.mp4']
+        changes.apply()
+        assert self._uploads(n_requests) == [
+            's02.csv', 's01.csv', 'notes.txt', 'movie.mp4']
+        report = changes.transfer_report()
+        assert report['order'] == 'smallest+data/*'
+        assert report['n_files'] == 4
+        assert report['first_file'] == report['first_useful']
+        assert report['first_useful'] <= report['all_useful'] <= \
+            report['seconds']
+        record = proj.sync_history[-1]
+        assert record['order'] == 'smallest+data/*'
+        assert 'first_useful' in record
+        assert 'smallest+data/*' in sync.compare_orders(proj.sync_history)
+        assert len(proj.get_changes()) == 0
+
+    def test_time_of_transfer(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        self._add_files(proj.root_path)
+        changes = proj.get_changes()
+        changes.begin_apply()
+        # a transfer thread finishes long before the owner applies its event
+        worker = threading.Thread(
+            target=lambda: changes.add_to_index('notes.txt'))
+        worker.start()
+        worker.join()
+        time.sleep(0.5)
+        assert changes.apply_pending() == 1
+        assert changes.transfer_report()['first_file'] < 0.5
+
+    def test_manager(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        self._add_files(proj.root_path)
+        n_requests = len(self.server.requests)
+        sync_manager = manager.SyncManager([proj], workers=1,
+                                           order='largest',
+                                           priority=['*.txt'])
+        sync_manager.run()
+        assert self._uploads(n_requests) == [
+            'notes.txt', 'movie.mp4', 's01.csv', 's02.csv']
+        assert proj.sync_history[-1]['order'] == 'largest+*.txt'
+        assert proj.sync_history[-1]['first_useful'] >= 0
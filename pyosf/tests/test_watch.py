@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import local, watch
+from fake_osf import FakeOSF, fake_project
+import os
+import time
+import hashlib
+import pytest
+
+
+def write(root, path, content):
+    full_path = os.path.join(root, *path.split('/'))
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    with open(full_path, 'w') as f:
+        f.write(content)
+
+
+def inotify_available(folder):
+    try:
+        watch.InotifyWatcher(folder).close()
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+class CountingHashlib(object):
+    """Stands in for hashlib in pyosf.local to count the files hashed
+    """
+    def __init__(self):
+        self.n_hashed = 0
+
+    def md5(self, *args):
+        self.n_hashed += 1
+        return hashlib.md5(*args)
+
+
+class TestWatchSync(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        for station in range(3):
+            for n in range(3):
+                self.server.add_file(
+                    'data/station{}/s{}.csv'.format(station, n),
+                    '{},{}'.format(station, n))
+
+    def _synced_project(self, folder):
+        proj = fake_project(self.server, folder, save_delay=0)
+        proj.get_changes().apply()
+        return proj
+
+    def _listed(self, since):
+        """The paths of the folders listed since request n
+        """
+        listed = []
+        for method, url in self.server.requests[since:]:
+            if method == 'GET' and url.endswith('osfstorage'):
+                listed.append('')
+            elif method == 'GET' and url.endswith('/'):
+                entry_id = url.rstrip('/').rpartition('/')[2]
+                listed.append(self.server._path_from_id(entry_id))
+        return sorted(listed)
+
+    def _check_until_synced(self, watcher, seconds=5):
+        end = time.time() + seconds
+        while time.time() < end:
+            actions = watcher.check(timeout=0.1)
+            if actions is not None:
+                return actions
+
+    def test_polling(self, tmpdir, monkeypatch):
+        proj = self._synced_project(str(tmpdir))
+        root = proj.root_path
+        watcher = proj.watch(debounce=0, poll_interval=0, inotify=False)
+        watcher.start()
+        assert isinstance(watcher._watcher, watch.PollingWatcher)
+        assert watcher.check() is None  # nothing changed
+        write(root, 'data/station1/s1.csv', 'edited')
+        write(root, 'data/station1/s3.csv', 'new')
+        os.remove(os.path.join(root, 'README.txt'))
+        counter = CountingHashlib()
+        monkeypatch.setattr(local, 'hashlib', counter)
+        n_requests = len(self.server.requests)
+        actions = watcher.check()
+        assert actions == ['add_remote: data/station1/s3.csv',
+                           'update_remote: data/station1/s1.csv',
+                           'del_remote: README.txt']
+        assert counter.n_hashed == 2  # just the touched files
+        assert self._listed(n_requests) == ['', 'data', 'data/station1']
+        entries = self.server.entries
+        assert entries['data/station1/s1.csv']['content'] == b'edited'
+        assert entries['data/station1/s3.csv']['content'] == b'new'
+        assert 'README.txt' not in entries
+        # the local index was patched rather than rebuilt
+        assert not proj.local._needs_rebuild_index
+        paths = sorted(asset['path'] for asset in proj.local.index)
+        assert 'data/station1/s3.csv' in paths and 'README.txt' not in paths
+        assert len(paths) == 14  # (4 folders, 10 files)
+        assert watcher.check() is None
+        assert len(proj.get_changes()) == 0
+
+    def test_debounce(self, tmpdir):
+        proj = self._synced_project(str(tmpdir))
+        watcher = watch.WatchSync(proj, debounce=60, poll_interval=0,
+                                  inotify=False)
+        write(proj.root_path, 'data/station2/s0.csv', 'edited')
+        watcher.start()
+        write(proj.root_path, 'data/station2/s1.csv', 'edited')
+        assert watcher.check() is None  # (still changing)
+        assert watcher.touched == set([os.path.join('data', 'station2',
+                                                    's1.csv')])
+        watcher.debounce = 0
+        assert watcher.check() == ['update_remote: data/station2/s1.csv']
+
+    def test_inotify(self, tmpdir):
+        proj = self._synced_project(str(tmpdir))
+        root = proj.root_path
+        if not inotify_available(root):
+            pytest.skip("needs inotify")
+        watcher = proj.watch(debounce=0.2)
+        watcher.start()
+        assert isinstance(watcher._watcher, watch.InotifyWatcher)
+        # a new folder (watched as it's created) and an edit
+        write(root, 'data/station3/s0.csv', '3,0')
+        write(root, 'data/station3/s1.csv', '3,1')
+        write(root, 'data/station0/s2.csv', 'edited')
+        assert sorted(self._check_until_synced(watcher)) == [
+            'add_remote: data/station3', 'add_remote: data/station3/s0.csv',
+            'add_remote: data/station3/s1.csv',
+            'update_remote: data/station0/s2.csv']
+        # later files in the new folder are seen too
+        write(root, 'data/station3/s2.csv', '3,2')
+        assert self._check_until_synced(watcher) == [
+            'add_remote: data/station3/s2.csv']
+        assert self.server.entries['data/station3/s2.csv']['content'] == \
+            b'3,2'
+        watcher.stop()
+        assert len(proj.get_changes()) == 0
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+from pyosf import sync
+from fake_osf import FakeOSF, fake_project
+import os
+
+
+class TestZipClone(object):
+
+    def setup_method(self, method):
+        self.server = FakeOSF()
+        self.server.add_file('README.txt', 'read me')
+        for n in range(30):
+            self.server.add_file('data/s{:02d}.csv'.format(n), str(n))
+            self.server.add_file('data/raw/r{:02d}.dat'.format(n), str(-n))
+
+    def _file_downloads(self):
+        """The ids of the files that were downloaded individually
+        """
+        return [url.rpartition('/')[2] for method, url in self.server.requests
+                if method == 'GET' and '/providers/osfstorage/' in url and
+                not url.endswith('/') and not url.endswith('?zip=')]
+
+    def test_initial_clone(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        changes = proj.get_changes()
+        assert list(changes._zip_folders()) == ['']
+        n_requests = len(self.server.requests)
+        changes.apply()
+        new_requests = self.server.requests[n_requests:]
+        assert len(new_requests) == 1 and new_requests[0][1].endswith('?zip=')
+        with open(os.path.join(proj.root_path, 'data', 'raw',
+                               'r07.dat')) as f:
+            assert f.read() == '-7'
+        assert len(proj.index) == 63  # the files and 2 folders
+        assert len(proj.get_changes()) == 0
+
+    def test_missing_subtree(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        proj.get_changes().apply()
+        # a new remote folder big enough to zip and one that isn't
+        for n in range(25):
+            self.server.add_file('more/m{:02d}.txt'.format(n), str(n))
+        self.server.add_file('few/f.txt', 'too few to zip')
+        changes = proj.get_changes()
+        assert list(changes._zip_folders()) == ['more']
+        n_requests = len(self.server.requests)
+        changes.apply()
+        zips = [url for method, url in self.server.requests[n_requests:]
+                if url.endswith('?zip=')]
+        assert len(zips) == 1
+        assert len(proj.get_changes()) == 0
+        assert os.path.isfile(os.path.join(proj.root_path, 'few', 'f.txt'))
+
+    def test_mismatch_downloaded_singly(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        changes = proj.get_changes()
+        # changes on the server after the analysis don't match the index
+        self.server.add_file('data/s03.csv', 'changed')
+        changes.apply()
+        entry_id = self.server.entries['data/s03.csv']['id']
+        assert self._file_downloads() == [entry_id]
+
+    def test_threshold(self, tmpdir):
+        proj = fake_project(self.server, str(tmpdir), save_delay=0)
+        changes = proj.get_changes()
+        changes.zip_min_files = 100
+        assert changes._zip_folders() == {}
+        changes.zip_min_files = None
+        assert changes._zip_folders() == {}
+        assert sync.Changes.zip_min_files > 1
@@ -9,6 +9,32 @@ Released under MIT license
 """
 
 from __future__ import absolute_import, print_function
+import os
+import hashlib
+from . import constants
+
+logfile_path = os.path.join(constants.PYOSF_FOLDER, 'last_session.log')
+logfile = None  # created by start_logfile()
+
+
+def start_logfile():
+    """Creates the PYOSF_FOLDER and a logfile for this session (the first
+    time it is called). This is deferred until pyosf is actually used so
+    that importing it has no side effects
+    """
+    global logfile
+    if logfile is not None:
+        return logfile
+    if not os.path.isdir(constants.PYOSF_FOLDER):
+        os.makedirs(constants.PYOSF_FOLDER)
+    # prefer psychopy logging but use built-in logging if not available
+    try:
+        from psychopy import logging
+        logfile = logging.LogFile(logfile_path, level=logging.DEBUG)
+    except ImportError:
+        import logging
+        logfile = logging.FileHandler(logfile_path, mode='w')
+    return logfile
 
 
 def find_by_key(in_list, key, val):
@@ -24,3 +50,119 @@ def dict_from_list(in_list, key):
     for entry in in_list:
         d[entry[key]] = entry
     return d
+
+
+def _folders_deepest_first(index):
+    """Returns the paths of all folders in an index (including implied ones
+    and the root, '') ordered so that each folder comes before its parent
+    """
+    folders = set([''])
+    for asset in index:
+        if asset['kind'] == 'folder':
+            folder = asset['path']
+        else:
+            folder = os.path.dirname(asset['path'])
+        while folder not in folders:
+            folders.add(folder)
+            folder = os.path.dirname(folder)
+    return sorted(folders, key=lambda p: p.count('/') + bool(p), reverse=True)
+
+
+def folder_digests(index, key):
+    """Computes a content digest for every folder in an index
+
+    Digests are built bottom-up (a Merkle tree) from the names and `key`
+    hashes of the files and the digests of the sub-folders, so two folders
+    have the same digest only if everything below them matches. Folders that
+    only exist implicitly (no asset of their own) are distinguished from
+    explicit ones. Each asset is visited once.
+
+    Returns a dict of {folder_path: hex digest} where '' is the root
+    """
+    folders = _folders_deepest_first(index)
+    lines = dict((folder, []) for folder in folders)
+    explicit = set()
+    for asset in index:
+        if asset['kind'] == 'folder':
+            explicit.add(asset['path'])
+        else:
+            parent, name = os.path.split(asset['path'])
+            lines[parent].append("{}\0file\0{}".format(name, asset.get(key)))
+    digests = {}
+    for folder in folders:
+        digests[folder] = hashlib.md5(
+            "\n".join(sorted(lines[folder])).encode('utf-8')).hexdigest()
+        if folder:
+            kind = 'folder' if folder in explicit else 'implied'
+            lines[os.path.dirname(folder)].append("{}\0{}\0{}".format(
+                os.path.basename(folder), kind, digests[folder]))
+    return digests
+
+
+def folder_dates(index):
+    """Finds the most recent `date_modified` of the files below each folder
+    in an index (working bottom-up so each asset is visited once)
+
+    Returns a dict of {folder_path: date} with '0' for folders with no files
+    """
+    folders = _folders_deepest_first(index)
+    dates = dict((folder, '0') for folder in folders)
+    for asset in index:
+        if asset['kind'] != 'folder' and 'date_modified' in asset:
+            parent = os.path.dirname(asset['path'])
+            dates[parent] = max(dates[parent], asset['date_modified'])
+    for folder in folders:
+        if folder:
+            parent = os.path.dirname(folder)
+            dates[parent] = max(dates[parent], dates[folder])
+    return dates
+
+
+def in_scope(path, scope):
+    """Whether the path is the scope (a folder path) or inside it. The scope
+    can also be a set (or list) of paths, e.g. those touched since the last
+    sync, in which case the path is in scope if it is any of them or inside
+    any of them
+    """
+    if not isinstance(scope, (set, frozenset, list, tuple)):
+        scope = [scope]
+    while path not in scope:
+        if path == '':
+            return False
+        path = os.path.dirname(path)
+    return True
+
+
+def top_paths(paths):
+    """The paths (stripped of '/') that aren't inside another of the paths,
+    as a frozenset. An empty path stands for the whole tree
+    """
+    paths = set(path.strip('/') for path in paths)
+    if '' in paths:
+        return frozenset([''])
+    return frozenset(path for path in paths
+                     if not in_scope(os.path.dirname(path), paths))
+
+
+def atomic_write(filename, text):
+    """Writes text to a file via a temporary file in the same folder, so
+    that a crash part way through never leaves a half-written file
+    """
+    folder = os.path.dirname(filename)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    tmp_path = "{}.tmp{}".format(filename, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(text.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    if hasattr(os, 'replace'):
+        os.replace(tmp_path, filename)
+    else:  # Python 2 can't rename over an existing file on Windows
+        if os.path.isfile(filename) and os.name == 'nt':
+            os.remove(filename)
+        os.rename(tmp_path, filename)
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""Watches the local files of a project and syncs just the paths that
+change, using Linux inotify (via ctypes) where available and otherwise
+polling the size and date of the files
+
+Part of the pyosf package
+https://github.com/psychopy/pyosf/
+
+Released under MIT license
+
+@author: Jon Peirce
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+try:
+    from psychopy import logging
+except ImportError:
+    import logging
+from . import constants
+from .tools import in_scope, top_paths
+
+# inotify flags and event masks (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+              IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (then the name)
+_FS_ENCODING = sys.getfilesystemencoding() or 'utf-8'
+
+
+class InotifyWatcher(object):
+    """Reports the paths touched below a folder from Linux inotify events,
+    watching each folder within it (including those created later)
+
+    Raises OSError (or AttributeError) where inotify isn't available
+    """
+    def __init__(self, root_path):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify is only on Linux")
+        self.root_path = root_path
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or
+                                 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, "inotify_init1: {}".format(os.strerror(err)))
+        self._watches = {}  # wd: folder relative to the root ('' for root)
+        self._pending = set()  # paths read by ignore() and not ignored
+        self._add_tree('')
+
+    def _add_tree(self, folder):
+        """Watches the folder and the folders within it
+        """
+        top = os.path.join(self.root_path, folder)
+        for dirpath, dirnames, filenames in os.walk(top):
+            full_path = dirpath
+            if not isinstance(full_path, bytes):
+                full_path = full_path.encode(_FS_ENCODING)
+            wd = self._libc.inotify_add_watch(self._fd, full_path,
+                                              WATCH_MASK)
+            if wd >= 0:  # (else it has gone already)
+                path = os.path.relpath(dirpath, self.root_path)
+                self._watches[wd] = '' if path == os.curdir else path
+
+    def read(self, timeout):
+        """Waits up to `timeout` seconds for events and returns the set of
+        paths touched, relative to the root ('' if events were lost so
+        that everything needs checking)
+        """
+        touched = self._pending
+        self._pending = set()
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return touched
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as err:
+                if err.errno in [errno.EAGAIN, errno.EWOULDBLOCK]:
+                    return touched
+                raise
+            pos = 0
+            while pos < len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                name = data[pos:pos+length].rstrip(b'\0')
+                pos += length
+                if mask & IN_Q_OVERFLOW:
+                    touched.add('')
+                elif mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                elif wd in self._watches and name:
+                    path = os.path.join(self._watches[wd],
+                                        name.decode(_FS_ENCODING))
+                    touched.add(path)
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_tree(path)
+
+    def ignore(self, paths):
+        """Drops the events so far for the given paths (e.g. written by the
+        sync itself), keeping any others for the next `read()`
+        """
+        touched = self.read(0)
+        self._pending = set(path for path in touched
+                            if not in_scope(path, paths))
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(object):
+    """Reports the paths touched below a folder by comparing the size and
+    date of everything in it with those from the previous scan, every
+    `interval` seconds (without reading the files)
+    """
+    def __init__(self, root_path, interval=None):
+        if interval is None:
+            interval = constants.WATCH_POLL_INTERVAL
+        self.root_path = root_path
+        self.interval = interval
+        self._stats = self._scan()
+        self._next_scan = time.time() + interval
+
+    def _scan(self, top=None):
+        """Returns {path: (size, date)} for everything below top (the root
+        by default) with None for the folders
+        """
+        if top is None:
+            top = self.root_path
+        stats = {}
+        for dirpath, dirnames, filenames in os.walk(top):
+            for name in dirnames:
+                path = os.path.join(dirpath, name)
+                stats[os.path.relpath(path, self.root_path)] = None
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # (gone since it was listed)
+                stats[os.path.relpath(path, self.root_path)] = \
+                    (stat.st_size, stat.st_mtime)
+        return stats
+
+    def read(self, timeout):
+        """Waits up to `timeout` seconds for the next scan and returns the
+        set of paths that were added, removed or changed since the last
+        """
+        wait = self._next_scan - time.time()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(wait, 0))
+        self._next_scan = time.time() + self.interval
+        stats = self._scan()
+        touched = set(path for path in set(stats) | set(self._stats)
+                      if stats.get(path, 0) != self._stats.get(path, 0))
+        self._stats = stats
+        return touched
+
+    def ignore(self, paths):
+        """Takes the current size and date of the given paths (e.g. written
+        by the sync itself) so that they aren't reported as touched
+        """
+        for path in list(self._stats):
+            if in_scope(path, paths):
+                del self._stats[path]
+        for path in paths:
+            full_path = os.path.join(self.root_path, path)
+            if os.path.isdir(full_path):
+                self._stats[path] = None
+                self._stats.update(self._scan(full_path))
+            elif os.path.isfile(full_path):
+                stat = os.stat(full_path)
+                self._stats[path] = (stat.st_size, stat.st_mtime)
+
+    def close(self):
+        pass
+
+
+class WatchSync(object):
+    """Syncs a project whenever its local files change
+
+    The local index is built once and then kept up to date from the paths
+    reported touched (by inotify on Linux, otherwise by polling the size
+    and date of the files), with files that were only appended to hashed
+    by feeding just the new bytes (see `LocalFiles._hash_file`). Bursts of
+    changes are debounced: once no more have come for `debounce` seconds
+    the touched paths alone are synced (`Project.get_changes(paths=...)`)
+    so that the rest of the tree is neither rescanned nor crawled. Remote
+    changes elsewhere in the project are only found by a normal sync.
+
+    Parameters
+    ----------
+
+    proj : project.Project
+        The project to keep synced
+
+    debounce : float
+        The seconds without further changes to wait before syncing
+        (defaults to constants.WATCH_DEBOUNCE)
+
+    poll_interval : float
+        The seconds between scans when polling (defaults to
+        constants.WATCH_POLL_INTERVAL)
+
+    inotify : bool
+        Whether to use inotify where it's available rather than polling
+
+    """
+    def __init__(self, proj, debounce=None, poll_interval=None,
+                 inotify=True):
+        if debounce is None:
+            debounce = constants.WATCH_DEBOUNCE
+        self.proj = proj
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.inotify = inotify
+        self.touched = set()  # the paths waiting to be synced
+        self.n_syncs = 0
+        self._watcher = None
+        self._last_touched = 0
+
+    def start(self):
+        """Starts watching (this is called by `check()` and `run()`)
+        """
+        if self._watcher is not None:
+            return
+        self.proj.local.incremental = True  # (data files being appended)
+        self.proj.local.index  # built now, then only updated
+        root_path = self.proj.root_path
+        if self.inotify:
+            try:
+                self._watcher = InotifyWatcher(root_path)
+            except (OSError, AttributeError) as err:
+                logging.warning("WatchSync: inotify is unavailable ({}) so "
+                                "polling for changes".format(err))
+        if self._watcher is None:
+            self._watcher = PollingWatcher(root_path, self.poll_interval)
+
+    def stop(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def check(self, timeout=0):
+        """Collects the touched paths (waiting up to `timeout` seconds for
+        some) and syncs them once none have come for `debounce` seconds.
+
+        Returns the list of actions synced (see `sync()`) or None if
+        nothing was synced
+        """
+        self.start()
+        touched = self._watcher.read(timeout)
+        if touched:
+            self.touched.update(touched)
+            self._last_touched = time.time()
+        if not self.touched or \
+                time.time() - self._last_touched < self.debounce:
+            return None
+        return self.sync()
+
+    def sync(self):
+        """Syncs the paths touched so far (everything if events were lost)
+
+        Returns a list of the actions applied, as "action_type: path"
+        """
+        paths = top_paths(self.touched)
+        self.touched = set()
+        try:
+            changes = self.proj.get_changes(paths=paths)
+            actions = []
+            written = set()  # the local paths the sync will write to
+            for action_type in changes._change_types:
+                for path, asset in sorted(getattr(changes,
+                                                  action_type).items()):
+                    actions.append("{}: {}".format(action_type, path))
+                    if action_type.endswith('_local'):
+                        written.update([path, asset['path']])
+            changes.apply()
+        except Exception:
+            self.touched.update(paths)  # (to try again)
+            raise
+        self._watcher.ignore(written)
+        self.n_syncs += 1
+        logging.info("WatchSync: synced {} touched path(s)"
+                     .format(len(paths)))
+        return actions
+
+    def run(self, duration=None, stop_event=None):
+        """Watches and syncs until the stop_event (a threading.Event) is
+        set or for `duration` seconds (forever by default). Failed syncs
+        are logged and tried again after the next change
+        """
+        self.start()
+        if duration is not None:
+            end = time.time() + duration
+        try:
+            while stop_event is None or not stop_event.is_set():
+                timeout = max(self.debounce, 0.1)
+                if duration is not None:
+                    timeout = min(timeout, end - time.time())
+                    if timeout <= 0:
+                        break
+                try:
+                    self.check(timeout)
+                except Exception as err:
+                    logging.error("WatchSync: sync failed: {}".format(err))
+        finally:
+            self.stop()